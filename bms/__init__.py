@@ -0,0 +1,44 @@
+"""Core data structures and computations for the battery monitoring app.
+
+Everything importable from here depends only on NumPy (pandas is loaded
+lazily by the frame and export helpers), so batch jobs and workers can
+use the pack, chemistry, history, alert and export logic without
+starting Streamlit or Plotly. ``python -m bms`` exposes the same core
+from the terminal.
+"""
+
+from bms.alertlog import AlertLog
+from bms.anomaly import AnomalyDetector
+from bms.alerts import SAFETY_CHECKS, safety_issues, safety_masks
+from bms.archive import TelemetryArchive
+from bms.balance import BALANCE_STRATEGIES, CellBalancer
+from bms.chemistry import (
+    CELL_SPECS,
+    CHEMISTRY_TABLE,
+    ChemistryTable,
+    calculate_soc,
+    get_cell_status,
+    register_chemistry,
+)
+from bms.ecm import PackSimulator
+from bms.ekf import SocEstimator
+from bms.export import (
+    config_backup,
+    current_state_frame,
+    excel_report,
+    load_config_backup,
+    to_csv,
+)
+from bms.health import HealthEstimator
+from bms.history import (
+    DEFAULT_HISTORY_CAPACITY,
+    HISTORY_PARAMS,
+    HistoryStore,
+    record_sample,
+)
+from bms.pack import CRITICAL, HEALTHY, STATUS_LABELS, WARNING, PackState
+from bms.rules import Rule, RuleEngine, alert_rules, raise_alerts, safety_rules
+from bms.shared import PackSnapshot, SharedPack, follow_estimates
+from bms.synthetic import NOISE_MODELS, generate_history
+from bms.thermal import ThermalModel
+from bms.topology import PackTopology
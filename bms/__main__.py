@@ -0,0 +1,399 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from bms.alertlog import AlertLog
+from bms.alerts import safety_issues
+from bms.archive import TelemetryArchive
+from bms.balance import BALANCE_STRATEGIES, DEFAULT_BALANCE_STEP_S, CellBalancer
+from bms.chemistry import CELL_SPECS
+from bms.export import (
+    config_backup,
+    current_state_frame,
+    excel_report,
+    load_config_backup,
+    to_csv,
+)
+from bms.history import HistoryStore
+from bms.ingest import (
+    OVERLOAD_POLICIES,
+    IngestService,
+    ReplayServer,
+    open_pty,
+    parse_address,
+)
+from bms.pack import PackState
+from bms.replay import LOG_FORMATS, replay_log
+from bms.synthetic import NOISE_MODELS, generate_history
+from bms.topology import PackTopology
+
+# Memory for the in-memory history of `simulate` when nothing is exported
+SIMULATE_MEMORY_BUDGET = 256 * 1024**2
+
+# Newest alerts printed after a replay
+PRINTED_ALERTS = 10
+
+
+def build_pack(args):
+    """Pack from --config, or from the --series/--parallel/--chemistry topology"""
+    pack = PackState()
+    if args.config:
+        with open(args.config) as f:
+            return load_config_backup(pack, f.read())
+    chemistries = args.chemistry.split(",")
+    unknown = [key for key in chemistries if key not in CELL_SPECS]
+    if unknown:
+        raise SystemExit(f"unknown chemistry: {', '.join(unknown)}")
+    topology = PackTopology(args.series, args.parallel, args.module_size)
+    rng = np.random.default_rng(args.seed)
+    topology.build(
+        pack,
+        [chemistries[i % len(chemistries)] for i in range(topology.n_cells)],
+        CELL_SPECS,
+        temp=np.round(rng.uniform(25, 35, topology.n_cells), 1),
+    )
+    return pack
+
+
+def summarize(pack):
+    """Pack-wide status counts and aggregates plus the topology as a plain dict"""
+    summary = pack.summary()
+    return {
+        "cells": summary.pop("cells"),
+        "topology": str(pack.topology) if pack.topology else None,
+        **summary,
+    }
+
+
+def cmd_evaluate(args):
+    pack = build_pack(args)
+    summary = summarize(pack)
+    issues = safety_issues(pack)
+    if args.json:
+        json.dump({"summary": summary, "issues": issues}, sys.stdout, indent=2)
+        print()
+    else:
+        for key, value in summary.items():
+            print(
+                f"{key:<16} {value:.3f}"
+                if isinstance(value, float)
+                else f"{key:<16} {value}"
+            )
+        print(f"{len(issues)} safety issue(s)")
+        for issue in issues:
+            print(
+                f"  {issue['Severity'].upper():<8} {issue['Issue']:<16} {issue['Cell']}"
+                f" {issue['Value']} (limit {issue['Limit']})"
+            )
+    # Non-zero exit lets batch jobs react to critical cells
+    return 2 if summary["critical"] else 0
+
+
+def cmd_simulate(args):
+    pack = build_pack(args)
+    n_samples = int(args.duration * args.rate)
+    if args.output:
+        history = HistoryStore(max(n_samples, 1))
+    else:
+        history = HistoryStore.sized_for(len(pack), SIMULATE_MEMORY_BUDGET)
+    archive = TelemetryArchive(args.archive) if args.archive else None
+
+    start = time.perf_counter()
+    written = generate_history(
+        pack,
+        history,
+        n_samples=n_samples,
+        rate_hz=args.rate,
+        noise=args.noise,
+        seed=args.seed,
+        archive=archive,
+    )
+    if archive is not None:
+        archive.flush()
+    elapsed = time.perf_counter() - start
+    print(
+        f"simulated {written:,} samples x {len(pack):,} cells in {elapsed:.2f} s"
+        f" ({written * len(pack) / max(elapsed, 1e-9):,.0f} cell-samples/s)",
+        file=sys.stderr,
+    )
+    if args.output:
+        _write_output(args.output, history.to_frame())
+    return 0
+
+
+def cmd_balance(args):
+    pack = build_pack(args)
+    balancer = CellBalancer(pack)
+    if args.imbalance:
+        rng = np.random.default_rng(args.seed)
+        balancer.soc = np.clip(
+            balancer.soc + rng.normal(0.0, args.imbalance / 100, len(pack)), 0.0, 1.0
+        )
+    names = args.strategy or list(BALANCE_STRATEGIES)
+    print(
+        f"{'strategy':<16} {'finished':>8} {'time (h)':>9} {'energy (kJ)':>12}"
+        f" {'spread (mV)':>15} {'SOC spread (%)':>15} {'run (s)':>8}"
+    )
+    for name in names:
+        start = time.perf_counter()
+        result = balancer.run(BALANCE_STRATEGIES[name], args.step)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<16} {str(result['converged']):>8} {result['time_s'] / 3600:>9.2f}"
+            f" {result['energy_j'] / 1e3:>12.2f}"
+            f" {result['voltage_spread_before'] * 1e3:>6.0f} ->"
+            f" {result['voltage_spread_after'] * 1e3:>5.0f}"
+            f" {result['soc_spread_before'] * 100:>6.1f} ->"
+            f" {result['soc_spread_after'] * 100:>5.1f} {elapsed:>8.2f}"
+        )
+    return 0
+
+
+def cmd_export(args):
+    if args.archive:
+        archive = TelemetryArchive(args.archive)
+        frame = archive.to_frame(_parse_time(args.start), _parse_time(args.end))
+        _write_output(args.output, frame)
+        return 0
+
+    pack = build_pack(args)
+    if args.output.endswith(".json"):
+        with open(args.output, "w") as f:
+            f.write(config_backup(pack))
+    elif args.output.endswith(".xlsx"):
+        with open(args.output, "wb") as f:
+            f.write(excel_report(current_state_frame(pack)))
+    else:
+        _write_output(args.output, current_state_frame(pack))
+    return 0
+
+
+def cmd_ingest(args):
+    pack = build_pack(args)
+    history = HistoryStore.sized_for(len(pack), SIMULATE_MEMORY_BUDGET)
+    service = IngestService(
+        pack,
+        history,
+        archive=TelemetryArchive(args.archive) if args.archive else None,
+        tcp=parse_address(args.tcp),
+        udp=parse_address(args.udp),
+        serial=args.serial,
+        max_pending=args.max_pending,
+        policy=args.policy,
+    )
+    if not (service.tcp or service.udp or service.serial):
+        raise SystemExit("give at least one of --tcp, --udp or --serial")
+    service.start()
+    print(f"ingesting into {len(pack):,} cells, Ctrl-C to stop", file=sys.stderr)
+    previous = 0
+    try:
+        while True:
+            time.sleep(args.interval)
+            stats = service.snapshot_stats()
+            rate = (stats["applied"] - previous) / args.interval
+            previous = stats["applied"]
+            print(
+                f"{rate:>10,.0f} frames/s  applied {stats['applied']:,}"
+                f"  pending {stats['pending']:,}  dropped {stats['dropped']:,}"
+                f"  coalesced {stats['coalesced']:,}  errors {stats['errors']:,}"
+                f"  samples {len(history):,}",
+                file=sys.stderr,
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        if service.archive is not None:
+            service.archive.flush()
+    return 0
+
+
+def cmd_replay(args):
+    pack = build_pack(args)
+    server = ReplayServer(pack, rate_hz=args.rate, seed=args.seed)
+    if args.pty:
+        fd, path = open_pty()
+        print(f"serving {len(pack):,} cells on {path}", file=sys.stderr)
+        server.start(server.send_fd, fd)
+    elif args.udp:
+        server.start(server.send_udp, *parse_address(args.udp))
+    elif args.tcp:
+        server.start(server.send_tcp, *parse_address(args.tcp))
+    else:
+        raise SystemExit("give one of --tcp, --udp or --pty")
+    try:
+        while server.join(1.0):
+            pass
+    except KeyboardInterrupt:
+        server.stop()
+    finally:
+        if args.pty:
+            os.close(fd)
+    print(f"sent {server.sent:,} frames", file=sys.stderr)
+    return 0
+
+
+def cmd_replay_log(args):
+    pack = build_pack(args)
+    history = HistoryStore.sized_for(len(pack), SIMULATE_MEMORY_BUDGET)
+    archive = TelemetryArchive(args.archive) if args.archive else None
+    alerts = AlertLog()
+    stats = replay_log(
+        args.log,
+        pack,
+        history,
+        fmt=args.format,
+        speed=args.speed,
+        archive=archive,
+        alerts=alerts,
+    )
+    span = (stats["end_ns"] - stats["start_ns"]) / 1e9 if stats["frames"] else 0.0
+    print(
+        f"replayed {stats['frames']:,} frames ({stats['samples']:,} samples,"
+        f" {span:,.0f} s of data) in {stats['elapsed_s']:.2f} s,"
+        f" {stats['alerts']:,} alert(s)",
+        file=sys.stderr,
+    )
+    recent = alerts.recent(PRINTED_ALERTS)
+    if len(alerts) > len(recent):
+        print(f"newest {len(recent)} alerts:", file=sys.stderr)
+    for alert in reversed(recent):
+        print(
+            f"{alert['timestamp']:%Y-%m-%d %H:%M:%S.%f} {alert['type'].upper():<8}"
+            f" {alert['message']}"
+        )
+    if args.output:
+        _write_output(args.output, history.to_frame())
+    return 0
+
+
+def _write_output(path, frame):
+    if path == "-":
+        sys.stdout.write(to_csv(frame))
+    elif path.endswith(".xlsx"):
+        with open(path, "wb") as f:
+            f.write(excel_report(frame))
+    else:
+        with open(path, "w", newline="") as f:
+            f.write(to_csv(frame))
+
+
+def _parse_time(text):
+    """ISO timestamp to ns since epoch (None stays None)"""
+    if text is None:
+        return None
+    return int(np.datetime64(datetime.fromisoformat(text), "ns").astype(np.int64))
+
+
+def _add_pack_arguments(parser):
+    parser.add_argument("--config", help="configuration backup JSON from the app")
+    parser.add_argument("--series", type=int, default=8, help="cells in series")
+    parser.add_argument("--parallel", type=int, default=1, help="cells in parallel")
+    parser.add_argument("--module-size", type=int, help="series groups per module")
+    parser.add_argument(
+        "--chemistry",
+        default="lfp",
+        help=f"chemistry key(s), cycled over the cells: {', '.join(CELL_SPECS)}",
+    )
+    parser.add_argument("--seed", type=int, help="random seed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bms",
+        description="Evaluate, simulate and export battery packs without the UI.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    evaluate = commands.add_parser("evaluate", help="status, SOC and safety checks")
+    _add_pack_arguments(evaluate)
+    evaluate.add_argument("--json", action="store_true", help="print JSON")
+    evaluate.set_defaults(func=cmd_evaluate)
+
+    simulate = commands.add_parser("simulate", help="generate synthetic history")
+    _add_pack_arguments(simulate)
+    simulate.add_argument("--duration", type=float, default=3600, help="seconds")
+    simulate.add_argument("--rate", type=float, default=1.0, help="samples per second")
+    simulate.add_argument("--noise", choices=NOISE_MODELS, default="uniform")
+    simulate.add_argument("--archive", help="also write to this telemetry archive")
+    simulate.add_argument(
+        "-o", "--output", help="history file (.csv/.xlsx, - for stdout)"
+    )
+    simulate.set_defaults(func=cmd_simulate)
+
+    balance = commands.add_parser("balance", help="compare cell balancing strategies")
+    _add_pack_arguments(balance)
+    balance.add_argument(
+        "--imbalance", type=float, default=2.0, help="SOC spread to start from (%% std)"
+    )
+    balance.add_argument(
+        "--strategy",
+        action="append",
+        choices=BALANCE_STRATEGIES,
+        help="strategy to run, repeatable (default: all)",
+    )
+    balance.add_argument(
+        "--step", type=float, default=DEFAULT_BALANCE_STEP_S, help="time step (s)"
+    )
+    balance.set_defaults(func=cmd_balance)
+
+    export = commands.add_parser("export", help="export pack state or an archive")
+    _add_pack_arguments(export)
+    export.add_argument("--archive", help="export this telemetry archive instead")
+    export.add_argument("--start", help="archive range start (ISO time)")
+    export.add_argument("--end", help="archive range end (ISO time)")
+    export.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="output file (.csv/.xlsx/.json, - for stdout)",
+    )
+    export.set_defaults(func=cmd_export)
+
+    ingest = commands.add_parser("ingest", help="receive live BMS frames")
+    _add_pack_arguments(ingest)
+    ingest.add_argument("--tcp", help="listen address, e.g. :9000")
+    ingest.add_argument("--udp", help="listen address, e.g. :9001")
+    ingest.add_argument("--serial", help="serial or pseudo-terminal device")
+    ingest.add_argument("--policy", choices=OVERLOAD_POLICIES, default="coalesce")
+    ingest.add_argument("--max-pending", type=int, default=200_000)
+    ingest.add_argument("--archive", help="also write to this telemetry archive")
+    ingest.add_argument("--interval", type=float, default=1.0, help="stats period (s)")
+    ingest.set_defaults(func=cmd_ingest)
+
+    replay = commands.add_parser("replay", help="stream synthetic BMS frames")
+    _add_pack_arguments(replay)
+    replay.add_argument("--tcp", help="ingest address to connect to")
+    replay.add_argument("--udp", help="ingest address to send to")
+    replay.add_argument("--pty", action="store_true", help="serve on a new pty")
+    replay.add_argument("--rate", type=float, default=10.0, help="samples per second")
+    replay.set_defaults(func=cmd_replay)
+
+    log_replay = commands.add_parser(
+        "replay-log", help="re-evaluate a recorded CSV or candump log"
+    )
+    _add_pack_arguments(log_replay)
+    log_replay.add_argument("log", help="log file")
+    log_replay.add_argument("--format", choices=LOG_FORMATS, help="default: guess")
+    log_replay.add_argument(
+        "--speed",
+        type=float,
+        help="multiple of real time (default: as fast as possible)",
+    )
+    log_replay.add_argument("--archive", help="also write to this telemetry archive")
+    log_replay.add_argument(
+        "-o", "--output", help="replayed history (.csv/.xlsx, - for stdout)"
+    )
+    log_replay.set_defaults(func=cmd_replay_log)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Severity codes of the ``severity`` column
+SEVERITIES = ("info", "warning", "critical")
+
+# One fixed-width record per event on disk; text fields are ids into the
+# string table. In memory each field is a column of its own.
+ALERT_DTYPE = np.dtype(
+    [
+        ("timestamp_ns", "<i8"),
+        ("severity", "u1"),
+        ("cell", "<i4"),  # -1 for pack-wide events
+        ("issue", "<i4"),  # rule name, or the whole message of a free-text alert
+        ("unit", "<i4"),
+        ("value", "<f8"),
+        ("limit", "<f8"),
+    ]
+)
+
+# Rows allocated up front; the columns double when full
+INITIAL_CAPACITY = 1024
+
+
+def _columns(capacity):
+    return {
+        name: np.zeros(capacity, dtype=ALERT_DTYPE[name]) for name in ALERT_DTYPE.names
+    }
+
+
+class _Postings:
+    """Row ids per code of one column, grown in place as events are appended"""
+
+    def __init__(self):
+        self.rows = {}  # code -> (array, used)
+
+    def add(self, codes, first_row):
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)]
+        for start, end in zip(starts, ends):
+            code = int(sorted_codes[start])
+            array, used = self.rows.get(code, (np.empty(16, dtype=np.int64), 0))
+            new = order[start:end] + first_row
+            if used + len(new) > len(array):
+                grown = np.empty(max(2 * len(array), used + len(new)), dtype=np.int64)
+                grown[:used] = array[:used]
+                array = grown
+            array[used : used + len(new)] = new
+            self.rows[code] = (array, used + len(new))
+
+    def count(self, codes):
+        return sum(self.rows.get(code, (None, 0))[1] for code in codes)
+
+    def lookup(self, codes, n):
+        """Sorted row ids below ``n`` having any of ``codes``"""
+        parts = []
+        for code in codes:
+            array, used = self.rows.get(code, (None, 0))
+            if used:
+                rows = array[:used]
+                parts.append(rows[: np.searchsorted(rows, n)])
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+
+class AlertLog:
+    """Append-only alert log indexed by time, cell and severity.
+
+    Events are kept as growable NumPy columns, with cell ids, rule names
+    and units interned in a string table. Queries
+    narrow the rows with the most selective index first: per-cell and
+    per-severity posting lists, and a binary search on time while events
+    arrive in time order (an argsort cached until the next append
+    otherwise). Only the page of rows being shown is turned into dicts,
+    so the log can hold millions of events.
+
+    With ``path`` every append is also written to ``events.bin`` and new
+    strings to ``strings.jsonl`` in that directory, and the log is
+    reloaded from there on start. Readers never lock: the records and
+    their count are published together after each append.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._strings = []
+        self._string_ids = {}
+        self._state = (_columns(INITIAL_CAPACITY), 0)
+        self._in_order = True
+        self._time_order = None  # (rows, argsort of the timestamps)
+        self._cells = _Postings()
+        self._severities = _Postings()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def __len__(self):
+        return self._state[1]
+
+    # Writing
+
+    def _intern(self, text, new_strings):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(text)
+            self._string_ids[text] = string_id
+            new_strings.append(text)
+        return string_id
+
+    def add(self, message, severity="info", timestamp=None, cell=None):
+        """Append one free-text event (``timestamp`` is a datetime or ns)"""
+        if timestamp is None:
+            timestamp_ns = time.time_ns()
+        elif isinstance(timestamp, datetime):
+            timestamp_ns = int(timestamp.timestamp() * 1e9)
+        else:
+            timestamp_ns = int(timestamp)
+        self.extend(
+            [
+                {
+                    "timestamp_ns": timestamp_ns,
+                    "Cell": cell,
+                    "Issue": message,
+                    "Severity": severity,
+                }
+            ]
+        )
+
+    def extend(self, events):
+        """Append rule events (dicts as returned by RuleEngine.evaluate)"""
+        if not events:
+            return
+        with self._lock:
+            new_strings = []
+            intern = self._intern
+            records = np.empty(len(events), dtype=ALERT_DTYPE)
+            records["timestamp_ns"] = [event["timestamp_ns"] for event in events]
+            records["severity"] = [
+                SEVERITIES.index(event["Severity"]) for event in events
+            ]
+            records["cell"] = [
+                -1 if event.get("Cell") is None else intern(event["Cell"], new_strings)
+                for event in events
+            ]
+            records["issue"] = [intern(event["Issue"], new_strings) for event in events]
+            records["unit"] = [
+                intern(event.get("unit", ""), new_strings) for event in events
+            ]
+            records["value"] = [event.get("value", np.nan) for event in events]
+            records["limit"] = [event.get("limit", np.nan) for event in events]
+            if self.path is not None:
+                self._write(records, new_strings)
+            self._append(records)
+
+    def _append(self, records):
+        data, n = self._state
+        k = len(records)
+        if n + k > len(data["timestamp_ns"]):
+            grown = _columns(max(2 * len(data["timestamp_ns"]), n + k))
+            for name, column in data.items():
+                grown[name][:n] = column[:n]
+            data = grown
+        for name in ALERT_DTYPE.names:
+            data[name][n : n + k] = records[name]
+        timestamps = records["timestamp_ns"]
+        if self._in_order and (
+            (n and timestamps[0] < data["timestamp_ns"][n - 1])
+            or (np.diff(timestamps) < 0).any()
+        ):
+            self._in_order = False
+        self._cells.add(records["cell"], n)
+        self._severities.add(records["severity"], n)
+        # Rows and count are swapped in together, readers use one or the other
+        self._state = (data, n + k)
+
+    def _write(self, records, new_strings):
+        if new_strings:
+            with open(os.path.join(self.path, "strings.jsonl"), "a") as f:
+                f.writelines(json.dumps(text) + "\n" for text in new_strings)
+        with open(os.path.join(self.path, "events.bin"), "ab") as f:
+            f.write(records.tobytes())
+
+    def _load(self):
+        strings_path = os.path.join(self.path, "strings.jsonl")
+        if os.path.exists(strings_path):
+            with open(strings_path) as f:
+                for line in f:
+                    if line.strip():
+                        self._intern(json.loads(line), [])
+        events_path = os.path.join(self.path, "events.bin")
+        if os.path.exists(events_path):
+            # A partly written last record (e.g. after a crash) is ignored
+            count = os.path.getsize(events_path) // ALERT_DTYPE.itemsize
+            records = np.fromfile(events_path, dtype=ALERT_DTYPE, count=count)
+            if len(records):
+                self._append(records)
+
+    def clear(self):
+        """Drop every event, including the files on disk"""
+        with self._lock:
+            if self.path is not None:
+                for name in ("events.bin", "strings.jsonl"):
+                    if os.path.exists(os.path.join(self.path, name)):
+                        os.remove(os.path.join(self.path, name))
+            self.__init__(self.path)
+
+    # Reading
+
+    @property
+    def cell_ids(self):
+        """Cells that have at least one event"""
+        return sorted(
+            self._strings[code] for code in list(self._cells.rows) if code >= 0
+        )
+
+    def time_range(self):
+        data, n = self._state
+        if not n:
+            return None
+        timestamps = data["timestamp_ns"][:n]
+        return int(timestamps.min()), int(timestamps.max())
+
+    def query(self, start_ns=None, end_ns=None, cells=None, severities=None):
+        """Row ids of matching events in [start_ns, end_ns), newest first"""
+        data, n = self._state
+        timestamps = data["timestamp_ns"][:n]
+        filters = []
+        if cells is not None:
+            ids = self._string_ids
+            codes = [ids[cell] for cell in cells if cell in ids]
+            filters.append(("cell", self._cells, codes))
+        if severities is not None:
+            codes = [SEVERITIES.index(severity) for severity in severities]
+            filters.append(("severity", self._severities, codes))
+
+        order = self._sorted_rows(timestamps, n)
+        sorted_times = timestamps if order is None else timestamps[order]
+        lo = 0 if start_ns is None else np.searchsorted(sorted_times, start_ns)
+        hi = n if end_ns is None else np.searchsorted(sorted_times, end_ns)
+
+        # Start from the smaller candidate set: the time slice or a posting list
+        sizes = [postings.count(codes) for _, postings, codes in filters]
+        if filters and min(sizes) < hi - lo:
+            _, postings, codes = filters.pop(int(np.argmin(sizes)))
+            rows = postings.lookup(codes, n)
+            times = timestamps[rows]
+            rows = rows[(times >= sorted_times[lo]) & (times <= sorted_times[hi - 1])]
+            if order is not None:
+                rows = rows[np.argsort(timestamps[rows], kind="stable")]
+        else:
+            rows = np.arange(lo, hi) if order is None else order[lo:hi]
+        for column, _, codes in filters:
+            rows = rows[np.isin(data[column][rows], codes)]
+        return rows[::-1]
+
+    def _sorted_rows(self, timestamps, n):
+        """None while rows are in time order, else their argsort by time"""
+        if self._in_order:
+            return None
+        cached = self._time_order
+        if cached is None or cached[0] != n:
+            cached = (n, np.argsort(timestamps, kind="stable"))
+            self._time_order = cached
+        return cached[1]
+
+    def records(self, rows):
+        """Events at ``rows`` as dicts with timestamp, message, type and cell"""
+        data = self._state[0]
+        rows = np.asarray(rows, dtype=np.int64)
+        records = np.empty(len(rows), dtype=ALERT_DTYPE)
+        for name, column in data.items():
+            records[name] = column[rows]
+        strings = self._strings
+        events = []
+        for row in records:
+            cell = strings[row["cell"]] if row["cell"] >= 0 else None
+            issue = strings[row["issue"]]
+            if cell is None:
+                message = issue
+            else:
+                unit = strings[row["unit"]]
+                precision = 2 if unit == "V" else 1
+                message = f"{cell} {issue.lower()}"
+                if not np.isnan(row["value"]):
+                    message += f": {row['value']:.{precision}f}{unit}"
+                if not np.isnan(row["limit"]):
+                    message += f" (limit {row['limit']:.{precision}f}{unit})"
+            events.append(
+                {
+                    "timestamp": datetime.fromtimestamp(row["timestamp_ns"] / 1e9),
+                    "message": message,
+                    "type": SEVERITIES[row["severity"]],
+                    "cell": cell,
+                }
+            )
+        return events
+
+    def recent(self, n=10):
+        """The ``n`` newest events as dicts"""
+        return self.records(self.query()[:n])
+
+    @property
+    def nbytes(self):
+        return len(self) * ALERT_DTYPE.itemsize
@@ -0,0 +1,43 @@
+import numpy as np
+
+# (issue, field, limit column, comparison, unit, severity) per safety check
+SAFETY_CHECKS = (
+    ("Overvoltage", "voltage", "max_voltage", np.greater, "V", "critical"),
+    ("Undervoltage", "voltage", "min_voltage", np.less, "V", "critical"),
+    ("Overtemperature", "temp", "max_temp", np.greater, "°C", "critical"),
+    ("Undertemperature", "temp", "min_temp", np.less, "°C", "warning"),
+)
+
+
+def safety_masks(pack):
+    """Evaluate every safety check for the whole pack.
+
+    Returns ``(check, mask, values, limits)`` per entry of SAFETY_CHECKS,
+    where ``mask`` flags the violating cells.
+    """
+    results = []
+    for check in SAFETY_CHECKS:
+        _, field, limit, compare, _, _ = check
+        values = pack.data[field]
+        limits = pack.spec_column(limit)
+        results.append((check, compare(values, limits), values, limits))
+    return results
+
+
+def safety_issues(pack):
+    """Describe every limit violation in the pack as one dict per issue"""
+    issues = []
+    cell_ids = pack.cell_ids
+    for (issue, _, _, _, unit, severity), mask, values, limits in safety_masks(pack):
+        precision = 2 if unit == "V" else 1
+        for idx in np.flatnonzero(mask):
+            issues.append(
+                {
+                    "Cell": cell_ids[idx],
+                    "Issue": issue,
+                    "Value": f"{values[idx]:.{precision}f}{unit}",
+                    "Limit": f"{limits[idx]:g}{unit}",
+                    "Severity": severity,
+                }
+            )
+    return issues
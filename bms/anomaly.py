@@ -0,0 +1,204 @@
+import threading
+import time
+
+import numpy as np
+
+from bms.readings import flatten_block, history_blocks, reading_passes
+from bms.rules import RULE_FIELDS
+
+# Weight of each new reading in the moving mean and variance of a cell
+DEFAULT_ALPHA = 0.05
+
+# Readings a cell needs before its own statistics are trusted (about two
+# time constants of the moving average)
+WARMUP_SAMPLES = 40
+
+# |z| at which a reading is anomalous against the cell's own history, and
+# against the other cells of its chemistry (robust z from median and MAD).
+# Thousands of readings are scored per sample, so the limits sit well
+# beyond the tails of sensor noise.
+DEFAULT_Z_LIMIT = 6.0
+DEFAULT_PACK_Z_LIMIT = 6.0
+
+# Floor of the spread per field, so perfectly steady signals do not turn
+# sensor noise into anomalies
+MIN_STD = {"voltage": 0.005, "current": 0.05, "temp": 0.2}
+
+# MAD to standard deviation for normally distributed readings
+MAD_SCALE = 1.4826
+
+# Alert issue per field and per score (drift, pack deviation)
+FIELD_LABELS = {"voltage": "Voltage", "current": "Current", "temp": "Temperature"}
+SCORE_ISSUES = ("drift", "deviates from pack")
+
+
+class AnomalyDetector:
+    """Streaming anomaly scores of every cell and parameter.
+
+    Each cell keeps an exponentially weighted mean and variance of its
+    voltage, current and temperature; a reading is scored against them
+    before they are updated (z), and against the median and MAD of the
+    latest readings of all cells of the same chemistry (pack z). Both
+    are O(cells) array passes per sample. A score that crosses its limit
+    produces one event until it falls back inside, in the RuleEngine's
+    event format, so ``raise_alerts`` stores it with the other alerts.
+    """
+
+    def __init__(
+        self,
+        pack,
+        alpha=DEFAULT_ALPHA,
+        z_limit=DEFAULT_Z_LIMIT,
+        pack_z_limit=DEFAULT_PACK_Z_LIMIT,
+    ):
+        self.lock = threading.Lock()
+        self.cell_ids = pack.cell_ids
+        self.alpha = alpha
+        self.limits = np.array([z_limit, pack_z_limit])
+        codes = pack.data["chemistry"]
+        self.groups = [np.flatnonzero(codes == code) for code in np.unique(codes)]
+        self.min_std = np.array([MIN_STD[field] for field in RULE_FIELDS])[
+            :, np.newaxis
+        ]
+        n, f = len(pack), len(RULE_FIELDS)
+        self.mean = np.zeros((f, n))
+        self.var = np.zeros((f, n))
+        self.count = np.zeros(n, dtype=np.int64)
+        self.last = np.full((f, n), np.nan)  # latest reading, for the pack median
+        self.last_ns = np.zeros(n, dtype=np.int64)
+        self.z = np.zeros((2, f, n))  # (drift, pack) scores of the latest reading
+        self.flagged = np.zeros((2, f, n), dtype=bool)
+
+    def matches(self, pack):
+        """Whether the detector was built for this pack's cells"""
+        return self.cell_ids == pack.cell_ids
+
+    def _step(self, cells, timestamps_ns, x):
+        """Score readings ``x`` (fields x cells) of ``cells`` (unique positions)"""
+        finite = np.isfinite(x)
+        mean, var = self.mean[:, cells], self.var[:, cells]
+        count = self.count[cells]
+
+        std = np.maximum(np.sqrt(var), self.min_std)
+        drift = np.where(finite & (count >= WARMUP_SAMPLES), (x - mean) / std, 0.0)
+        diff = np.where(finite, x - mean, 0.0)
+        step = self.alpha * diff
+        fresh = count == 0
+        self.mean[:, cells] = np.where(fresh & finite, x, mean + step)
+        self.var[:, cells] = np.where(
+            fresh, 0.0, np.where(finite, (1 - self.alpha) * (var + diff * step), var)
+        )
+        self.count[cells] = count + 1
+        self.last[:, cells] = np.where(finite, x, self.last[:, cells])
+        self.last_ns[cells] = timestamps_ns
+
+        # Deviation from the other cells of the same chemistry
+        pack_z = np.zeros_like(x)
+        for group in self.groups:
+            if len(group) < 3:
+                continue
+            latest = self.last[:, group]
+            # nanmedian is several times slower, only pay for it when needed
+            median_of = np.nanmedian if np.isnan(latest).any() else np.median
+            with np.errstate(all="ignore"):
+                median = median_of(latest, axis=1)
+                mad = median_of(np.abs(latest - median[:, np.newaxis]), axis=1)
+            spread = np.maximum(MAD_SCALE * mad, self.min_std[:, 0])
+            member = np.isin(cells, group)
+            pack_z[:, member] = (x[:, member] - median[:, np.newaxis]) / spread[
+                :, np.newaxis
+            ]
+        pack_z = np.where(finite, pack_z, 0.0)
+
+        z = np.stack([drift, pack_z])
+        self.z[:, :, cells] = z
+        over = np.abs(z) > self.limits[:, np.newaxis, np.newaxis]
+        due = over & ~self.flagged[:, :, cells]
+        self.flagged[:, :, cells] = over
+        return z, due
+
+    def update(self, timestamps_ns, cells, readings):
+        """Score a batch of readings and return the anomalies that became due.
+
+        ``cells`` are pack positions and ``readings`` maps each of
+        RULE_FIELDS to an array aligned with them. Readings of one cell
+        are taken in time order; ones not newer than the cell's last are
+        skipped. Returns events like RuleEngine.evaluate, in time order.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        cells = np.asarray(cells, dtype=np.intp)
+        values = np.stack(
+            [np.asarray(readings[field], dtype=np.float64) for field in RULE_FIELDS]
+        ).reshape(len(RULE_FIELDS), len(cells))
+        events = []
+        with self.lock:
+            keep = timestamps_ns > self.last_ns[cells]
+            timestamps_ns, cells, values = (
+                timestamps_ns[keep],
+                cells[keep],
+                values[:, keep],
+            )
+            for i in reading_passes(timestamps_ns, cells):
+                z, due = self._step(cells[i], timestamps_ns[i], values[:, i])
+                for kind, f, j in zip(*np.nonzero(due)):
+                    events.append(
+                        self._event(
+                            kind, f, cells[i[j]], timestamps_ns[i[j]], z[kind, f, j]
+                        )
+                    )
+        events.sort(key=lambda event: event["timestamp_ns"])
+        return events
+
+    def _event(self, kind, f, cell, timestamp_ns, score):
+        limit = self.limits[kind]
+        return {
+            "timestamp_ns": int(timestamp_ns),
+            "Cell": self.cell_ids[cell],
+            "Issue": f"{FIELD_LABELS[RULE_FIELDS[f]]} {SCORE_ISSUES[kind]}",
+            "Value": f"{score:+.1f}σ",
+            "Limit": f"{limit:.1f}σ",
+            "Severity": "warning",
+            "value": float(score),
+            "limit": float(limit),
+            "unit": "σ",
+        }
+
+    def update_frames(self, frames, now_ns=None):
+        """Score ingest or replay frames (timestamp 0 means "now")"""
+        timestamps = frames["timestamp_ns"]
+        if not timestamps.all():
+            timestamps = np.where(timestamps == 0, now_ns or time.time_ns(), timestamps)
+        known = frames["cell"] < len(self.cell_ids)
+        return self.update(
+            timestamps[known],
+            frames["cell"][known],
+            {field: frames[field][known] for field in RULE_FIELDS},
+        )
+
+    def update_pack(self, pack, timestamp_ns=None):
+        """Score the pack's current state as one sample of every cell"""
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        return self.update(
+            np.full(len(pack), timestamp_ns, dtype=np.int64),
+            np.arange(len(pack)),
+            {field: pack.data[field] for field in RULE_FIELDS},
+        )
+
+    def follow(self, history):
+        """Score the history samples that are newer than the detector's state.
+
+        Returns the events of those samples, like ``update``.
+        """
+        events = []
+        for block in history_blocks(history, self.cell_ids, self.last_ns, RULE_FIELDS):
+            events += self.update(*flatten_block(*block))
+        return events
+
+    def scores(self, idx):
+        """Latest (drift z, pack z) of one cell per field, {field: (z, pack z)}"""
+        with self.lock:
+            return {
+                field: (float(self.z[0, f, idx]), float(self.z[1, f, idx]))
+                for f, field in enumerate(RULE_FIELDS)
+            }
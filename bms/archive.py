@@ -0,0 +1,386 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from bms.history import HISTORY_PARAMS, _to_ns
+
+# Start a new segment after this many seconds of data
+DEFAULT_SEGMENT_SECONDS = 3600
+
+# Rows per segment are sized for this sample rate (Hz) over a segment's span
+DEFAULT_SEGMENT_RATE_HZ = 10.0
+
+# Largest preallocated column file; wide packs get fewer rows per segment
+MAX_COLUMN_BYTES = 64 * 1024**2
+
+# Write the segment metadata every N appended samples
+DEFAULT_FLUSH_EVERY = 1000
+
+
+class _Segment:
+    """One directory of fixed-width memory-mapped columns.
+
+    Only the writable segment keeps its files mapped; older segments are
+    described by their metadata and mapped again for each read.
+    """
+
+    def __init__(self, path, meta, writable):
+        self.path = path
+        self.start_ns = meta["start_ns"]
+        self.capacity = meta["capacity"]
+        self.cell_ids = list(meta["cell_ids"])
+        self.params = tuple(meta["params"])
+        self.cell_index = {cell_id: i for i, cell_id in enumerate(self.cell_ids)}
+        self.writable = writable
+        self.count = meta["count"]
+        self._end_ns = meta.get("end_ns")
+        self._maps = None
+        if writable:
+            timestamps, _ = self.maps()
+            # Recover samples written after the last metadata flush
+            while self.count < self.capacity and timestamps[self.count] != 0:
+                self.count += 1
+
+    @classmethod
+    def create(cls, path, start_ns, capacity, cell_ids, params):
+        os.makedirs(path)
+        np.memmap(
+            os.path.join(path, "timestamps.i64"),
+            dtype=np.int64,
+            mode="w+",
+            shape=(capacity,),
+        ).flush()
+        for param in params:
+            column = np.memmap(
+                os.path.join(path, f"{param}.f64"),
+                dtype=np.float64,
+                mode="w+",
+                shape=(len(cell_ids), capacity),
+            )
+            column.flush()
+        meta = {
+            "start_ns": int(start_ns),
+            "capacity": int(capacity),
+            "count": 0,
+            "cell_ids": list(cell_ids),
+            "params": list(params),
+        }
+        _write_meta(path, meta)
+        return cls(path, meta, writable=True)
+
+    def maps(self):
+        """Memory maps of the (timestamps, {param: (cells, rows) column}) files.
+
+        The writable segment keeps its maps; for older segments they are
+        released once the caller drops them.
+        """
+        if self._maps is not None:
+            return self._maps
+        mode = "r+" if self.writable else "r"
+        timestamps = np.memmap(
+            os.path.join(self.path, "timestamps.i64"),
+            dtype=np.int64,
+            mode=mode,
+            shape=(self.capacity,),
+        )
+        columns = {
+            param: np.memmap(
+                os.path.join(self.path, f"{param}.f64"),
+                dtype=np.float64,
+                mode=mode,
+                shape=(len(self.cell_ids), self.capacity),
+            )
+            for param in self.params
+        }
+        if self.writable:
+            self._maps = timestamps, columns
+        return timestamps, columns
+
+    @property
+    def end_ns(self):
+        if not self.count:
+            return self.start_ns
+        if self.writable or self._end_ns is None:
+            timestamps, _ = self.maps()
+            self._end_ns = int(timestamps[self.count - 1])
+        return self._end_ns
+
+    def window(self, timestamps, start_ns=None, end_ns=None):
+        """Return the row slice whose timestamps fall in [start_ns, end_ns)"""
+        timestamps = timestamps[: self.count]
+        lo = 0 if start_ns is None else np.searchsorted(timestamps, start_ns, "left")
+        hi = (
+            self.count
+            if end_ns is None
+            else np.searchsorted(timestamps, end_ns, "left")
+        )
+        return slice(int(lo), int(hi))
+
+    def flush(self):
+        if not self.writable:
+            return
+        timestamps, columns = self.maps()
+        timestamps.flush()
+        for column in columns.values():
+            column.flush()
+        _write_meta(
+            self.path,
+            {
+                "start_ns": self.start_ns,
+                "capacity": self.capacity,
+                "count": self.count,
+                "end_ns": self.end_ns,
+                "cell_ids": self.cell_ids,
+                "params": list(self.params),
+            },
+        )
+
+    def close(self):
+        """Flush and stop writing; the files are unmapped"""
+        self.flush()
+        self.writable = False
+        self._maps = None
+
+    @property
+    def nbytes(self):
+        row_bytes = 8 * (1 + len(self.cell_ids) * len(self.params))
+        return self.count * row_bytes
+
+
+class TelemetryArchive:
+    """Append-only on-disk telemetry store split into time-based segments.
+
+    Each segment is a directory holding one memory-mapped int64 timestamp
+    column and one (cells, rows) float64 file per parameter, so every
+    cell parameter is a fixed-width contiguous column on disk. Segments
+    roll over after ``segment_seconds``, when full, or when the set of
+    cells changes. Their files are preallocated for ``segment_capacity``
+    rows, by default ``segment_seconds`` at ``rate_hz`` but no more than
+    MAX_COLUMN_BYTES per column file; faster data just rolls over sooner.
+    Nothing is touched on disk until the archive is first used, and reads
+    slice the memory maps without loading whole files.
+    """
+
+    def __init__(
+        self,
+        root,
+        segment_seconds=DEFAULT_SEGMENT_SECONDS,
+        segment_capacity=None,
+        params=HISTORY_PARAMS,
+        flush_every=DEFAULT_FLUSH_EVERY,
+        rate_hz=DEFAULT_SEGMENT_RATE_HZ,
+    ):
+        self.root = root
+        self.segment_ns = int(segment_seconds * 1e9)
+        self.segment_capacity = segment_capacity
+        self.rate_hz = rate_hz
+        self.params = tuple(params)
+        self.flush_every = flush_every
+        self._segments = None
+        self._unflushed = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Open existing segments the first time the archive is used"""
+        if self._segments is not None:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not name.startswith("seg_") or not os.path.exists(
+                os.path.join(path, "meta.json")
+            ):
+                continue
+            with open(os.path.join(path, "meta.json")) as f:
+                found.append((path, json.load(f)))
+        # Segments are read in time order, whatever their directory names
+        found.sort(key=lambda item: (item[1]["start_ns"], item[0]))
+        self._segments = [
+            _Segment(path, meta, writable=i == len(found) - 1)
+            for i, (path, meta) in enumerate(found)
+        ]
+
+    @property
+    def segments(self):
+        with self._lock:
+            self._load()
+            return list(self._segments)
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+    @property
+    def nbytes(self):
+        """Bytes of archived samples on disk"""
+        return sum(segment.nbytes for segment in self.segments)
+
+    @property
+    def cell_ids(self):
+        seen = {}
+        for segment in self.segments:
+            seen.update(dict.fromkeys(segment.cell_ids))
+        return list(seen)
+
+    @property
+    def last_ns(self):
+        """Timestamp of the newest archived sample, or None when empty"""
+        time_range = self.time_range()
+        return None if time_range is None else time_range[1]
+
+    def time_range(self):
+        """Return (first, last) archived timestamp in ns, or None when empty"""
+        segments = [segment for segment in self.segments if segment.count]
+        if not segments:
+            return None
+        # A segment starts at its first sample
+        return segments[0].start_ns, segments[-1].end_ns
+
+    def append(self, timestamp, cells_data):
+        """Append one sample taken from a ``{cell_id: {param: value}}`` mapping"""
+        cell_ids = list(cells_data.keys())
+        sample = np.full((1, len(cell_ids), len(self.params)), np.nan)
+        for j, cell_data in enumerate(cells_data.values()):
+            for k, param in enumerate(self.params):
+                if param in cell_data:
+                    sample[0, j, k] = cell_data[param]
+        self.append_array([_to_ns(timestamp)], sample, cell_ids)
+
+    def append_array(self, timestamps_ns, values, cell_ids):
+        """Append a block of shape (samples, cells, params).
+
+        The block is put in time order; samples older than the newest one
+        already archived raise ValueError, since segments are read back
+        in time order.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        cell_ids = list(cell_ids)
+        if not cell_ids or not len(timestamps_ns):
+            return
+        if np.any(timestamps_ns[1:] < timestamps_ns[:-1]):
+            order = np.argsort(timestamps_ns, kind="stable")
+            timestamps_ns, values = timestamps_ns[order], values[order]
+        with self._lock:
+            self._load()
+            if self._segments:
+                newest = self._segments[-1].end_ns
+                if timestamps_ns[0] < newest:
+                    raise ValueError(
+                        f"sample at {int(timestamps_ns[0])} ns is older than the"
+                        f" newest archived sample at {newest} ns"
+                    )
+            pos = 0
+            while pos < len(timestamps_ns):
+                segment = self._writable_segment(timestamps_ns[pos], cell_ids)
+                # Rows that fit in this segment by capacity and time span
+                limit = min(len(timestamps_ns) - pos, segment.capacity - segment.count)
+                deadline = segment.start_ns + self.segment_ns
+                chunk = timestamps_ns[pos : pos + limit]
+                limit = int(np.searchsorted(chunk, deadline, "left")) or 1
+                rows = slice(segment.count, segment.count + limit)
+                timestamps, columns = segment.maps()
+                timestamps[rows] = timestamps_ns[pos : pos + limit]
+                for k, param in enumerate(self.params):
+                    columns[param][:, rows] = values[pos : pos + limit, :, k].T
+                segment.count += limit
+                pos += limit
+                self._unflushed += limit
+            if self._unflushed >= self.flush_every:
+                self._segments[-1].flush()
+                self._unflushed = 0
+
+    def _writable_segment(self, timestamp_ns, cell_ids):
+        """Return the active segment, rolling to a new one when needed"""
+        if self._segments:
+            segment = self._segments[-1]
+            if (
+                segment.writable
+                and segment.cell_ids == cell_ids
+                and segment.count < segment.capacity
+                and timestamp_ns < segment.start_ns + self.segment_ns
+            ):
+                return segment
+            segment.close()
+        path = os.path.join(self.root, f"seg_{int(timestamp_ns):020d}")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.root, f"seg_{int(timestamp_ns):020d}_{suffix}")
+            suffix += 1
+        segment = _Segment.create(
+            path, timestamp_ns, self._capacity(len(cell_ids)), cell_ids, self.params
+        )
+        self._segments.append(segment)
+        return segment
+
+    def _capacity(self, n_cells):
+        """Rows to preallocate for a new segment of ``n_cells`` cells"""
+        if self.segment_capacity is not None:
+            return int(self.segment_capacity)
+        rows = int(np.ceil(self.segment_ns / 1e9 * self.rate_hz))
+        return max(1, min(rows, MAX_COLUMN_BYTES // (8 * n_cells)))
+
+    def flush(self):
+        """Write pending samples and metadata to disk"""
+        with self._lock:
+            if self._segments:
+                self._segments[-1].flush()
+            self._unflushed = 0
+
+    def iter_chunks(self, cell_id, param, start_ns=None, end_ns=None):
+        """Yield zero-copy (timestamps, values) views per segment in a time range"""
+        for segment in self.segments:
+            if cell_id not in segment.cell_index or not segment.count:
+                continue
+            if end_ns is not None and segment.start_ns >= end_ns:
+                break
+            if start_ns is not None and segment.end_ns < start_ns:
+                continue
+            timestamps, columns = segment.maps()
+            rows = segment.window(timestamps, start_ns, end_ns)
+            if rows.stop > rows.start:
+                row = segment.cell_index[cell_id]
+                yield timestamps[rows], columns[param][row, rows]
+
+    def read(self, cell_id, param, start_ns=None, end_ns=None):
+        """Return (timestamps, values) for one cell parameter in a time range"""
+        chunks = list(self.iter_chunks(cell_id, param, start_ns, end_ns))
+        if not chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        if len(chunks) == 1:
+            return chunks[0]
+        return (
+            np.concatenate([timestamps for timestamps, _ in chunks]),
+            np.concatenate([values for _, values in chunks]),
+        )
+
+    def to_frame(self, start_ns=None, end_ns=None):
+        """Wide DataFrame of all archived cells in a time range"""
+        import pandas as pd
+
+        frames = []
+        for segment in self.segments:
+            if not segment.count:
+                continue
+            timestamps, columns = segment.maps()
+            rows = segment.window(timestamps, start_ns, end_ns)
+            if rows.stop <= rows.start:
+                continue
+            data = {"timestamp": pd.to_datetime(timestamps[rows])}
+            for cell_id, row in segment.cell_index.items():
+                for param in segment.params:
+                    data[f"{cell_id}_{param}"] = columns[param][row, rows]
+            frames.append(pd.DataFrame(data))
+        if not frames:
+            return pd.DataFrame(columns=["timestamp"])
+        return pd.concat(frames, ignore_index=True)
+
+
+def _write_meta(path, meta):
+    """Atomically replace a segment's meta.json"""
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
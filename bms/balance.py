@@ -0,0 +1,173 @@
+import numpy as np
+
+from bms.ecm import cell_parameters
+
+# Passive balancing: bleed resistor (Ω) and how far above the lowest cell
+# of its chemistry (V) a cell has to be to be bled
+BLEED_RESISTANCE = 33.0
+PASSIVE_THRESHOLD = 0.01
+
+# Share of the cells bled at once by the limited passive strategy (heat
+# budget of the balancing boards)
+PASSIVE_MAX_SHARE = 0.25
+
+# Active (cell-to-pack) balancing: transfer current (A) drawn from cells above
+# the mean until all are within ACTIVE_THRESHOLD (V), and the converter efficiency
+ACTIVE_CURRENT = 1.0
+ACTIVE_THRESHOLD = 0.005
+ACTIVE_EFFICIENCY = 0.9
+
+# Simulated time step (s) and the longest run before giving up (s)
+DEFAULT_BALANCE_STEP_S = 10.0
+MAX_BALANCE_S = 48 * 3600.0
+
+
+def passive_strategy(
+    resistance=BLEED_RESISTANCE, threshold=PASSIVE_THRESHOLD, max_share=None
+):
+    """Bleed cells above the lowest one through ``resistance``.
+
+    With ``max_share`` only that share of the cells (the highest ones) is
+    bled at a time. Returns a strategy: a function of the cell voltages
+    (V) returning each cell's balancing current (A, negative discharges).
+    """
+
+    def currents(voltage):
+        bleed = voltage > voltage.min() + threshold
+        if max_share is None:
+            return np.where(bleed, -voltage / resistance, 0.0)
+        max_cells = max(1, int(max_share * len(voltage)))
+        if np.count_nonzero(bleed) > max_cells:
+            bleed = np.zeros_like(bleed)
+            bleed[np.argpartition(voltage, -max_cells)[-max_cells:]] = True
+        return np.where(bleed, -voltage / resistance, 0.0)
+
+    return currents
+
+
+def active_strategy(
+    current=ACTIVE_CURRENT, threshold=ACTIVE_THRESHOLD, efficiency=ACTIVE_EFFICIENCY
+):
+    """Move charge from cells above the mean voltage to cells below it.
+
+    Until all cells are within ``threshold`` of each other, cells above
+    the mean discharge at ``current`` into a shared converter; what
+    arrives after ``efficiency`` is split among the cells below the mean
+    in proportion to their deficit.
+    """
+
+    def currents(voltage):
+        amps = np.zeros_like(voltage)
+        if np.ptp(voltage) <= threshold:
+            return amps
+        mean = voltage.mean()
+        donors = voltage > mean
+        deficit = np.maximum(mean - voltage, 0.0)
+        amps[donors] = -current
+        power = efficiency * current * voltage[donors].sum()
+        receivers = deficit > 0
+        amps[receivers] = (
+            power * deficit[receivers] / deficit.sum() / voltage[receivers]
+        )
+        return amps
+
+    return currents
+
+
+# Strategies offered by the app and the CLI
+BALANCE_STRATEGIES = {
+    "passive": passive_strategy(),
+    "passive-limited": passive_strategy(max_share=PASSIVE_MAX_SHARE),
+    "active": active_strategy(),
+}
+
+
+class CellBalancer:
+    """Time-domain simulation of balancing a pack at rest.
+
+    Cells start at the SOC matching their voltage (or the given ``soc``)
+    and are compared within their chemistry, since cells of different
+    chemistries are never balanced against each other. Every step asks
+    the strategy for the balancing currents of all cells, integrates
+    them into SOC and books the energy that leaves the cells as heat,
+    until the strategy has nothing left to do.
+    """
+
+    def __init__(self, pack, soc=None):
+        self.pack = pack
+        self.table = pack.table
+        self.codes = pack.data["chemistry"].copy()
+        self.temp = pack.data["temp"].copy()
+        self.capacity_as = cell_parameters(pack)["capacity_as"]
+        if soc is None:
+            soc = self.table.soc(pack.data["voltage"], self.codes, self.temp)
+        self.soc = np.clip(np.asarray(soc, dtype=np.float64), 0.0, 1.0) * np.ones(
+            len(pack)
+        )
+        self.groups = [
+            np.flatnonzero(self.codes == code) for code in np.unique(self.codes)
+        ]
+
+    def voltage(self, soc=None):
+        """Open-circuit voltage of every cell at ``soc`` (default: the start)"""
+        return self.table.ocv(self.soc if soc is None else soc, self.codes, self.temp)
+
+    def spread(self, values):
+        """Largest max - min of ``values`` within a chemistry"""
+        return max(
+            (float(np.ptp(values[group])) for group in self.groups if len(group)),
+            default=0.0,
+        )
+
+    def run(self, strategy, dt_s=DEFAULT_BALANCE_STEP_S, max_s=MAX_BALANCE_S):
+        """Balance from the starting state with ``strategy``.
+
+        Returns a dict with whether the strategy finished within
+        ``max_s`` (converged), the time taken (time_s), the energy
+        dissipated (energy_j), the voltage and SOC spreads before and
+        after, and the final per-cell SOC.
+        """
+        soc = self.soc.copy()
+        voltage = self.voltage(soc)
+        before = (self.spread(voltage), self.spread(soc))
+        energy_j = elapsed = 0.0
+        converged = False
+        amps = np.zeros_like(soc)
+        while elapsed < max_s:
+            for group in self.groups:
+                amps[group] = strategy(voltage[group])
+            if not amps.any():
+                converged = True
+                break
+            energy_j -= float(voltage @ amps) * dt_s
+            soc += amps * dt_s / self.capacity_as
+            np.clip(soc, 0.0, 1.0, out=soc)
+            voltage = self.voltage(soc)
+            elapsed += dt_s
+        return {
+            "converged": converged,
+            "time_s": elapsed,
+            "energy_j": energy_j,
+            "voltage_spread_before": before[0],
+            "voltage_spread_after": self.spread(voltage),
+            "soc_spread_before": before[1],
+            "soc_spread_after": self.spread(soc),
+            "soc": soc,
+        }
+
+    def sweep(self, strategies=None, dt_s=DEFAULT_BALANCE_STEP_S, max_s=MAX_BALANCE_S):
+        """Run every strategy (default BALANCE_STRATEGIES) from the same start"""
+        strategies = BALANCE_STRATEGIES if strategies is None else strategies
+        return {
+            name: self.run(strategy, dt_s, max_s)
+            for name, strategy in strategies.items()
+        }
+
+    def apply(self, result):
+        """Store the cells as balanced by ``result`` in the pack, at rest"""
+        voltage = self.voltage(result["soc"])
+        data = self.pack.data
+        data["voltage"] = voltage
+        data["current"] = 0.0
+        data["power"] = 0.0
+        return voltage
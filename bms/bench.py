@@ -0,0 +1,406 @@
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from bms.alerts import safety_issues
+from bms.charts import (
+    cell_history_figure,
+    correlation_figure,
+    distribution_figure,
+    summary_table,
+)
+from bms.chemistry import CELL_SPECS, calculate_soc, get_cell_status
+from bms.ekf import SocEstimator
+from bms.health import HealthEstimator
+from bms.export import config_backup, current_state_frame, excel_report, to_csv
+from bms.history import HISTORY_PARAMS, HistoryStore, record_sample
+from bms.pack import PackState
+from bms.synthetic import generate_history
+from bms.topology import PackTopology
+
+DEFAULT_CELLS = (8, 64, 512, 4096, 10_000)
+DEFAULT_HISTORY = (100, 10_000, 1_000_000, 10_000_000)
+
+# In-memory history larger than this is skipped rather than allocated
+DEFAULT_MEMORY_BUDGET = 2 * 1024**3
+
+# Excel caps sheets at 1,048,576 rows and 16,384 columns
+EXCEL_MAX_ROWS = 1_048_575
+EXCEL_MAX_COLUMNS = 16_384
+
+# Values (samples x cells x params) above which whole-history exports are skipped
+DEFAULT_EXPORT_LIMIT = 20_000_000
+
+
+def build_pack(n_cells, seed=0):
+    """Pack of ``n_cells`` mixed-chemistry cells with some out-of-limit readings"""
+    rng = np.random.default_rng(seed)
+    chemistries = list(CELL_SPECS)
+    pack = PackState()
+    PackTopology(n_cells).build(
+        pack,
+        [chemistries[i % len(chemistries)] for i in range(n_cells)],
+        CELL_SPECS,
+        temp=rng.uniform(25, 35, n_cells),
+    )
+    pack.data["voltage"] += rng.normal(0.0, 0.3, n_cells)
+    pack.data["current"] = rng.uniform(-5, 5, n_cells)
+    pack.data["power"] = pack.data["voltage"] * pack.data["current"]
+    return pack
+
+
+def history_bytes(n_cells, n_samples, n_params=len(HISTORY_PARAMS)):
+    """Memory a HistoryStore holding ``n_samples`` for ``n_cells`` would need"""
+    return 2 * n_samples * (8 + n_cells * n_params * 8)
+
+
+def build_history(pack, n_samples, seed=0):
+    history = HistoryStore(n_samples)
+    generate_history(pack, history, n_samples=n_samples, seed=seed)
+    return history
+
+
+# Each case takes (pack, history, export_limit) and returns (callable, items
+# per call) or a skip reason; ``history`` is None for pack-only cases.
+
+
+def case_ingest(pack, history, export_limit):
+    return (lambda: record_sample(pack, history)), 1
+
+
+def case_status_scalar(pack, history, export_limit):
+    cells = pack.items()
+    chemistries = [pack.chemistry_of(cell_id) for cell_id, _ in cells]
+
+    def run():
+        for (_, cell_data), chemistry in zip(cells, chemistries):
+            get_cell_status(cell_data, chemistry)
+
+    return run, len(pack)
+
+
+def case_status(pack, history, export_limit):
+    return pack.status_codes, len(pack)
+
+
+def case_soc_scalar(pack, history, export_limit):
+    voltages = pack.data["voltage"].tolist()
+    chemistries = [pack.chemistry_of(cell_id) for cell_id in pack.cell_ids]
+
+    def run():
+        for voltage, chemistry in zip(voltages, chemistries):
+            calculate_soc(voltage, chemistry)
+
+    return run, len(pack)
+
+
+def case_soc(pack, history, export_limit):
+    return pack.soc, len(pack)
+
+
+def case_soc_history(pack, history, export_limit):
+    return (lambda: pack.soc_history(history)), len(history) * len(pack)
+
+
+def case_soc_filter(pack, history, export_limit):
+    estimator = SocEstimator(pack)
+    clock = iter(range(1, 1 << 62, 1_000_000_000))  # 1 s between readings
+
+    def run():
+        estimator.update_pack(pack, next(clock))
+
+    return run, len(pack)
+
+
+def case_health(pack, history, export_limit):
+    # A fresh estimator consumes the whole history, as on a first page render
+    return (lambda: HealthEstimator(pack).follow(history)), len(history) * len(pack)
+
+
+def case_alerts(pack, history, export_limit):
+    return (lambda: safety_issues(pack)), len(pack)
+
+
+def case_export_json(pack, history, export_limit):
+    return (lambda: config_backup(pack)), len(pack)
+
+
+def case_export_current(pack, history, export_limit):
+    return (lambda: to_csv(current_state_frame(pack))), len(pack)
+
+
+def case_eda(pack, history, export_limit):
+    cell_id = pack.cell_ids[0]
+    cell_data = pack[cell_id]
+
+    def run():
+        # Force a rebuild of the cached frame, as after a new sample
+        history.version += 1
+        cell_frame = history.cell_frame(cell_id)
+        cell_history_figure(history, cell_id, cell_id).to_json()
+        for param in ("voltage", "temp"):
+            distribution_figure(
+                cell_frame, param, cell_data[param], param, "#1f77b4"
+            ).to_json()
+        summary_table(cell_frame, cell_data, history.params)
+        correlation_figure(cell_frame, cell_id).to_json()
+
+    return run, 1
+
+
+def case_export_csv(pack, history, export_limit):
+    values = len(history) * len(pack) * len(history.params)
+    if values > export_limit:
+        return f"{values:,} values > export limit"
+    return (lambda: to_csv(history.to_frame())), len(history)
+
+
+def case_export_excel(pack, history, export_limit):
+    columns = 1 + len(pack) * len(history.params)
+    if len(history) > EXCEL_MAX_ROWS or columns > EXCEL_MAX_COLUMNS:
+        return "over Excel sheet limits"
+    values = len(history) * len(pack) * len(history.params)
+    if values > export_limit // 10:
+        return f"{values:,} values > export limit"
+    current_df = current_state_frame(pack)
+    return (lambda: excel_report(current_df, history.to_frame())), len(history)
+
+
+# name -> (case, needs history)
+CASES = {
+    "ingest": (case_ingest, True),
+    "status_scalar": (case_status_scalar, False),
+    "status": (case_status, False),
+    "soc_scalar": (case_soc_scalar, False),
+    "soc": (case_soc, False),
+    "soc_history": (case_soc_history, True),
+    "soc_filter": (case_soc_filter, False),
+    "health": (case_health, True),
+    "alerts": (case_alerts, False),
+    "export_json": (case_export_json, False),
+    "export_current": (case_export_current, False),
+    "eda": (case_eda, True),
+    "export_csv": (case_export_csv, True),
+    "export_excel": (case_export_excel, True),
+}
+
+
+def measure(run, items, repeat, max_seconds):
+    """Time ``run`` up to ``repeat`` times (at least once) and trace one more call"""
+    run()  # warm-up, fills caches the way a page rerun would
+    latencies = []
+    deadline = time.perf_counter() + max_seconds
+    while len(latencies) < repeat and (not latencies or time.perf_counter() < deadline):
+        start = time.perf_counter_ns()
+        run()
+        latencies.append(time.perf_counter_ns() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) / 1e6
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "calls": len(latencies),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "items_per_s": float(items / (latencies.mean() / 1e3)),
+        "peak_mb": peak / 1024**2,
+    }
+
+
+def run_suite(
+    cells=DEFAULT_CELLS,
+    history=DEFAULT_HISTORY,
+    cases=tuple(CASES),
+    repeat=20,
+    max_seconds=5.0,
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+    export_limit=DEFAULT_EXPORT_LIMIT,
+    report=None,
+):
+    """Run every case over the cell/history grid and return a list of result dicts.
+
+    ``report`` is called with each result as soon as it is available.
+    """
+    results = []
+    options = (repeat, max_seconds, export_limit)
+
+    def record(result):
+        results.append(result)
+        if report is not None:
+            report(result)
+
+    for n_cells in cells:
+        pack = build_pack(n_cells)
+        for name in cases:
+            case, needs_history = CASES[name]
+            if not needs_history:
+                record(_run_case(name, case, pack, None, n_cells, None, options))
+
+        history_cases = [name for name in cases if CASES[name][1]]
+        for n_samples in history if history_cases else ():
+            needed = history_bytes(n_cells, n_samples)
+            if needed > memory_budget:
+                for name in history_cases:
+                    record(
+                        _skipped(
+                            name, n_cells, n_samples, f"needs {needed / 1024**3:.1f} GB"
+                        )
+                    )
+                continue
+            store = build_history(pack, n_samples)
+            for name in history_cases:
+                case = CASES[name][0]
+                record(_run_case(name, case, pack, store, n_cells, n_samples, options))
+            del store
+            gc.collect()
+    return results
+
+
+def _run_case(name, case, pack, history, n_cells, n_samples, options):
+    repeat, max_seconds, export_limit = options
+    prepared = case(pack, history, export_limit)
+    if isinstance(prepared, str):
+        return _skipped(name, n_cells, n_samples, prepared)
+    run, items = prepared
+    result = {"case": name, "cells": n_cells, "history": n_samples}
+    result.update(measure(run, items, repeat, max_seconds))
+    return result
+
+
+def _skipped(name, n_cells, n_samples, reason):
+    return {"case": name, "cells": n_cells, "history": n_samples, "skipped": reason}
+
+
+def format_result(result):
+    history = "-" if result["history"] is None else f"{result['history']:,}"
+    head = f"{result['case']:<15} {result['cells']:>7,} {history:>11}"
+    if "skipped" in result:
+        return f"{head}  skipped: {result['skipped']}"
+    return (
+        f"{head} {result['items_per_s']:>13,.0f} {result['p50_ms']:>10.3f}"
+        f" {result['p95_ms']:>10.3f} {result['p99_ms']:>10.3f} {result['peak_mb']:>9.1f}"
+    )
+
+
+HEADER = (
+    f"{'case':<15} {'cells':>7} {'history':>11} {'items/s':>13} {'p50 ms':>10}"
+    f" {'p95 ms':>10} {'p99 ms':>10} {'peak MB':>9}"
+)
+
+
+def compare(results, baseline, tolerance):
+    """Return descriptions of cases whose p50 is slower than the baseline by ``tolerance``"""
+    previous = {
+        (entry["case"], entry["cells"], entry["history"]): entry
+        for entry in baseline
+        if "skipped" not in entry
+    }
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["cells"], result["history"]))
+        if old is None or "skipped" in result:
+            continue
+        if result["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{result['case']} cells={result['cells']} history={result['history']}:"
+                f" p50 {old['p50_ms']:.3f} -> {result['p50_ms']:.3f} ms"
+            )
+    return regressions
+
+
+def _int_list(text):
+    return [int(float(value)) for value in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bms.bench",
+        description="Benchmark ingest, evaluation, chart and export paths without a browser.",
+    )
+    parser.add_argument(
+        "--cells",
+        type=_int_list,
+        default=list(DEFAULT_CELLS),
+        help="comma-separated cell counts",
+    )
+    parser.add_argument(
+        "--history",
+        type=_int_list,
+        default=list(DEFAULT_HISTORY),
+        help="comma-separated history lengths (samples)",
+    )
+    parser.add_argument(
+        "--cases",
+        default=",".join(CASES),
+        help=f"comma-separated subset of: {', '.join(CASES)}",
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per case")
+    parser.add_argument(
+        "--max-seconds", type=float, default=5.0, help="time budget per case"
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=DEFAULT_MEMORY_BUDGET / 1024**3,
+        help="skip history sizes needing more GB than this",
+    )
+    parser.add_argument(
+        "--export-limit",
+        type=float,
+        default=DEFAULT_EXPORT_LIMIT,
+        help="skip whole-history exports above this many values",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --json")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed p50 slowdown against the baseline (0.25 = 25%%)",
+    )
+    args = parser.parse_args(argv)
+
+    cases = [name.strip() for name in args.cases.split(",") if name.strip()]
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    print(HEADER)
+    results = run_suite(
+        cells=args.cells,
+        history=args.history,
+        cases=cases,
+        repeat=args.repeat,
+        max_seconds=args.max_seconds,
+        memory_budget=args.memory_budget * 1024**3,
+        export_limit=int(args.export_limit),
+        report=lambda result: print(format_result(result), flush=True),
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
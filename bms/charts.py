@@ -0,0 +1,138 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from bms.decimate import decimate, envelope
+from bms.history import DEFAULT_TARGET_POINTS
+
+# (param, trace name, color, row, col, axis title) of the history subplots
+HISTORY_PANELS = (
+    ("voltage", "Voltage", "blue", 1, 1, "Voltage (V)"),
+    ("current", "Current", "red", 1, 2, "Current (A)"),
+    ("temp", "Temperature", "orange", 2, 1, "Temperature (°C)"),
+    ("power", "Power", "green", 2, 2, "Power (W)"),
+)
+
+
+def add_history_trace(
+    fig, selection, name, color, row, col, points=DEFAULT_TARGET_POINTS, method="minmax"
+):
+    """Plot a history selection, with a min/max band when it comes from a rollup"""
+    if selection.lower is not None:
+        band_x, lower, upper = envelope(
+            selection.timestamps, selection.lower, selection.upper, points
+        )
+        band_x = pd.to_datetime(band_x)
+        fig.add_trace(
+            go.Scatter(
+                x=band_x,
+                y=upper,
+                line=dict(width=0),
+                hoverinfo="skip",
+                showlegend=False,
+            ),
+            row=row,
+            col=col,
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=band_x,
+                y=lower,
+                line=dict(width=0),
+                fill="tonexty",
+                fillcolor=color,
+                opacity=0.2,
+                hoverinfo="skip",
+                showlegend=False,
+            ),
+            row=row,
+            col=col,
+        )
+        name = f"{name} ({selection.resolution_s}s mean)"
+
+    x, y = decimate(selection.timestamps, selection.values, points, method)
+    fig.add_trace(
+        go.Scatter(
+            x=pd.to_datetime(x),
+            y=y,
+            name=name,
+            line=dict(color=color, width=2),
+        ),
+        row=row,
+        col=col,
+    )
+
+
+def cell_history_figure(
+    history, cell_id, cell_name, points=DEFAULT_TARGET_POINTS, method="minmax"
+):
+    """2x2 voltage/current/temperature/power time series of one cell"""
+    fig = make_subplots(
+        rows=2,
+        cols=2,
+        subplot_titles=[
+            f"{cell_name} - {name} Over Time" for _, name, *_ in HISTORY_PANELS
+        ],
+        specs=[
+            [{"secondary_y": False}, {"secondary_y": False}],
+            [{"secondary_y": False}, {"secondary_y": False}],
+        ],
+    )
+    for param, name, color, row, col, _ in HISTORY_PANELS:
+        selection = history.select(cell_id, param, target_points=points)
+        add_history_trace(fig, selection, name, color, row, col, points, method)
+
+    fig.update_layout(height=600, showlegend=False)
+    fig.update_xaxes(title_text="Time")
+    for _, _, _, row, col, title in HISTORY_PANELS:
+        fig.update_yaxes(title_text=title, row=row, col=col)
+    return fig
+
+
+def distribution_figure(cell_frame, param, current, title, color):
+    """Histogram of one parameter with the current reading marked"""
+    fig = px.histogram(
+        cell_frame,
+        x=param,
+        nbins=20,
+        title=title,
+        color_discrete_sequence=[color],
+    )
+    fig.add_vline(
+        x=current,
+        line_dash="dash",
+        line_color="red",
+        annotation_text="Current",
+    )
+    return fig
+
+
+def summary_table(cell_frame, cell_data, params):
+    """Current value and mean/std/min/max/range per parameter"""
+    summary = cell_frame.agg(["mean", "std", "min", "max"])
+    stats_data = []
+    for param in params:
+        stats_data.append(
+            {
+                "Parameter": param.title(),
+                "Current": f"{cell_data[param]:.3f}",
+                "Mean": f"{summary.at['mean', param]:.3f}",
+                "Std Dev": f"{summary.at['std', param]:.3f}",
+                "Min": f"{summary.at['min', param]:.3f}",
+                "Max": f"{summary.at['max', param]:.3f}",
+                "Range": f"{summary.at['max', param] - summary.at['min', param]:.3f}",
+            }
+        )
+    return pd.DataFrame(stats_data)
+
+
+def correlation_figure(cell_frame, cell_name):
+    fig = px.imshow(
+        cell_frame.corr(),
+        title=f"{cell_name} - Parameter Correlation Matrix",
+        color_continuous_scale="RdBu_r",
+        aspect="auto",
+    )
+    fig.update_layout(height=400)
+    return fig
@@ -0,0 +1,282 @@
+import numpy as np
+
+# Cell specifications
+CELL_SPECS = {
+    "lfp": {
+        "name": "Lithium Iron Phosphate (LFP)",
+        "nominal_voltage": 3.2,
+        "min_voltage": 2.8,
+        "max_voltage": 3.6,
+        "max_temp": 60,
+        "min_temp": -20,
+        "color": "#2E8B57",
+    },
+    "nmc": {
+        "name": "Nickel Manganese Cobalt (NMC)",
+        "nominal_voltage": 3.6,
+        "min_voltage": 3.0,
+        "max_voltage": 4.2,
+        "max_temp": 45,
+        "min_temp": -10,
+        "color": "#FF6347",
+    },
+    "lto": {
+        "name": "Lithium Titanate (LTO)",
+        "nominal_voltage": 2.4,
+        "min_voltage": 1.5,
+        "max_voltage": 2.8,
+        "max_temp": 55,
+        "min_temp": -30,
+        "color": "#4169E1",
+    },
+    "nca": {
+        "name": "Nickel Cobalt Aluminum (NCA)",
+        "nominal_voltage": 3.6,
+        "min_voltage": 3.0,
+        "max_voltage": 4.2,
+        "max_temp": 45,
+        "min_temp": -10,
+        "color": "#FF1493",
+    },
+}
+
+# Open-circuit voltage (V) against state of charge (0-1) per chemistry
+OCV_CHEMISTRIES = ("lfp", "nmc", "lto", "nca")
+OCV_TABLE = np.array(
+    [
+        # SOC   LFP   NMC   LTO   NCA
+        [0.00, 2.80, 3.00, 1.50, 3.00],
+        [0.05, 3.05, 3.30, 1.90, 3.25],
+        [0.10, 3.20, 3.45, 2.05, 3.40],
+        [0.20, 3.25, 3.55, 2.15, 3.50],
+        [0.30, 3.28, 3.60, 2.20, 3.56],
+        [0.40, 3.29, 3.64, 2.24, 3.62],
+        [0.50, 3.30, 3.68, 2.28, 3.68],  # LFP's long, nearly flat plateau
+        [0.60, 3.31, 3.74, 2.32, 3.75],
+        [0.70, 3.32, 3.82, 2.36, 3.84],
+        [0.80, 3.33, 3.90, 2.42, 3.94],
+        [0.90, 3.35, 4.00, 2.52, 4.05],
+        [0.95, 3.40, 4.08, 2.62, 4.12],
+        [1.00, 3.60, 4.20, 2.80, 4.20],
+    ]
+)
+OCV_SOC_POINTS = OCV_TABLE[:, 0]
+
+
+# Change of OCV with temperature (V/K) around OCV_REFERENCE_TEMP (°C)
+OCV_TEMP_COEFFICIENT = {"lfp": -0.05e-3, "nmc": -0.1e-3, "lto": 0.05e-3, "nca": -0.1e-3}
+OCV_REFERENCE_TEMP = 25.0
+
+# Points of the uniform SOC and voltage grids the OCV curves are resampled
+# on; 0.1 % SOC steps keep the table's breakpoints exact
+OCV_GRID_POINTS = 1001
+
+# Columns of the precomputed limit table
+LIMIT_FIELDS = (
+    "nominal_voltage",
+    "min_voltage",
+    "max_voltage",
+    "min_temp",
+    "max_temp",
+    # Status thresholds used by get_cell_status and PackState.status_codes
+    "v_critical_low",
+    "v_warning_low",
+    "v_warning_high",
+    "v_critical_high",
+    "t_critical_low",
+    "t_warning_low",
+    "t_warning_high",
+    "t_critical_high",
+)
+LIMIT_DTYPE = np.dtype([(field, np.float64) for field in LIMIT_FIELDS])
+
+
+def ocv_curve(key, spec):
+    """(SOC points, OCV) of a chemistry, both increasing.
+
+    Taken from the spec's "ocv_curve" when given, else from OCV_TABLE;
+    other chemistries get a straight line between their voltage limits.
+    """
+    if "ocv_curve" in spec:
+        soc_points, ocv_points = spec["ocv_curve"]
+        return np.asarray(soc_points, dtype=float), np.asarray(ocv_points, dtype=float)
+    if key in OCV_CHEMISTRIES:
+        return OCV_SOC_POINTS, OCV_TABLE[:, 1 + OCV_CHEMISTRIES.index(key)]
+    return np.array([0.0, 1.0]), np.array([spec["min_voltage"], spec["max_voltage"]])
+
+
+def _uniform_lookup(table, codes, x, lo, hi):
+    """Interpolate rows ``codes`` of ``table``, sampled uniformly on [lo, hi], at ``x``"""
+    last = table.shape[1] - 1
+    position = np.clip((np.asarray(x, dtype=np.float64) - lo) / (hi - lo), 0.0, 1.0)
+    position = np.nan_to_num(position * last)  # NaN readings are restored below
+    index = np.minimum(position.astype(np.intp), last - 1)
+    fraction = position - index
+    left = table[codes, index]
+    value = left + (table[codes, index + 1] - left) * fraction
+    return np.where(np.isnan(x), np.nan, value)
+
+
+class ChemistryTable:
+    """Precomputed limits for every chemistry, indexed by chemistry code.
+
+    Each chemistry is one row of a structured array holding its spec
+    values and all warning/critical bounds, so status and SOC checks are
+    plain array indexing. Registering a custom chemistry adds one row.
+    """
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.keys = []
+        self.codes = {}
+        self.limits = np.zeros(0, dtype=LIMIT_DTYPE)
+        self.names = np.array([], dtype=object)
+        self.colors = np.array([], dtype=object)
+        # OCV on a uniform SOC grid and its inverse, SOC on a uniform voltage
+        # grid spanning ``ocv_range``, so lookups need no search
+        self.ocv_table = np.zeros((0, OCV_GRID_POINTS))
+        self.soc_table = np.zeros((0, OCV_GRID_POINTS))
+        self.ocv_slope_table = np.zeros((0, OCV_GRID_POINTS))  # dOCV/dSOC
+        self.ocv_range = np.zeros((0, 2))
+        self.ocv_temp_coefficient = np.zeros(0)
+        for key in list(specs):
+            self._add_row(key, specs[key])
+
+    def _add_row(self, key, spec):
+        row = np.zeros(1, dtype=LIMIT_DTYPE)
+        for field in ("nominal_voltage", "min_voltage", "max_voltage"):
+            row[field] = spec[field]
+        row["min_temp"] = spec["min_temp"]
+        row["max_temp"] = spec["max_temp"]
+        row["v_critical_low"] = spec["min_voltage"] * 0.95
+        row["v_warning_low"] = spec["min_voltage"] * 1.05
+        row["v_warning_high"] = spec["max_voltage"] * 0.95
+        row["v_critical_high"] = spec["max_voltage"] * 1.05
+        row["t_critical_low"] = spec["min_temp"]
+        row["t_warning_low"] = spec["min_temp"] + 5
+        row["t_warning_high"] = spec["max_temp"] - 5
+        row["t_critical_high"] = spec["max_temp"]
+
+        soc_points, ocv_points = ocv_curve(key, spec)
+        grid = np.linspace(0.0, 1.0, OCV_GRID_POINTS)
+        ocv_range = [ocv_points[0], ocv_points[-1]]
+        ocv_row = np.interp(grid, soc_points, ocv_points)
+        slope_row = np.gradient(ocv_row, grid)
+        soc_row = np.interp(
+            np.linspace(*ocv_range, OCV_GRID_POINTS), ocv_points, soc_points
+        )
+        coefficient = spec.get(
+            "ocv_temp_coefficient", OCV_TEMP_COEFFICIENT.get(key, 0.0)
+        )
+
+        if key in self.codes:
+            code = self.codes[key]
+            self.limits[code] = row[0]
+            self.names[code] = spec["name"]
+            self.colors[code] = spec.get("color", "#808080")
+            self.ocv_table[code] = ocv_row
+            self.soc_table[code] = soc_row
+            self.ocv_slope_table[code] = slope_row
+            self.ocv_range[code] = ocv_range
+            self.ocv_temp_coefficient[code] = coefficient
+            return
+        self.codes[key] = len(self.keys)
+        self.keys.append(key)
+        self.limits = np.concatenate([self.limits, row])
+        self.names = np.append(self.names, spec["name"])
+        self.colors = np.append(self.colors, spec.get("color", "#808080"))
+        self.ocv_table = np.vstack([self.ocv_table, ocv_row])
+        self.soc_table = np.vstack([self.soc_table, soc_row])
+        self.ocv_slope_table = np.vstack([self.ocv_slope_table, slope_row])
+        self.ocv_range = np.vstack([self.ocv_range, ocv_range])
+        self.ocv_temp_coefficient = np.append(self.ocv_temp_coefficient, coefficient)
+
+    def register(self, key, spec):
+        """Add (or update) a chemistry and its limit row"""
+        self.specs[key] = spec
+        self._add_row(key, spec)
+
+    def code(self, key):
+        return self.codes[key]
+
+    def ocv(self, soc, codes, temp=None):
+        """Open-circuit voltage at ``soc`` (0-1) for cells of chemistry ``codes``.
+
+        Arrays of any shape broadcast against each other, so a whole pack
+        or whole history columns are looked up at once. With ``temp``
+        (°C) the OCV is shifted by the chemistry's temperature coefficient.
+        """
+        codes = np.asarray(codes)
+        ocv = _uniform_lookup(self.ocv_table, codes, soc, 0.0, 1.0)
+        if temp is not None:
+            shift = self.ocv_temp_coefficient[codes] * (temp - OCV_REFERENCE_TEMP)
+            ocv = ocv + shift
+        return ocv
+
+    def ocv_slope(self, soc, codes):
+        """dOCV/dSOC (V per unit SOC) at ``soc`` for cells of chemistry ``codes``"""
+        return _uniform_lookup(self.ocv_slope_table, np.asarray(codes), soc, 0.0, 1.0)
+
+    def soc(self, voltage, codes, temp=None):
+        """State of charge (0-1) of cells resting at ``voltage``, inverse of ``ocv``"""
+        codes = np.asarray(codes)
+        if temp is not None:
+            shift = self.ocv_temp_coefficient[codes] * (temp - OCV_REFERENCE_TEMP)
+            voltage = voltage - shift
+        bounds = self.ocv_range[codes]
+        return _uniform_lookup(
+            self.soc_table, codes, voltage, bounds[..., 0], bounds[..., 1]
+        )
+
+    def column(self, field):
+        """One value per chemistry code for a limit field, 'name' or 'color'"""
+        if field == "name":
+            return self.names
+        if field == "color":
+            return self.colors
+        return self.limits[field]
+
+
+CHEMISTRY_TABLE = ChemistryTable(CELL_SPECS)
+
+
+def register_chemistry(key, spec):
+    """Make a custom chemistry available everywhere CELL_SPECS is used"""
+    CHEMISTRY_TABLE.register(key, spec)
+
+
+def get_cell_status(cell_data, cell_type):
+    """Determine cell status based on operating parameters"""
+    limits = CHEMISTRY_TABLE.limits[CHEMISTRY_TABLE.codes[cell_type]]
+    voltage = cell_data["voltage"]
+    temp = cell_data["temp"]
+
+    # Check voltage range
+    if voltage < limits["v_critical_low"] or voltage > limits["v_critical_high"]:
+        return "critical"
+    elif voltage < limits["v_warning_low"] or voltage > limits["v_warning_high"]:
+        return "warning"
+
+    # Check temperature range
+    if temp < limits["t_critical_low"] or temp > limits["t_critical_high"]:
+        return "critical"
+    elif temp < limits["t_warning_low"] or temp > limits["t_warning_high"]:
+        return "warning"
+
+    return "healthy"
+
+
+def calculate_soc(voltage, cell_type, temp=None):
+    """State of charge (%) of a resting cell from its chemistry's OCV curve"""
+    table = CHEMISTRY_TABLE
+    code = table.codes[cell_type]
+    if temp is not None:
+        shift = table.ocv_temp_coefficient[code] * (temp - OCV_REFERENCE_TEMP)
+        voltage = voltage - shift
+    # Same lookup as ChemistryTable.soc on plain floats, for one cell at a time
+    low, high = table.ocv_range[code]
+    last = OCV_GRID_POINTS - 1
+    position = min(max((voltage - low) / (high - low), 0.0), 1.0) * last
+    index = min(int(position), last - 1)
+    row = table.soc_table[code]
+    return float(row[index] + (row[index + 1] - row[index]) * (position - index)) * 100
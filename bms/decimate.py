@@ -0,0 +1,86 @@
+import numpy as np
+
+DECIMATION_METHODS = ("minmax", "lttb")
+
+
+def _finite(x, y):
+    """Drop samples whose value is NaN"""
+    mask = ~np.isnan(y)
+    if mask.all():
+        return np.asarray(x), np.asarray(y)
+    return np.asarray(x)[mask], np.asarray(y)[mask]
+
+
+def minmax(x, y, n_out):
+    """Keep the minimum and maximum of each bucket so no spike is lost.
+
+    Returns at most ``n_out`` points including the first and last sample.
+    """
+    x, y = _finite(x, y)
+    n = len(y)
+    if n <= n_out or n_out < 4:
+        return x, y
+    n_buckets = (n_out - 2) // 2
+    size = -(-(n - 2) // n_buckets)
+    body = np.full(n_buckets * size, np.nan)
+    body[: n - 2] = y[1:-1]
+    body = body.reshape(n_buckets, size)
+    # Buckets past the end of the data are entirely NaN
+    filled = ~np.isnan(body).all(axis=1)
+    rows = np.flatnonzero(filled)
+    lows = np.nanargmin(body[filled], axis=1) + rows * size + 1
+    highs = np.nanargmax(body[filled], axis=1) + rows * size + 1
+    keep = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    return x[keep], y[keep]
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling to ``n_out`` points"""
+    x, y = _finite(x, y)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+    # Work on float x so datetimes and integer timestamps behave the same
+    xf = x.astype("datetime64[ns]").astype(np.float64) if x.dtype.kind == "M" else x
+    xf = np.asarray(xf, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        next_hi = max(next_hi, next_lo + 1)
+        avg_x = xf[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs(
+            (xf[a] - avg_x) * (y[lo:hi] - y[a]) - (xf[a] - xf[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def decimate(x, y, n_out, method="minmax"):
+    """Reduce a series to about ``n_out`` points with the chosen method"""
+    if method == "minmax":
+        return minmax(x, y, n_out)
+    if method == "lttb":
+        return lttb(x, y, n_out)
+    raise ValueError(f"unknown decimation method: {method}")
+
+
+def envelope(x, lower, upper, n_out):
+    """Merge neighbouring min/max buckets so a band fits in ``n_out`` points"""
+    n = len(x)
+    if n <= n_out:
+        return x, lower, upper
+    size = -(-n // n_out)
+    starts = np.arange(0, n, size)
+    return (
+        np.asarray(x)[starts],
+        np.fmin.reduceat(lower, starts),
+        np.fmax.reduceat(upper, starts),
+    )
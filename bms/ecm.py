@@ -0,0 +1,249 @@
+from datetime import datetime
+
+import numpy as np
+
+from bms.history import HISTORY_PARAMS
+
+# Equivalent-circuit parameters per chemistry: capacity (Ah), series
+# resistance R0 (Ω) and two RC pairs (Ω, time constant in s)
+ECM_PARAMS = {
+    "lfp": {
+        "capacity_ah": 3.2,
+        "r0": 0.015,
+        "r1": 0.008,
+        "tau1": 12.0,
+        "r2": 0.012,
+        "tau2": 400.0,
+    },
+    "nmc": {
+        "capacity_ah": 2.5,
+        "r0": 0.025,
+        "r1": 0.012,
+        "tau1": 10.0,
+        "r2": 0.018,
+        "tau2": 300.0,
+    },
+    "lto": {
+        "capacity_ah": 2.0,
+        "r0": 0.008,
+        "r1": 0.004,
+        "tau1": 8.0,
+        "r2": 0.006,
+        "tau2": 200.0,
+    },
+    "nca": {
+        "capacity_ah": 3.0,
+        "r0": 0.030,
+        "r1": 0.014,
+        "tau1": 10.0,
+        "r2": 0.020,
+        "tau2": 300.0,
+    },
+}
+
+# Used for chemistries registered without their own parameters
+DEFAULT_ECM_PARAMS = {
+    "capacity_ah": 2.5,
+    "r0": 0.02,
+    "r1": 0.01,
+    "tau1": 10.0,
+    "r2": 0.015,
+    "tau2": 300.0,
+}
+
+# Simulated time step (s)
+DEFAULT_STEP_S = 1.0
+
+# Upper bound on values buffered before a block is written to the history
+BLOCK_ELEMENTS = 4_000_000
+
+
+def cell_parameters(pack):
+    """Per-cell circuit parameters: capacity_as (A·s), r0 (n,), r and tau (2, n)"""
+    keys = pack.table.keys
+    per_code = [ECM_PARAMS.get(key, DEFAULT_ECM_PARAMS) for key in keys]
+    codes = pack.data["chemistry"]
+
+    def column(name):
+        values = np.array([params[name] for params in per_code], dtype=np.float64)
+        return values[codes] if len(pack) else np.zeros(0)
+
+    return {
+        "capacity_as": column("capacity_ah") * 3600,
+        "r0": column("r0"),
+        "r": np.stack([column("r1"), column("r2")]),
+        "tau": np.stack([column("tau1"), column("tau2")]),
+    }
+
+
+def dc_resistance(pack):
+    """Steady-state resistance R0 + R1 + R2 (Ω) of every cell"""
+    params = cell_parameters(pack)
+    return params["r0"] + params["r"].sum(axis=0)
+
+
+class PackSimulator:
+    """Thevenin equivalent-circuit model of every cell in a pack.
+
+    Each cell is OCV(SOC) in series with R0 and two RC pairs, with SOC
+    from Coulomb counting (positive current charges). State is kept as
+    per-cell arrays and every step advances the whole pack at once; the
+    RC voltages use the exact exponential update, so long steps stay
+    stable. Cells start at rest with the SOC that matches their voltage.
+    """
+
+    def __init__(self, pack, soc=None):
+        self.pack = pack
+        self.cell_ids = pack.cell_ids
+        self.codes = pack.data["chemistry"].copy()
+        n = len(pack)
+        params = cell_parameters(pack)
+        self.capacity_as = params["capacity_as"]
+        self.r0 = params["r0"]
+        self.r = params["r"]
+        self.tau = params["tau"]
+
+        self.v_rc = np.zeros((2, n))
+        if soc is None:
+            soc = self.soc_from_ocv(pack.data["voltage"])
+        self.soc = np.clip(np.asarray(soc, dtype=np.float64), 0.0, 1.0) * np.ones(n)
+        self.voltage = pack.data["voltage"].copy()  # as last written to the pack
+        self._decay = None  # (dt_s, RC decay, RC gain) of the last step size
+
+    def matches(self, pack):
+        """Whether the simulator was built for this pack's cells"""
+        return self.pack is pack and self.cell_ids == pack.cell_ids
+
+    def sync(self):
+        """Take over voltages changed outside the simulator as cells at rest.
+
+        Returns the number of cells whose state was reset.
+        """
+        changed = np.flatnonzero(self.pack.data["voltage"] != self.voltage)
+        if len(changed):
+            voltage = self.pack.data["voltage"]
+            self.soc[changed] = self.soc_from_ocv(voltage)[changed]
+            self.v_rc[:, changed] = 0.0
+            self.voltage[changed] = voltage[changed]
+        return len(changed)
+
+    def ocv(self):
+        """Open-circuit voltage of every cell at its SOC and temperature"""
+        return self.pack.table.ocv(self.soc, self.codes, self.pack.data["temp"])
+
+    def soc_from_ocv(self, voltage):
+        """SOC (0-1) of cells at rest at ``voltage``"""
+        return self.pack.table.soc(voltage, self.codes, self.pack.data["temp"])
+
+    def terminal_voltage(self, current):
+        return self.ocv() + current * self.r0 + self.v_rc.sum(axis=0)
+
+    def step(self, current, dt_s=DEFAULT_STEP_S):
+        """Advance every cell by ``dt_s`` at ``current`` (A, scalar or per cell).
+
+        Writes the resulting voltage, current and power into the pack and
+        returns the terminal voltages.
+        """
+        current = np.broadcast_to(np.asarray(current, dtype=np.float64), self.soc.shape)
+        self._advance(current, dt_s)
+        return self._write(current)
+
+    def _advance(self, current, dt_s):
+        if self._decay is None or self._decay[0] != dt_s:
+            decay = np.exp(-dt_s / self.tau)
+            self._decay = (dt_s, decay, self.r * (1.0 - decay))
+        _, decay, gain = self._decay
+        self.v_rc *= decay
+        self.v_rc += gain * current
+        self.soc += current * dt_s / self.capacity_as
+        np.clip(self.soc, 0.0, 1.0, out=self.soc)
+
+    def _write(self, current):
+        """Store the terminal voltages for ``current`` in the pack"""
+        self.voltage = self.terminal_voltage(current)
+        data = self.pack.data
+        data["voltage"] = self.voltage
+        data["current"] = current
+        data["power"] = self.voltage * current
+        return self.voltage
+
+    def load_step(self, idx, current):
+        """Terminal voltage of one cell right after its current changes.
+
+        The RC voltages cannot jump, so only the R0 drop follows the new
+        current at once; the caller writes the result to the pack.
+        """
+        self.voltage[idx] = (
+            self.ocv()[idx] + current * self.r0[idx] + self.v_rc[:, idx].sum()
+        )
+        return self.voltage[idx]
+
+    def run(
+        self,
+        duration_s,
+        current,
+        dt_s=DEFAULT_STEP_S,
+        history=None,
+        archive=None,
+        sample_every=1,
+        start_ns=None,
+        thermal=None,
+    ):
+        """Simulate ``duration_s`` seconds, faster than real time.
+
+        ``current`` is a scalar, a per-cell array or a function of the
+        elapsed time (s) returning either. Every ``sample_every``-th step
+        is buffered and appended to ``history`` (and ``archive``) in
+        blocks; timestamps run from ``start_ns`` to ``start_ns`` +
+        duration, by default from the newest sample of the history or
+        archive (or now), so a run never lands among samples already
+        recorded. A ThermalModel given as ``thermal`` is stepped along
+        with the cells. Returns the number of samples recorded.
+        """
+        if duration_s <= 0 or not len(self.soc):
+            return 0
+        n_steps = int(np.ceil(duration_s / dt_s))
+        dt_s = duration_s / n_steps
+        params = history.params if history is not None else HISTORY_PARAMS
+        step_ns = int(dt_s * 1e9)
+        if start_ns is None:
+            newest = [
+                store.last_ns for store in (history, archive) if store is not None
+            ]
+            newest = [ns for ns in newest if ns is not None]
+            if newest:
+                start_ns = max(newest)
+            else:
+                start_ns = int(np.datetime64(datetime.now(), "ns").astype(np.int64))
+
+        data = self.pack.data
+        rows = max(1, BLOCK_ELEMENTS // (len(self.soc) * len(params)))
+        block = np.empty((rows, len(self.soc), len(params)))
+        timestamps_ns = np.empty(rows, dtype=np.int64)
+        k = recorded = 0
+        shape = self.soc.shape
+        amps = None if callable(current) else np.broadcast_to(current, shape)
+        for i in range(1, n_steps + 1):
+            if callable(current):
+                amps = np.broadcast_to(np.asarray(current(i * dt_s), float), shape)
+            self._advance(amps, dt_s)
+            # Pack values are only needed for recorded steps and the end
+            recording = history is not None and not i % sample_every
+            if thermal is not None:
+                thermal.step(amps, dt_s, write=recording or i == n_steps)
+            if not recording:
+                if i == n_steps:
+                    self._write(amps)
+                continue
+            self._write(amps)
+            timestamps_ns[k] = start_ns + i * step_ns
+            for j, param in enumerate(params):
+                block[k, :, j] = data[param]
+            k += 1
+            if k == rows or i > n_steps - sample_every:
+                history.append_array(timestamps_ns[:k], block[:k], self.cell_ids)
+                if archive is not None:
+                    archive.append_array(timestamps_ns[:k], block[:k], self.cell_ids)
+                recorded += k
+                k = 0
+        return recorded
@@ -0,0 +1,196 @@
+import threading
+import time
+
+import numpy as np
+
+from bms.ecm import cell_parameters
+from bms.readings import flatten_block, history_blocks, reading_passes
+
+# Noise models of the filter (standard deviations): voltage measurement (V),
+# current sensor (A) and RC voltage drift (V per √s)
+VOLTAGE_NOISE = 0.01
+CURRENT_NOISE = 0.05
+RC_NOISE = 1e-4
+
+# Uncertainty of the first estimate, taken from the cell's voltage at rest
+INITIAL_SOC_STD = 0.1
+INITIAL_RC_STD = 0.01
+
+# Longest gap (s) between readings that current is integrated over; the
+# load during longer gaps is unknown
+MAX_GAP_S = 60.0
+
+
+class SocEstimator:
+    """Extended Kalman filter of every cell's state of charge.
+
+    Each cell's state is [SOC, V_RC1, V_RC2] of the PackSimulator circuit:
+    the prediction integrates the current (Coulomb counting) and the
+    correction compares the measured voltage with OCV(SOC) + I·R0 + the
+    RC voltages. States and covariances are stacked as (cells, 3) and
+    (cells, 3, 3) arrays, so one reading of every cell is a handful of
+    batched array operations whatever the pack size.
+    """
+
+    def __init__(self, pack):
+        self.lock = threading.Lock()
+        self.cell_ids = pack.cell_ids
+        self.table = pack.table
+        self.codes = pack.data["chemistry"].copy()
+        params = cell_parameters(pack)
+        self.capacity_as = params["capacity_as"]
+        self.r0 = params["r0"]
+        self.r = params["r"].T  # (cells, 2)
+        self.tau = params["tau"].T
+        n = len(pack)
+        self.x = np.zeros((n, 3))
+        self.covariance = np.zeros((n, 3, 3))
+        self.last_ns = np.zeros(n, dtype=np.int64)  # 0 until a cell's first reading
+        self.current = np.zeros(n)  # held until the next reading
+
+    def matches(self, pack):
+        """Whether the filter was built for this pack's cells"""
+        return self.cell_ids == pack.cell_ids
+
+    @property
+    def soc(self):
+        """Estimated SOC (0-1) per cell, NaN before a cell's first reading"""
+        return np.where(self.last_ns > 0, self.x[:, 0], np.nan)
+
+    @property
+    def soc_std(self):
+        """Standard deviation of the SOC estimate per cell"""
+        return np.where(self.last_ns > 0, np.sqrt(self.covariance[:, 0, 0]), np.nan)
+
+    def _step(self, cells, timestamps_ns, voltage, current, temp):
+        """Filter one reading of each of ``cells`` (unique positions)"""
+        codes = self.codes[cells]
+        new = self.last_ns[cells] == 0
+        if new.any():
+            first = cells[new]
+            self.x[first] = 0.0
+            self.x[first, 0] = self.table.soc(voltage[new], codes[new], temp[new])
+            self.covariance[first] = np.diag(
+                [INITIAL_SOC_STD**2, INITIAL_RC_STD**2, INITIAL_RC_STD**2]
+            )
+
+        # Predict over the time since each cell's previous reading
+        dt = np.where(new, 0.0, (timestamps_ns - self.last_ns[cells]) / 1e9)
+        dt = np.maximum(dt, 0.0)
+        decay = np.exp(-dt[:, np.newaxis] / self.tau[cells])
+        held = self.current[cells]
+        charge_s = np.minimum(dt, MAX_GAP_S)
+        a = np.column_stack([np.ones(len(cells)), decay])
+        b = np.column_stack(
+            [charge_s / self.capacity_as[cells], self.r[cells] * (1.0 - decay)]
+        )
+        x = a * self.x[cells] + b * held[:, np.newaxis]
+        q = np.column_stack(
+            [
+                (CURRENT_NOISE * charge_s / self.capacity_as[cells]) ** 2,
+                RC_NOISE**2 * dt,
+                RC_NOISE**2 * dt,
+            ]
+        )
+        p = self.covariance[cells] * a[:, :, np.newaxis] * a[:, np.newaxis, :]
+        p[:, [0, 1, 2], [0, 1, 2]] += q
+
+        # Correct with the measured voltage
+        soc = np.clip(x[:, 0], 0.0, 1.0)
+        h = np.column_stack(
+            [self.table.ocv_slope(soc, codes), np.ones(len(cells)), np.ones(len(cells))]
+        )
+        predicted = (
+            self.table.ocv(soc, codes, temp)
+            + current * self.r0[cells]
+            + x[:, 1]
+            + x[:, 2]
+        )
+        hp = np.einsum("ni,nij->nj", h, p)
+        s = np.einsum("nj,nj->n", hp, h) + VOLTAGE_NOISE**2
+        gain = hp / s[:, np.newaxis]  # P·Hᵀ/S, P being symmetric
+        x += gain * (voltage - predicted)[:, np.newaxis]
+        p -= gain[:, :, np.newaxis] * hp[:, np.newaxis, :]
+        x[:, 0] = np.clip(x[:, 0], 0.0, 1.0)
+
+        self.x[cells] = x
+        self.covariance[cells] = 0.5 * (p + p.transpose(0, 2, 1))
+        self.last_ns[cells] = timestamps_ns
+        self.current[cells] = current
+
+    def update(self, timestamps_ns, cells, voltage, current, temp):
+        """Filter a batch of readings of pack positions ``cells``.
+
+        Readings of one cell are applied in time order; each pass of the
+        batch updates every cell that still has a reading left. Readings
+        that are not newer than a cell's last one, or not finite, are
+        skipped.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        cells = np.asarray(cells, dtype=np.intp)
+        voltage, current, temp = (
+            np.asarray(values, dtype=np.float64) for values in (voltage, current, temp)
+        )
+        with self.lock:
+            keep = (
+                (timestamps_ns > self.last_ns[cells])
+                & np.isfinite(voltage)
+                & np.isfinite(current)
+                & np.isfinite(temp)
+            )
+            if not keep.all():
+                timestamps_ns, cells = timestamps_ns[keep], cells[keep]
+                voltage, current, temp = voltage[keep], current[keep], temp[keep]
+            for i in reading_passes(timestamps_ns, cells):
+                self._step(cells[i], timestamps_ns[i], voltage[i], current[i], temp[i])
+            return len(cells)
+
+    def update_frames(self, frames, now_ns=None):
+        """Filter ingest or replay frames (timestamp 0 means "now")"""
+        timestamps = frames["timestamp_ns"]
+        if not timestamps.all():
+            timestamps = np.where(timestamps == 0, now_ns or time.time_ns(), timestamps)
+        known = frames["cell"] < len(self.cell_ids)
+        return self.update(
+            timestamps[known],
+            frames["cell"][known],
+            frames["voltage"][known],
+            frames["current"][known],
+            frames["temp"][known],
+        )
+
+    def update_pack(self, pack, timestamp_ns=None):
+        """Filter the pack's current state as one reading of every cell"""
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        data = pack.data
+        return self.update(
+            np.full(len(pack), timestamp_ns, dtype=np.int64),
+            np.arange(len(pack)),
+            data["voltage"],
+            data["current"],
+            data["temp"],
+        )
+
+    def follow(self, history):
+        """Filter the history samples that are newer than the filter's state.
+
+        Catches up on whatever wrote to the history since the last call
+        (logged samples, simulations, replays); readings the filter has
+        already seen through ``update`` are skipped. Returns the number of
+        samples filtered.
+        """
+        n = 0
+        for timestamps_ns, cells, block in history_blocks(
+            history, self.cell_ids, self.last_ns, ("voltage", "current", "temp")
+        ):
+            n += len(timestamps_ns)
+            timestamps_ns, cells, readings = flatten_block(timestamps_ns, cells, block)
+            self.update(
+                timestamps_ns,
+                cells,
+                readings["voltage"],
+                readings["current"],
+                readings["temp"],
+            )
+        return n
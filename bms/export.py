@@ -0,0 +1,76 @@
+import io
+import json
+from datetime import datetime
+
+import numpy as np
+
+
+def current_state_frame(pack, timestamp=None):
+    """One row per cell with the pack's current readings, SOC and status"""
+    import pandas as pd
+
+    timestamp = timestamp or datetime.now()
+    return pd.DataFrame(
+        {
+            "Timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "Cell_ID": pack.cell_ids,
+            "Cell_Type": [
+                pack.chemistries[code].upper() for code in pack.data["chemistry"]
+            ],
+            "Voltage_V": pack.data["voltage"],
+            "Current_A": pack.data["current"],
+            "Power_W": pack.data["power"],
+            "Temperature_C": pack.data["temp"],
+            "SOC_Percent": np.round(pack.soc(), 1),
+            "Status": pack.status_labels(),
+            "Min_Voltage": pack.spec_column("min_voltage"),
+            "Max_Voltage": pack.spec_column("max_voltage"),
+        }
+    )
+
+
+def to_csv(frame):
+    return frame.to_csv(index=False)
+
+
+def excel_report(current_df, history_df=None):
+    """Excel workbook bytes with the current state and, optionally, history"""
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        current_df.to_excel(writer, sheet_name="Current_Status", index=False)
+        if history_df is not None:
+            history_df.to_excel(writer, sheet_name="Historical_Data", index=False)
+    return buffer.getvalue()
+
+
+def config_backup(pack, backup_time=None):
+    """JSON backup of every cell's state and the chemistries in use"""
+    backup_time = backup_time or datetime.now()
+    config_data = {
+        "configuration": {
+            "cells": {
+                cell_id: {
+                    param: (float(v) if isinstance(v, (int, float)) else v)
+                    for param, v in cell_data.items()
+                }
+                for cell_id, cell_data in pack.items()
+            },
+            "backup_time": backup_time.isoformat(),
+            "total_cells": len(pack),
+            "cell_types": list(
+                set(pack.chemistries[code] for code in pack.data["chemistry"])
+            ),
+        }
+    }
+    return json.dumps(config_data, indent=2)
+
+
+def load_config_backup(pack, config_json):
+    """Fill ``pack`` with the cells of a config_backup() document"""
+    cells = json.loads(config_json)["configuration"]["cells"]
+    pack.clear()
+    for cell_id, cell_data in cells.items():
+        pack[cell_id] = cell_data
+    return pack
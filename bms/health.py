@@ -0,0 +1,234 @@
+import numpy as np
+
+from bms.ecm import cell_parameters
+from bms.readings import history_blocks
+
+# Load steps used for the internal resistance: smallest current change (A),
+# longest gap between the two readings (s) and steps needed for an estimate
+MIN_STEP_A = 0.5
+MAX_STEP_GAP_S = 10.0
+MIN_STEPS = 3
+
+# A cell is at rest below REST_CURRENT (A); its voltage is read as OCV once it
+# has rested MIN_REST_S seconds. Capacity is counted between rest points at
+# least MIN_SOC_SWING (0-1) apart.
+REST_CURRENT = 0.05
+MIN_REST_S = 600.0
+MIN_SOC_SWING = 0.2
+
+# Charge and discharge throughput (share of rated capacity) needed before
+# efficiencies are reported
+MIN_THROUGHPUT = 0.05
+
+# Resistance growth (times the model's) at which resistance health is 0%
+RESISTANCE_EOL_FACTOR = 2.0
+
+
+class HealthEstimator:
+    """State of health of every cell, accumulated from the history.
+
+    New history samples are consumed as (cells, samples) blocks into
+    per-cell running sums, so each sample is processed once and the
+    metrics are a few O(cells) divisions:
+
+    - internal resistance: least squares of ΔV = R·ΔI over load steps
+      between consecutive readings;
+    - capacity: Coulomb counting between rest points whose SOC (from
+      OCV) is at least MIN_SOC_SWING apart, ΔQ = C·ΔSOC in least squares;
+    - efficiency: discharge vs charge energy per unit of charge (a
+      coulombic efficiency of one is assumed), and the share of the
+      throughput not turned into I²R heat;
+    - equivalent full cycles from the charge throughput.
+    """
+
+    def __init__(self, pack):
+        self.cell_ids = pack.cell_ids
+        self.table = pack.table
+        self.codes = pack.data["chemistry"].copy()
+        params = cell_parameters(pack)
+        self.rated_as = params["capacity_as"]
+        self.r0 = params["r0"]
+        self.r = params["r"]
+        self.tau = params["tau"]
+        self.reset()
+
+    def reset(self):
+        """Forget everything consumed so far"""
+        n = len(self.cell_ids)
+        self.last_ns = 0  # newest history sample consumed
+        self.voltage = np.full(n, np.nan)
+        self.current = np.full(n, np.nan)
+        self.charge_as = np.zeros(n)  # Coulomb counter
+        self.resting = np.zeros(n, dtype=bool)
+        self.rest_since_ns = np.zeros(n, dtype=np.int64)
+        self.anchor_soc = np.full(n, np.nan)  # SOC and charge at the last rest point
+        self.anchor_as = np.full(n, np.nan)
+        sums = (
+            "step_vi",  # Σ ΔV·ΔI
+            "step_ii",  # Σ ΔI²
+            "step_ref",  # Σ R_model·ΔI², the model's resistance at the same gaps
+            "swing_qs",  # Σ ΔQ·ΔSOC
+            "swing_ss",  # Σ ΔSOC²
+            "in_as",
+            "out_as",
+            "in_j",
+            "out_j",
+            "i2t",  # Σ I²·dt, for the heat
+        )
+        self.sums = {name: np.zeros(n) for name in sums}
+        self.steps = np.zeros(n, dtype=np.int64)
+
+    def matches(self, pack):
+        """Whether the estimator was built for this pack's cells"""
+        return self.cell_ids == pack.cell_ids
+
+    def follow(self, history):
+        """Consume the history samples newer than the last call.
+
+        A history that ends before what was consumed (cleared or
+        replaced) starts the estimates over. Returns the number of
+        samples consumed.
+        """
+        timestamps = history.timestamps()
+        if not len(timestamps):
+            return 0
+        if timestamps[-1] < self.last_ns:
+            self.reset()
+        n = 0
+        for timestamps_ns, cells, block in history_blocks(
+            history, self.cell_ids, self.last_ns, ("voltage", "current", "temp")
+        ):
+            self._consume(
+                timestamps_ns, cells, block["voltage"], block["current"], block["temp"]
+            )
+            n += len(timestamps_ns)
+        return n
+
+    def _consume(self, timestamps_ns, cells, voltage, current, temp):
+        """Add one (cells, samples) block, in time order, to the running sums"""
+        k = len(timestamps_ns)
+        previous_ns = np.r_[self.last_ns or timestamps_ns[0], timestamps_ns[:-1]]
+        dt = np.maximum((timestamps_ns - previous_ns) / 1e9, 0.0)
+        sums = {name: values[cells] for name, values in self.sums.items()}
+        prev_v = np.column_stack([self.voltage[cells], voltage[:, :-1]])
+        prev_i = np.column_stack([self.current[cells], current[:, :-1]])
+
+        # Throughput, with each reading's current held until the next one
+        held = np.nan_to_num(prev_i)
+        amp_s = held * dt
+        joules = np.nan_to_num(prev_v * prev_i) * dt
+        charging = amp_s > 0
+        sums["in_as"] += np.where(charging, amp_s, 0.0).sum(axis=1)
+        sums["out_as"] -= np.where(charging, 0.0, amp_s).sum(axis=1)
+        sums["in_j"] += np.where(charging, joules, 0.0).sum(axis=1)
+        sums["out_j"] -= np.where(charging, 0.0, joules).sum(axis=1)
+        sums["i2t"] += (np.square(held) * dt).sum(axis=1)
+        counter = self.charge_as[cells, np.newaxis] + np.cumsum(amp_s, axis=1)
+
+        # Internal resistance from load steps
+        d_i = current - prev_i
+        d_v = voltage - prev_v
+        with np.errstate(invalid="ignore"):
+            step = (np.abs(d_i) >= MIN_STEP_A) & (dt > 0) & (dt <= MAX_STEP_GAP_S)
+        step &= np.isfinite(d_v)
+        model = self.r0[cells, np.newaxis] + sum(
+            self.r[j, cells, np.newaxis]
+            * (1 - np.exp(-dt / self.tau[j, cells, np.newaxis]))
+            for j in range(len(self.r))
+        )
+        sums["step_vi"] += np.where(step, d_v * d_i, 0.0).sum(axis=1)
+        sums["step_ii"] += np.where(step, np.square(d_i), 0.0).sum(axis=1)
+        sums["step_ref"] += np.where(step, model * np.square(d_i), 0.0).sum(axis=1)
+        self.steps[cells] += step.sum(axis=1)
+
+        # Rest points: resting long enough for the voltage to read as OCV
+        with np.errstate(invalid="ignore"):
+            rest = np.abs(current) < REST_CURRENT
+        began = rest & ~np.column_stack([self.resting[cells], rest[:, :-1]])
+        latest = np.maximum.accumulate(np.where(began, np.arange(k), -1), axis=1)
+        since_ns = np.where(
+            latest >= 0,
+            timestamps_ns[np.maximum(latest, 0)],
+            self.rest_since_ns[cells, np.newaxis],
+        )
+        settled = rest & (timestamps_ns - since_ns >= MIN_REST_S * 1e9)
+        settled &= np.isfinite(voltage) & np.isfinite(temp)
+        point_row, point_col = np.nonzero(settled)  # by cell, then in time order
+        if len(point_row):
+            point_cell = cells[point_row]
+            soc = self.table.soc(
+                voltage[point_row, point_col],
+                self.codes[point_cell],
+                temp[point_row, point_col],
+            )
+            charge = counter[point_row, point_col]
+            first = np.r_[True, point_row[1:] != point_row[:-1]]
+            prev_soc = np.where(
+                first, self.anchor_soc[point_cell], np.r_[np.nan, soc[:-1]]
+            )
+            prev_charge = np.where(
+                first, self.anchor_as[point_cell], np.r_[np.nan, charge[:-1]]
+            )
+            swing = soc - prev_soc
+            with np.errstate(invalid="ignore"):
+                use = np.abs(swing) >= MIN_SOC_SWING
+            qs = np.zeros(len(cells))
+            ss = np.zeros(len(cells))
+            np.add.at(qs, point_row[use], ((charge - prev_charge) * swing)[use])
+            np.add.at(ss, point_row[use], np.square(swing[use]))
+            sums["swing_qs"] += qs
+            sums["swing_ss"] += ss
+            last = np.r_[first[1:], True]
+            self.anchor_soc[point_cell[last]] = soc[last]
+            self.anchor_as[point_cell[last]] = charge[last]
+
+        for name, values in sums.items():
+            self.sums[name][cells] = values
+        self.charge_as[cells] = counter[:, -1]
+        self.resting[cells] = rest[:, -1]
+        self.rest_since_ns[cells] = since_ns[:, -1]
+        self.voltage[cells] = voltage[:, -1]
+        self.current[cells] = current[:, -1]
+        self.last_ns = int(timestamps_ns[-1])
+
+    def metrics(self):
+        """Per-cell health metrics, NaN where the history is not enough yet.
+
+        resistance (Ω) and resistance_ratio (to the model), capacity_ah and
+        capacity_retention, efficiency and thermal_efficiency (0-1),
+        cycles (equivalent full cycles) and soh (0-1, the lower of the
+        capacity retention and the resistance health).
+        """
+        s = self.sums
+        with np.errstate(invalid="ignore", divide="ignore"):
+            resistance = np.where(
+                self.steps >= MIN_STEPS, s["step_vi"] / s["step_ii"], np.nan
+            )
+            ratio = resistance / (s["step_ref"] / s["step_ii"])
+            capacity_as = np.where(
+                s["swing_ss"] > 0, s["swing_qs"] / s["swing_ss"], np.nan
+            )
+            enough = (
+                np.minimum(s["in_as"], s["out_as"]) >= MIN_THROUGHPUT * self.rated_as
+            )
+            efficiency = np.where(
+                enough, (s["out_j"] / s["out_as"]) / (s["in_j"] / s["in_as"]), np.nan
+            )
+            heat = s["i2t"] * resistance
+            thermal = 1 - heat / (s["in_j"] + s["out_j"])
+            thermal = np.where(enough, thermal, np.nan)
+            retention = capacity_as / self.rated_as
+            resistance_health = np.clip(
+                (RESISTANCE_EOL_FACTOR - ratio) / (RESISTANCE_EOL_FACTOR - 1), 0.0, 1.0
+            )
+            soh = np.fmin(np.minimum(retention, 1.0), resistance_health)
+        return {
+            "resistance": resistance,
+            "resistance_ratio": ratio,
+            "capacity_ah": capacity_as / 3600,
+            "capacity_retention": retention,
+            "efficiency": efficiency,
+            "thermal_efficiency": thermal,
+            "cycles": (s["in_as"] + s["out_as"]) / (2 * self.rated_as),
+            "soh": soh,
+        }
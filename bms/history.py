@@ -0,0 +1,409 @@
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from bms.ring import mirrored_write
+from bms.rollups import DEFAULT_TIER_CAPACITY, ROLLUP_RESOLUTIONS, RollupTier
+
+# Parameters recorded for every cell
+HISTORY_PARAMS = ("voltage", "current", "temp", "power")
+
+# Default number of samples kept in memory
+DEFAULT_HISTORY_CAPACITY = 10_000
+
+# Default number of points a chart should receive (roughly one per pixel)
+DEFAULT_TARGET_POINTS = 800
+
+# Series picked for a chart; ``lower``/``upper`` are None for raw samples
+SeriesSelection = namedtuple(
+    "SeriesSelection", ["timestamps", "values", "lower", "upper", "resolution_s"]
+)
+
+
+class HistoryStore:
+    """Columnar ring buffer holding recent samples for every cell and parameter.
+
+    Each (cell, parameter) pair owns one contiguous float64 row and the
+    timestamps live in a separate int64 column (nanoseconds since epoch).
+    Every sample is written twice, at ``i`` and ``i + capacity``, so the
+    most recent ``n`` samples are always a contiguous slice and can be
+    returned as zero-copy views.
+
+    Alongside the raw samples the store maintains rollup tiers (1 s, 1 min
+    and 1 h by default) that are updated incrementally on every append, so
+    charts over long ranges can read precomputed buckets instead.
+    """
+
+    def __init__(
+        self,
+        capacity=DEFAULT_HISTORY_CAPACITY,
+        params=HISTORY_PARAMS,
+        rollup_resolutions=ROLLUP_RESOLUTIONS,
+        tier_capacity=DEFAULT_TIER_CAPACITY,
+    ):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.params = tuple(params)
+        self.rollup_resolutions = tuple(sorted(rollup_resolutions))
+        self.tier_capacity = tier_capacity
+        self.tiers = [
+            RollupTier(resolution, tier_capacity, len(self.params))
+            for resolution in self.rollup_resolutions
+        ]
+        self._param_index = {param: i for i, param in enumerate(self.params)}
+        self._cell_ids = []
+        self._cell_index = {}
+        self._timestamps = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._values = np.full(
+            (0, len(self.params), 2 * self.capacity), np.nan, dtype=np.float64
+        )
+        self._head = 0  # next write position in [0, capacity)
+        self._count = 0
+        self._first_ns = None  # oldest sample ever appended
+        self.version = 0
+        self._frame_cache = None  # (version, frame, {cell_id: cell frame})
+
+    @classmethod
+    def sized_for(cls, n_cells, memory_budget, max_capacity=DEFAULT_HISTORY_CAPACITY):
+        """Create a store whose buffers for ``n_cells`` fit in about ``memory_budget`` bytes.
+
+        Half of the budget goes to raw samples and half to the rollup tiers.
+        """
+        n_cells = max(int(n_cells), 1)
+        n_params = len(HISTORY_PARAMS)
+        # Mirrored float64 per param, plus 4 float64 stats and an int32 count per tier
+        raw_bytes = n_cells * n_params * 2 * 8
+        tier_bytes = n_cells * n_params * 2 * (4 * 8 + 4) * len(ROLLUP_RESOLUTIONS)
+        capacity = int(min(max_capacity, max(memory_budget / 2 // raw_bytes, 10)))
+        tier_capacity = int(
+            min(DEFAULT_TIER_CAPACITY, max(memory_budget / 2 // tier_bytes, 10))
+        )
+        return cls(capacity, tier_capacity=tier_capacity)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def cell_ids(self):
+        return list(self._cell_ids)
+
+    @property
+    def last_ns(self):
+        """Timestamp of the newest sample, or None when empty"""
+        if not self._count:
+            return None
+        return int(self._timestamps[self._head + self.capacity - 1])
+
+    @property
+    def nbytes(self):
+        """Memory held by the buffers in bytes"""
+        return self._timestamps.nbytes + self._values.nbytes
+
+    def ensure_cells(self, cell_ids):
+        """Add columns for cells that are not tracked yet"""
+        new_ids = [cell_id for cell_id in cell_ids if cell_id not in self._cell_index]
+        if not new_ids:
+            return
+        for cell_id in new_ids:
+            self._cell_index[cell_id] = len(self._cell_ids)
+            self._cell_ids.append(cell_id)
+        # Cells are only added on configuration changes, so growing by copy is fine
+        extra = np.full(
+            (len(new_ids), len(self.params), 2 * self.capacity),
+            np.nan,
+            dtype=np.float64,
+        )
+        self._values = np.concatenate([self._values, extra], axis=0)
+        for tier in self.tiers:
+            tier.add_cells(len(new_ids))
+        self.version += 1
+
+    def append(self, timestamp, cells_data):
+        """Append one sample taken from a ``{cell_id: {param: value}}`` mapping"""
+        self.ensure_cells(cells_data.keys())
+        sample = np.full((len(self._cell_ids), len(self.params)), np.nan)
+        for cell_id, cell_data in cells_data.items():
+            row = self._cell_index[cell_id]
+            for param, col in self._param_index.items():
+                if param in cell_data:
+                    sample[row, col] = cell_data[param]
+        self.append_array([_to_ns(timestamp)], sample[np.newaxis])
+
+    def append_array(self, timestamps_ns, values, cell_ids=None):
+        """Append a block of samples.
+
+        ``values`` has shape (samples, cells, params) with cells ordered as
+        ``cell_ids`` (defaults to the store's own order). Only the last
+        ``capacity`` samples of an oversized block are kept. The block is
+        put in time order; samples older than the newest one already
+        stored raise ValueError, since the buffer and the rollup tiers
+        are only ever appended to.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 3 or values.shape[0] != timestamps_ns.shape[0]:
+            raise ValueError("values must have shape (samples, cells, params)")
+        if np.any(timestamps_ns[1:] < timestamps_ns[:-1]):
+            order = np.argsort(timestamps_ns, kind="stable")
+            timestamps_ns, values = timestamps_ns[order], values[order]
+        if self._count and len(timestamps_ns) and timestamps_ns[0] < self.last_ns:
+            raise ValueError(
+                f"sample at {int(timestamps_ns[0])} ns is older than the newest "
+                f"stored sample at {self.last_ns} ns"
+            )
+        if cell_ids is not None:
+            self.ensure_cells(cell_ids)
+            rows = np.fromiter(
+                (self._cell_index[cell_id] for cell_id in cell_ids),
+                dtype=np.intp,
+                count=len(cell_ids),
+            )
+        else:
+            rows = None
+
+        n = timestamps_ns.shape[0]
+        if n == 0:
+            return
+
+        if rows is None or np.array_equal(rows, np.arange(len(self._cell_ids))):
+            if values.shape[1] != len(self._cell_ids):
+                raise ValueError("values do not match the number of tracked cells")
+            full = values
+        else:
+            full = np.full((n, len(self._cell_ids), len(self.params)), np.nan)
+            full[:, rows] = values
+        self._update_tiers(timestamps_ns, full)
+        if self._first_ns is None:
+            self._first_ns = int(timestamps_ns[0])
+
+        if n > self.capacity:
+            timestamps_ns = timestamps_ns[-self.capacity :]
+            full = full[-self.capacity :]
+            n = self.capacity
+
+        mirrored_write(self._timestamps, self._head, self.capacity, timestamps_ns)
+        # (samples, cells, params) -> (cells, params, samples)
+        mirrored_write(self._values, self._head, self.capacity, full.transpose(1, 2, 0))
+
+        self._head = (self._head + n) % self.capacity
+        self._count = min(self._count + n, self.capacity)
+        self.version += 1
+
+    def _update_tiers(self, timestamps_ns, values):
+        """Roll a block up through the tiers, finest first.
+
+        Each tier's buckets feed the next one when its resolution divides
+        the next, so only the finest tier has to reduce the raw samples.
+        """
+        groups = None
+        previous = None
+        for tier in self.tiers:
+            if groups is not None and tier.resolution_ns % previous == 0:
+                groups = tier.update_stats(*groups)
+            else:
+                groups = tier.update(timestamps_ns, values)
+            previous = tier.resolution_ns
+
+    def _window(self, n):
+        """Return the [start, stop) slice covering the last ``n`` samples"""
+        n = self._count if n is None else max(0, min(int(n), self._count))
+        stop = self._head + self.capacity
+        return slice(stop - n, stop)
+
+    def timestamps(self, n=None):
+        """Zero-copy view of the last ``n`` timestamps (ns since epoch)"""
+        return self._timestamps[self._window(n)]
+
+    def series(self, cell_id, param, n=None):
+        """Zero-copy view of the last ``n`` values of one cell parameter"""
+        row = self._cell_index[cell_id]
+        return self._values[row, self._param_index[param], self._window(n)]
+
+    def param_block(self, param, n=None):
+        """Zero-copy (cells, samples) view of one parameter of every cell"""
+        return self._values[:, self._param_index[param], self._window(n)]
+
+    def cell_block(self, cell_id, n=None):
+        """Zero-copy (params, samples) view of one cell"""
+        return self._values[self._cell_index[cell_id], :, self._window(n)]
+
+    def select(self, cell_id, param, start_ns=None, end_ns=None, target_points=None):
+        """Pick raw samples or the coarsest rollup tier for a chart.
+
+        The tier is chosen so the visible range still gets at least
+        ``target_points`` buckets (about one per pixel). Raw samples are
+        used when they cover the range and are few enough to plot.
+        """
+        target_points = target_points or DEFAULT_TARGET_POINTS
+        row = self._cell_index[cell_id]
+        col = self._param_index[param]
+        timestamps = self.timestamps()
+        tiers = [tier for tier in self.tiers if len(tier)]
+
+        if start_ns is None:
+            # Oldest sample still covered by the raw buffer or any tier
+            start_ns = self._first_ns or 0
+            if tiers:
+                start_ns = max(start_ns, min(tier.first_ns for tier in tiers))
+        if end_ns is None:
+            end_ns = int(timestamps[-1]) + 1 if len(timestamps) else start_ns + 1
+        span_ns = max(end_ns - start_ns, 1)
+
+        lo, hi = np.searchsorted(timestamps, [start_ns, end_ns])
+        raw = slice(int(lo), int(hi))
+        raw_covers = len(timestamps) > 0 and timestamps[0] <= start_ns
+        if raw_covers and hi - lo <= 2 * target_points:
+            return self._raw_selection(row, col, raw)
+
+        covering = [tier for tier in tiers if tier.first_ns <= start_ns]
+        for tier in reversed(covering):
+            if span_ns / tier.resolution_ns >= target_points:
+                return self._tier_selection(tier, row, col, start_ns, end_ns)
+
+        if raw_covers or not tiers:
+            return self._raw_selection(row, col, raw)
+        # The range reaches back past the raw buffer
+        tier = covering[0] if covering else tiers[-1]
+        return self._tier_selection(tier, row, col, start_ns, end_ns)
+
+    def _raw_selection(self, row, col, rows):
+        window = self._window(None)
+        rows = slice(window.start + rows.start, window.start + rows.stop)
+        return SeriesSelection(
+            self._timestamps[rows], self._values[row, col, rows], None, None, 0
+        )
+
+    def _tier_selection(self, tier, row, col, start_ns, end_ns):
+        buckets = tier.view(row, col, start_ns, end_ns)
+        return SeriesSelection(
+            buckets["timestamp"],
+            buckets["mean"],
+            buckets["min"],
+            buckets["max"],
+            tier.resolution_s,
+        )
+
+    def has_cell(self, cell_id):
+        return cell_id in self._cell_index
+
+    def frame(self):
+        """Cached DataFrame of the whole buffer with (cell, param) column MultiIndex.
+
+        The frame is rebuilt only when the store's version changes, i.e.
+        after an append or a change in the tracked cells.
+        """
+        import pandas as pd
+
+        if self._frame_cache is None or self._frame_cache[0] != self.version:
+            window = self._window(None)
+            n_cells, n_params = len(self._cell_ids), len(self.params)
+            values = self._values[:, :, window].reshape(n_cells * n_params, -1).T
+            columns = pd.MultiIndex.from_product(
+                [self._cell_ids, self.params], names=["cell", "param"]
+            )
+            index = pd.DatetimeIndex(self._timestamps[window], name="timestamp")
+            frame = pd.DataFrame(values, index=index, columns=columns)
+            self._frame_cache = (self.version, frame, {})
+        return self._frame_cache[1]
+
+    def cell_frame(self, cell_id):
+        """One cell's (samples x params) slice of the cached frame"""
+        frame = self.frame()
+        cell_frames = self._frame_cache[2]
+        if cell_id not in cell_frames:
+            n_params = len(self.params)
+            start = self._cell_index[cell_id] * n_params
+            cell_frame = frame.iloc[:, start : start + n_params]
+            cell_frames[cell_id] = cell_frame.droplevel("cell", axis=1)
+        return cell_frames[cell_id]
+
+    def to_frame(self, n=None):
+        """Wide DataFrame with a ``timestamp`` column and ``{cell}_{param}`` columns"""
+        import pandas as pd
+
+        if n is None:
+            frame = self.frame().copy()
+            frame.columns = [f"{cell_id}_{param}" for cell_id, param in frame.columns]
+            return frame.reset_index()
+        # A short tail is built directly rather than from the full cached frame
+        window = self._window(n)
+        data = {"timestamp": pd.to_datetime(self._timestamps[window])}
+        for row, cell_id in enumerate(self._cell_ids):
+            for col, param in enumerate(self.params):
+                data[f"{cell_id}_{param}"] = self._values[row, col, window]
+        return pd.DataFrame(data)
+
+    def copy(self, n=None, readonly=False):
+        """Independent store holding the newest ``n`` samples and all rollups.
+
+        The copy is sized to exactly ``n`` samples (all by default). With
+        ``readonly`` its arrays cannot be written, so one copy can be read
+        by many threads while the original keeps changing; such a copy
+        holds each sample once rather than mirrored.
+        """
+        n = self._count if n is None else max(0, min(int(n), self._count))
+        store = HistoryStore(
+            max(n, 1), self.params, self.rollup_resolutions, self.tier_capacity
+        )
+        store.tiers = [tier.copy(readonly) for tier in self.tiers]
+        store._cell_ids = list(self._cell_ids)
+        store._cell_index = dict(self._cell_index)
+        window = self._window(n)
+        if readonly:
+            # Never written, so the window alone is read back as [0, n)
+            store._timestamps = self._timestamps[window].copy()
+            store._values = self._values[:, :, window].copy()
+        else:
+            # Both mirrored halves hold the same samples, the next write goes to slot 0
+            store._timestamps = np.tile(self._timestamps[window], 2)
+            store._values = np.tile(self._values[:, :, window], 2)
+        if not n:
+            store._timestamps = np.zeros(2, dtype=np.int64)
+            store._values = np.full(
+                (len(self._cell_ids), len(self.params), 2), np.nan, dtype=np.float64
+            )
+        store._timestamps.flags.writeable = not readonly
+        store._values.flags.writeable = not readonly
+        store._count = n
+        store._first_ns = self._first_ns
+        store.version = self.version
+        return store
+
+    def clear(self):
+        """Drop all samples and tracked cells"""
+        self.__init__(
+            self.capacity, self.params, self.rollup_resolutions, self.tier_capacity
+        )
+
+
+def record_sample(pack, history, archive=None, timestamp=None):
+    """Append the pack's current state to the history (and archive) as one sample.
+
+    Without a ``timestamp`` the sample is stamped now, or just after the
+    newest stored sample when the history (or archive) runs ahead of the
+    clock, so every sample is newer than the last. Returns the timestamp
+    used in ns, or None for an empty pack.
+    """
+    if not pack:
+        return None
+    if timestamp is None:
+        newest = [history.last_ns]
+        if archive is not None:
+            newest.append(archive.last_ns)
+        newest = [ns + 1 for ns in newest if ns is not None]
+        timestamp = max([_to_ns(datetime.now())] + newest)
+    timestamps_ns = [_to_ns(timestamp)]
+    sample = pack.sample(history.params)
+    history.append_array(timestamps_ns, sample, pack.cell_ids)
+    if archive is not None:
+        archive.append_array(timestamps_ns, sample, pack.cell_ids)
+    return timestamps_ns[0]
+
+
+def _to_ns(timestamp):
+    """Convert a datetime (or ns integer) into nanoseconds since epoch"""
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return int(np.datetime64(timestamp, "ns").astype(np.int64))
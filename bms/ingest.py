@@ -0,0 +1,536 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from bms.rules import raise_alerts
+
+logger = logging.getLogger(__name__)
+
+# One little-endian frame per cell reading; ``cell`` is the position in the pack
+FRAME_DTYPE = np.dtype(
+    [
+        ("timestamp_ns", "<i8"),
+        ("cell", "<u4"),
+        ("voltage", "<f4"),
+        ("current", "<f4"),
+        ("temp", "<f4"),
+    ]
+)
+
+OVERLOAD_POLICIES = ("coalesce", "drop_oldest", "drop_newest")
+
+# Frames held between the network readers and the writer
+DEFAULT_MAX_PENDING = 200_000
+
+# Largest (samples x cells x params) block written to the history at once
+BLOCK_VALUES = 4_000_000
+
+# UDP payloads are split at frame boundaries below this size
+MAX_DATAGRAM = 65_000
+
+READ_SIZE = 1 << 16
+
+
+def encode_frames(timestamps_ns, cells, voltage, current, temp):
+    """Pack readings into the binary frame layout (arrays are broadcast)"""
+    cells = np.asarray(cells)
+    frames = np.empty(len(cells), dtype=FRAME_DTYPE)
+    frames["timestamp_ns"] = timestamps_ns
+    frames["cell"] = cells
+    frames["voltage"] = voltage
+    frames["current"] = current
+    frames["temp"] = temp
+    return frames.tobytes()
+
+
+def decode_frames(data):
+    """Decode whole frames from ``data``; returns (frames, leftover bytes)"""
+    whole = len(data) - len(data) % FRAME_DTYPE.itemsize
+    frames = np.frombuffer(data, dtype=FRAME_DTYPE, count=whole // FRAME_DTYPE.itemsize)
+    return frames, bytes(data[whole:])
+
+
+def parse_address(text):
+    """'host:port' (host defaults to all interfaces) to a (host, port) tuple"""
+    if not text:
+        return None
+    host, _, port = text.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def latest_per_cell(frames):
+    """Keep only the newest frame of each cell, in arrival order"""
+    if len(frames) < 2:
+        return frames
+    _, last = np.unique(frames["cell"][::-1], return_index=True)
+    keep = np.sort(len(frames) - 1 - last)
+    return frames[keep]
+
+
+def accepted_frames(pack, history, frames, now_ns=None):
+    """The frames ``apply_frames`` would write, with their timestamps resolved.
+
+    Frames for unknown cell positions, and frames older than the newest
+    history sample (the history is append only), are dropped. Returns a
+    copy, so alerting can look at exactly the frames that are applied.
+    """
+    frames = frames[frames["cell"] < len(pack)]
+    if now_ns is None:
+        now_ns = time.time_ns()
+    # Senders without a clock leave the timestamp at zero; they are read
+    # now, or at the newest sample when the history runs ahead of the clock
+    timestamps = frames["timestamp_ns"]
+    frames["timestamp_ns"] = np.where(
+        timestamps == 0, max(now_ns, history.last_ns or 0), timestamps
+    )
+    if history.last_ns is not None:
+        frames = frames[frames["timestamp_ns"] >= history.last_ns]
+    return frames
+
+
+def apply_frames(pack, history, frames, archive=None, now_ns=None):
+    """Write decoded frames into the pack state and the history.
+
+    Frames are grouped into one sample per distinct timestamp (cells that
+    did not report are NaN in that sample); the newest frame of each cell
+    becomes its current state. Only ``accepted_frames`` are written.
+    Returns the number of frames applied.
+    """
+    n_cells = len(pack)
+    frames = accepted_frames(pack, history, frames, now_ns)
+    if not len(frames):
+        return 0
+    timestamps = frames["timestamp_ns"]
+    order = np.argsort(timestamps, kind="stable")
+    frames, timestamps = frames[order], timestamps[order]
+    cells = frames["cell"].astype(np.intp)
+
+    latest = latest_per_cell(frames)
+    state = pack.data
+    rows = latest["cell"].astype(np.intp)
+    for param in ("voltage", "current", "temp"):
+        state[param][rows] = latest[param]
+    state["power"][rows] = state["voltage"][rows] * state["current"][rows]
+
+    sample_times, sample_index = np.unique(timestamps, return_inverse=True)
+    params = history.params
+    per_block = max(1, BLOCK_VALUES // (n_cells * len(params)))
+    for first in range(0, len(sample_times), per_block):
+        last = min(first + per_block, len(sample_times))
+        lo, hi = np.searchsorted(sample_index, [first, last])
+        block = np.full((last - first, n_cells, len(params)), np.nan)
+        block_rows = sample_index[lo:hi] - first
+        for k, param in enumerate(params):
+            if param == "power":
+                values = frames["voltage"][lo:hi] * frames["current"][lo:hi]
+            else:
+                values = frames[param][lo:hi]
+            block[block_rows, cells[lo:hi], k] = values
+        history.append_array(sample_times[first:last], block, pack.cell_ids)
+        if archive is not None:
+            archive.append_array(sample_times[first:last], block, pack.cell_ids)
+    return len(frames)
+
+
+class FrameQueue:
+    """Bounded buffer of decoded frame batches with an overload policy.
+
+    At most ``max_frames`` frames are held. When a new batch does not fit,
+    "drop_oldest" discards the oldest queued frames, "drop_newest" discards
+    the incoming batch, and "coalesce" keeps only the newest frame of each
+    cell across everything queued, so the live state survives while
+    intermediate samples are lost.
+    """
+
+    def __init__(self, max_frames=DEFAULT_MAX_PENDING, policy="coalesce"):
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"unknown overload policy: {policy}")
+        self.max_frames = int(max_frames)
+        self.policy = policy
+        self._batches = deque()
+        self._frames = 0
+        self._ready = asyncio.Event()
+        self.dropped = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return self._frames
+
+    def put(self, frames):
+        n = len(frames)
+        if not n:
+            return
+        if self._frames + n > self.max_frames:
+            if self.policy == "drop_newest":
+                self.dropped += n
+                return
+            if self.policy == "drop_oldest":
+                while self._batches and self._frames + n > self.max_frames:
+                    self._frames -= len(self._batches[0])
+                    self.dropped += len(self._batches.popleft())
+            else:
+                merged = np.concatenate([*self._batches, frames])
+                frames = latest_per_cell(merged)
+                self.coalesced += len(merged) - len(frames)
+                self._batches.clear()
+                self._frames = 0
+            if len(frames) > self.max_frames:
+                self.dropped += len(frames) - self.max_frames
+                frames = frames[-self.max_frames :]
+        self._batches.append(frames)
+        self._frames += len(frames)
+        self._ready.set()
+
+    async def get(self):
+        """Wait for frames and return everything queued as one array"""
+        while not self._batches:
+            self._ready.clear()
+            await self._ready.wait()
+        batches = list(self._batches)
+        self._batches.clear()
+        self._frames = 0
+        return batches[0] if len(batches) == 1 else np.concatenate(batches)
+
+
+class _StreamDecoder:
+    """Reassembles frames split across stream reads"""
+
+    def __init__(self, queue, stats):
+        self.queue = queue
+        self.stats = stats
+        self.pending = b""
+
+    def feed(self, data):
+        self.stats["bytes"] += len(data)
+        frames, self.pending = decode_frames(self.pending + data)
+        # Copy out of the receive buffer, it is reused by the next read
+        self.queue.put(frames.copy())
+        self.stats["frames"] += len(frames)
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    def __init__(self, queue, stats):
+        self.queue = queue
+        self.stats = stats
+
+    def datagram_received(self, data, addr):
+        self.stats["bytes"] += len(data)
+        frames, leftover = decode_frames(data)
+        if leftover:
+            self.stats["malformed"] += 1
+        self.queue.put(frames.copy())
+        self.stats["frames"] += len(frames)
+
+
+class _PipeReceiver(asyncio.Protocol):
+    def __init__(self, decoder):
+        self.decoder = decoder
+
+    def data_received(self, data):
+        self.decoder.feed(data)
+
+
+class IngestService:
+    """Asyncio service decoding BMS frames into a pack and its history.
+
+    Frames arrive over TCP, UDP or a (pseudo-)serial device, are decoded
+    in batches with ``np.frombuffer`` and buffered in a FrameQueue. A
+    single writer task drains the queue and applies everything pending in
+    one ``apply_frames`` call, under ``lock``, so readers in other threads
+    can take the lock to see a consistent pack and history. Pass ``lock``
+    to share it with other writers of the same pack. With an ``engine``
+    (a RuleEngine) every batch is also checked against its rules and the
+    resulting alerts are added to ``alerts``, as are the anomalies found
+    by a ``detector`` (an AnomalyDetector); an ``estimator`` (a
+    SocEstimator) filters every reading into its SOC estimates.
+
+    ``start()`` runs the service on its own event loop in a daemon thread;
+    ``run()`` can be awaited directly from existing asyncio code.
+    """
+
+    def __init__(
+        self,
+        pack,
+        history,
+        archive=None,
+        tcp=None,
+        udp=None,
+        serial=None,
+        max_pending=DEFAULT_MAX_PENDING,
+        policy="coalesce",
+        lock=None,
+        engine=None,
+        alerts=None,
+        estimator=None,
+        detector=None,
+    ):
+        self.pack = pack
+        self.history = history
+        self.archive = archive
+        self.tcp = tcp  # (host, port)
+        self.udp = udp  # (host, port)
+        self.serial = serial  # device path
+        self.max_pending = max_pending
+        self.policy = policy
+        self.lock = threading.Lock() if lock is None else lock
+        self.engine = engine
+        self.alerts = alerts
+        self.estimator = estimator
+        self.detector = detector
+        self.stats = {
+            "bytes": 0,
+            "frames": 0,
+            "applied": 0,
+            "batches": 0,
+            "malformed": 0,
+            "errors": 0,
+            "last_error": None,
+            "last_apply_ms": 0.0,
+        }
+        self.queue = None
+        self._loop = None
+        self._thread = None
+        self._stopping = None
+        self.ready = threading.Event()
+        self.error = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot_stats(self):
+        stats = dict(self.stats)
+        if self.queue is not None:
+            stats["pending"] = len(self.queue)
+            stats["dropped"] = self.queue.dropped
+            stats["coalesced"] = self.queue.coalesced
+        return stats
+
+    async def run(self):
+        """Listen on the configured inputs and write frames until stopped"""
+        self.queue = FrameQueue(self.max_pending, self.policy)
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        closers = []
+        try:
+            if self.tcp:
+                server = await asyncio.start_server(self._handle_tcp, *self.tcp)
+                closers.append(server.close)
+            if self.udp:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _DatagramReceiver(self.queue, self.stats),
+                    local_addr=tuple(self.udp),
+                )
+                closers.append(transport.close)
+            if self.serial:
+                fd = os.open(self.serial, os.O_RDONLY | os.O_NONBLOCK | os.O_NOCTTY)
+                transport, _ = await loop.connect_read_pipe(
+                    lambda: _PipeReceiver(_StreamDecoder(self.queue, self.stats)),
+                    os.fdopen(fd, "rb", buffering=0),
+                )
+                closers.append(transport.close)
+        except OSError as exc:
+            self.error = exc
+            for close in closers:
+                close()
+            self.ready.set()
+            raise
+        self.ready.set()
+
+        writer = asyncio.create_task(self._write_loop())
+        try:
+            await self._stopping.wait()
+        finally:
+            writer.cancel()
+            for close in closers:
+                close()
+
+    async def _handle_tcp(self, reader, writer):
+        decoder = _StreamDecoder(self.queue, self.stats)
+        try:
+            while data := await reader.read(READ_SIZE):
+                decoder.feed(data)
+        finally:
+            writer.close()
+
+    async def _write_loop(self):
+        while True:
+            frames = await self.queue.get()
+            start = time.perf_counter()
+            try:
+                applied = self._apply(frames)
+            except Exception as exc:
+                # A bad batch must not end the writer, later frames still apply
+                logger.exception("ingest batch of %d frames failed", len(frames))
+                self.stats["errors"] += 1
+                self.stats["last_error"] = f"{type(exc).__name__}: {exc}"
+                applied = 0
+            self.stats["applied"] += applied
+            self.stats["batches"] += 1
+            self.stats["last_apply_ms"] = (time.perf_counter() - start) * 1e3
+            # Let the readers fill the queue again before the next batch
+            await asyncio.sleep(0)
+
+    def _apply(self, frames):
+        """Write one batch and run the alerting and estimation on it"""
+        with self.lock:
+            now_ns = time.time_ns()
+            # Late frames are not written, so they must not alert either
+            frames = accepted_frames(self.pack, self.history, frames, now_ns)
+            applied = apply_frames(
+                self.pack, self.history, frames, self.archive, now_ns
+            )
+            if self.engine is not None:
+                events = self.engine.evaluate_frames(frames, now_ns)
+                if self.alerts is not None:
+                    raise_alerts(self.alerts, events)
+            if self.detector is not None:
+                events = self.detector.update_frames(frames, now_ns)
+                if self.alerts is not None:
+                    raise_alerts(self.alerts, events)
+            if self.estimator is not None:
+                self.estimator.update_frames(frames, now_ns)
+        return applied
+
+    def start(self, timeout=5.0):
+        """Run the service in a background thread; raises if a listener fails"""
+        if self.running:
+            return self
+        self.ready.clear()
+        self.error = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._thread_main, name="bms-ingest", daemon=True
+        )
+        self._thread.start()
+        self.ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def _thread_main(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self.run())
+        except Exception as exc:
+            # Reported through self.error; start() is woken up even when
+            # the service fails before its listeners are ready
+            if self.error is None:
+                self.error = exc
+            if not isinstance(exc, OSError):
+                logger.exception("ingest service failed")
+        finally:
+            self.ready.set()
+            self._loop.close()
+
+    def stop(self, timeout=5.0):
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(timeout)
+
+
+class ReplayServer:
+    """Local stand-in for a BMS: streams synthetic frames to an IngestService.
+
+    Sends one frame per cell every ``1 / rate_hz`` seconds, with readings
+    wandering around the pack's current state, over TCP, UDP or a pseudo
+    terminal created with ``open_pty()``.
+    """
+
+    def __init__(self, pack, rate_hz=10.0, seed=None):
+        self.pack = pack
+        self.rate_hz = rate_hz
+        self.rng = np.random.default_rng(seed)
+        self.sent = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def sample(self, timestamp_ns):
+        """Encoded frames of one sample for every cell"""
+        n = len(self.pack)
+        state = self.pack.data
+        return encode_frames(
+            timestamp_ns,
+            np.arange(n),
+            state["voltage"] + self.rng.uniform(-0.05, 0.05, n),
+            state["current"] + self.rng.uniform(-0.2, 0.2, n),
+            state["temp"] + self.rng.uniform(-0.5, 0.5, n),
+        )
+
+    def _payloads(self):
+        interval = 1.0 / self.rate_hz
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            yield self.sample(time.time_ns())
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+
+    def send_tcp(self, host, port):
+        import socket
+
+        with socket.create_connection((host, port)) as sock:
+            for payload in self._payloads():
+                sock.sendall(payload)
+                self.sent += len(payload) // FRAME_DTYPE.itemsize
+
+    def send_udp(self, host, port):
+        import socket
+
+        step = MAX_DATAGRAM - MAX_DATAGRAM % FRAME_DTYPE.itemsize
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for payload in self._payloads():
+                for start in range(0, len(payload), step):
+                    sock.sendto(payload[start : start + step], (host, port))
+                self.sent += len(payload) // FRAME_DTYPE.itemsize
+
+    def send_fd(self, fd):
+        for payload in self._payloads():
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view) :]
+            self.sent += len(payload) // FRAME_DTYPE.itemsize
+
+    def start(self, target, *args):
+        """Run one of the ``send_*`` methods in a daemon thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=target, args=args, name="bms-replay", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def join(self, timeout=None):
+        """Wait for the sender thread; returns True while it is still running"""
+        if self._thread is None:
+            return False
+        self._thread.join(timeout)
+        return self._thread.is_alive()
+
+
+def open_pty():
+    """Create a raw pseudo terminal; returns (writer fd, reader device path).
+
+    The reader end is closed again, the device stays while the writer fd
+    is open; the caller closes the writer fd when done.
+    """
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    tty.setraw(master)
+    path = os.ttyname(slave)
+    os.close(slave)
+    return master, path
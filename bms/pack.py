@@ -0,0 +1,372 @@
+import numpy as np
+
+from bms.chemistry import CHEMISTRY_TABLE
+
+# Per-cell state columns
+PACK_DTYPE = np.dtype(
+    [
+        ("voltage", np.float64),
+        ("current", np.float64),
+        ("temp", np.float64),
+        ("power", np.float64),
+        ("chemistry", np.uint8),
+        ("series", np.int32),
+        ("parallel", np.int32),
+        ("module", np.int32),
+    ]
+)
+
+# Cells per module when no topology is given
+DEFAULT_MODULE_SIZE = 8
+
+# Columns exposed through the dict-style cell view
+STATE_FIELDS = ("voltage", "current", "temp", "power")
+
+# Status codes returned by PackState.status_codes()
+HEALTHY, WARNING, CRITICAL = 0, 1, 2
+STATUS_LABELS = np.array(["healthy", "warning", "critical"])
+
+
+class CellView:
+    """Dict-like view of one cell's row in a PackState"""
+
+    __slots__ = ("_pack", "_cell_id")
+
+    def __init__(self, pack, cell_id):
+        self._pack = pack
+        self._cell_id = cell_id
+
+    def _row(self):
+        return self._pack._cells[self._pack._index[self._cell_id]]
+
+    def __getitem__(self, param):
+        if param in STATE_FIELDS:
+            return float(self._row()[param])
+        if param in ("min_voltage", "max_voltage"):
+            return self._pack.spec(self._cell_id)[param]
+        raise KeyError(param)
+
+    def __setitem__(self, param, value):
+        if param not in STATE_FIELDS:
+            raise KeyError(param)
+        self._pack._cells[self._pack._index[self._cell_id]][param] = value
+
+    def __contains__(self, param):
+        return param in self.keys()
+
+    def get(self, param, default=None):
+        try:
+            return self[param]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return STATE_FIELDS + ("min_voltage", "max_voltage")
+
+    def items(self):
+        return [(param, self[param]) for param in self.keys()]
+
+    def values(self):
+        return [self[param] for param in self.keys()]
+
+
+class PackState:
+    """Structured-array state of every cell in the pack.
+
+    Cells are rows of a single NumPy structured array with typed columns
+    for voltage, current, temperature, power and a chemistry code, so
+    status, SOC and pack-wide aggregates are evaluated in one vectorized
+    pass. The class also behaves like the old ``{cell_id: {param: value}}``
+    dict, returning CellView rows, so per-cell UI code keeps working.
+    """
+
+    def __init__(self, table=None):
+        self.table = CHEMISTRY_TABLE if table is None else table
+        self._cells = np.zeros(0, dtype=PACK_DTYPE)
+        self._ids = []
+        self._index = {}
+        self.topology = None
+
+    @property
+    def chemistries(self):
+        """Chemistry keys indexed by the ``chemistry`` code column"""
+        return tuple(self.table.keys)
+
+    # Mapping interface
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __bool__(self):
+        return bool(self._ids)
+
+    def __contains__(self, cell_id):
+        return cell_id in self._index
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def keys(self):
+        return list(self._ids)
+
+    def values(self):
+        return [CellView(self, cell_id) for cell_id in self._ids]
+
+    def items(self):
+        return [(cell_id, CellView(self, cell_id)) for cell_id in self._ids]
+
+    def __getitem__(self, cell_id):
+        if cell_id not in self._index:
+            raise KeyError(cell_id)
+        return CellView(self, cell_id)
+
+    def __setitem__(self, cell_id, cell_data):
+        chemistry = cell_data.get("chemistry") or cell_id.split("_")[2]
+        if cell_id in self._index:
+            row = self._cells[self._index[cell_id]]
+            for param in STATE_FIELDS:
+                if param in cell_data:
+                    row[param] = cell_data[param]
+            row["chemistry"] = self.table.code(chemistry)
+            return
+        self.add_cells(
+            [cell_id],
+            [chemistry],
+            voltage=cell_data.get("voltage", 0.0),
+            current=cell_data.get("current", 0.0),
+            temp=cell_data.get("temp", 0.0),
+            power=cell_data.get("power", 0.0),
+        )
+
+    def __delitem__(self, cell_id):
+        self.remove_cells([cell_id])
+
+    # Bulk operations
+
+    @property
+    def cell_ids(self):
+        return list(self._ids)
+
+    @property
+    def data(self):
+        """The structured array itself; column views can be modified in place"""
+        return self._cells
+
+    def add_cells(
+        self,
+        cell_ids,
+        chemistries,
+        voltage,
+        current=0.0,
+        temp=25.0,
+        power=0.0,
+        series=None,
+        parallel=0,
+        module=None,
+    ):
+        """Append cells in one go; scalar values are broadcast.
+
+        Without topology indices each new cell becomes its own series
+        group and cells are grouped into modules of DEFAULT_MODULE_SIZE.
+        """
+        n = len(cell_ids)
+        if any(cell_id in self._index for cell_id in cell_ids):
+            raise ValueError("cell already exists in the pack")
+        rows = np.zeros(n, dtype=PACK_DTYPE)
+        if isinstance(chemistries, str):
+            chemistries = [chemistries] * n
+        codes = {key: self.table.code(key) for key in set(chemistries)}
+        rows["chemistry"] = [codes[key] for key in chemistries]
+        rows["voltage"] = voltage
+        rows["current"] = current
+        rows["temp"] = temp
+        rows["power"] = power
+        offset = len(self._ids)
+        positions = np.arange(offset, offset + n)
+        rows["series"] = positions if series is None else series
+        rows["parallel"] = parallel
+        rows["module"] = positions // DEFAULT_MODULE_SIZE if module is None else module
+        self._cells = np.concatenate([self._cells, rows])
+        for i, cell_id in enumerate(cell_ids):
+            self._index[cell_id] = offset + i
+        self._ids.extend(cell_ids)
+
+    def remove_cells(self, cell_ids):
+        drop = [self._index.pop(cell_id) for cell_id in cell_ids]
+        self._cells = np.delete(self._cells, drop)
+        self._ids = [cell_id for cell_id in self._ids if cell_id in self._index]
+        self._index = {cell_id: i for i, cell_id in enumerate(self._ids)}
+
+    def replace_cell(self, cell_id, new_id, chemistry, voltage, temp):
+        """Swap a cell for a new one in the same position of the pack"""
+        idx = self._index.pop(cell_id)
+        row = self._cells[idx]
+        row["chemistry"] = self.table.code(chemistry)
+        row["voltage"] = voltage
+        row["temp"] = temp
+        row["current"] = 0.0
+        row["power"] = 0.0
+        self._ids[idx] = new_id
+        self._index[new_id] = idx
+
+    def clear(self):
+        self.__init__(self.table)
+
+    def copy(self, readonly=False):
+        """Independent copy of the pack sharing the chemistry table.
+
+        With ``readonly`` the copy's state array cannot be written, so it
+        can be handed to many readers at once.
+        """
+        pack = PackState(self.table)
+        pack._cells = self._cells.copy()
+        pack._cells.flags.writeable = not readonly
+        pack._ids = list(self._ids)
+        pack._index = dict(self._index)
+        pack.topology = self.topology
+        return pack
+
+    def chemistry_of(self, cell_id):
+        return self.table.keys[self._cells[self._index[cell_id]]["chemistry"]]
+
+    def spec(self, cell_id):
+        return self.table.specs[self.chemistry_of(cell_id)]
+
+    def spec_column(self, key):
+        """Per-cell array of a limit-table field, 'name' or 'color'"""
+        return self.table.column(key)[self._cells["chemistry"]]
+
+    def sample(self, params=STATE_FIELDS):
+        """Current state as a (1, cells, params) block for the history stores"""
+        return np.stack([self._cells[param] for param in params], axis=-1)[np.newaxis]
+
+    # Vectorized evaluation
+
+    def status_codes(self, index=None):
+        """HEALTHY / WARNING / CRITICAL per cell, same rules as get_cell_status.
+
+        ``index`` (a position, slice or array) limits the evaluation to those cells.
+        """
+        cells = self._cells if index is None else self._cells[np.atleast_1d(index)]
+        voltage = cells["voltage"]
+        temp = cells["temp"]
+        limits = self.table.limits[cells["chemistry"]]
+
+        v_critical = (voltage < limits["v_critical_low"]) | (
+            voltage > limits["v_critical_high"]
+        )
+        v_warning = (voltage < limits["v_warning_low"]) | (
+            voltage > limits["v_warning_high"]
+        )
+        t_critical = (temp < limits["t_critical_low"]) | (
+            temp > limits["t_critical_high"]
+        )
+        t_warning = (temp < limits["t_warning_low"]) | (temp > limits["t_warning_high"])
+
+        # Voltage is checked first, just like the per-cell function
+        return np.select(
+            [v_critical, v_warning, t_critical, t_warning],
+            [CRITICAL, WARNING, CRITICAL, WARNING],
+            HEALTHY,
+        ).astype(np.int8)
+
+    def status_labels(self):
+        return STATUS_LABELS[self.status_codes()]
+
+    def soc(self):
+        """State of charge in percent from each chemistry's OCV curve"""
+        cells = self._cells
+        return self.table.soc(cells["voltage"], cells["chemistry"], cells["temp"]) * 100
+
+    def soc_history(self, history, n=None):
+        """SOC (%) over the last ``n`` history samples, as (cells, samples).
+
+        Whole voltage and temperature columns are looked up at once. Rows
+        follow the pack's cell order; cells the history does not track
+        are NaN.
+        """
+        index = {cell_id: row for row, cell_id in enumerate(history.cell_ids)}
+        rows = np.array([index.get(cell_id, -1) for cell_id in self._ids], dtype=int)
+        tracked = rows >= 0
+        soc = np.full((len(self), len(history.timestamps(n))), np.nan)
+        codes = self._cells["chemistry"][tracked, np.newaxis]
+        voltage = history.param_block("voltage", n)[rows[tracked]]
+        temp = history.param_block("temp", n)[rows[tracked]]
+        soc[tracked] = self.table.soc(voltage, codes, temp) * 100
+        return soc
+
+    def healthy_count(self):
+        return int(np.count_nonzero(self.status_codes() == HEALTHY))
+
+    def total_power(self):
+        return float(self._cells["power"].sum())
+
+    def total_current(self):
+        return float(self._cells["current"].sum())
+
+    def average_temp(self):
+        return float(self._cells["temp"].mean()) if len(self) else 0.0
+
+    def average_voltage(self):
+        return float(self._cells["voltage"].mean()) if len(self) else 0.0
+
+    def summary(self):
+        """Pack-wide status counts and aggregates as a plain dict"""
+        counts = np.bincount(self.status_codes(), minlength=len(STATUS_LABELS))
+        summary = {
+            "cells": len(self),
+            "average_voltage": self.average_voltage(),
+            "average_temp": self.average_temp(),
+            "total_current": self.total_current(),
+            "total_power": self.total_power(),
+            "average_soc": float(self.soc().mean()) if len(self) else 0.0,
+        }
+        for label, count in zip(STATUS_LABELS, counts):
+            summary[str(label)] = int(count)
+        return summary
+
+    def module_totals(self):
+        """Per-module mean voltage/temperature and summed power"""
+        modules, inverse = np.unique(self._cells["module"], return_inverse=True)
+        counts = np.bincount(inverse)
+        return {
+            "module": modules,
+            "voltage": np.bincount(inverse, self._cells["voltage"]) / counts,
+            "temp": np.bincount(inverse, self._cells["temp"]) / counts,
+            "power": np.bincount(inverse, self._cells["power"]),
+        }
+
+
+class PackTotals:
+    """Pack-wide sums that can be kept up to date one cell at a time.
+
+    ``reset`` recomputes everything from the pack in one vectorized pass;
+    ``set_cell`` writes a single cell and folds its change into the sums
+    in O(1), for code paths that touch one cell per rerun.
+    """
+
+    def __init__(self, pack):
+        self.reset(pack)
+
+    def reset(self, pack):
+        self.cells = len(pack)
+        self.current = pack.total_current()
+        self.power = pack.total_power()
+        self.voltage_sum = float(pack.data["voltage"].sum())
+        self.healthy = pack.healthy_count()
+
+    def set_cell(self, pack, idx, **values):
+        """Write state ``values`` to the cell at position ``idx`` and update the sums"""
+        row = pack.data[idx]
+        current, power, voltage = row["current"], row["power"], row["voltage"]
+        was_healthy = pack.status_codes(idx)[0] == HEALTHY
+        for param, value in values.items():
+            row[param] = value
+        self.current += row["current"] - current
+        self.power += row["power"] - power
+        self.voltage_sum += row["voltage"] - voltage
+        self.healthy += int(pack.status_codes(idx)[0] == HEALTHY) - int(was_healthy)
+
+    @property
+    def average_voltage(self):
+        return self.voltage_sum / self.cells if self.cells else 0.0
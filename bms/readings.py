@@ -0,0 +1,63 @@
+import numpy as np
+
+# Largest (cells x samples x params) block read from a history at once
+BLOCK_ELEMENTS = 4_000_000
+
+
+def reading_passes(timestamps_ns, cells):
+    """Split a batch of readings into passes of at most one reading per cell.
+
+    Yields index arrays into the batch. A cell's readings come in time
+    order across the passes, so models that step one reading per cell at
+    a time can still step every cell of a pass in one array operation.
+    """
+    if not len(cells):
+        return
+    order = np.lexsort((timestamps_ns, cells))
+    sorted_cells = cells[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_cells[1:] != sorted_cells[:-1]
+    starts = np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))
+    rank = np.arange(len(order)) - starts  # reading's position within its cell
+    by_rank = order[np.argsort(rank, kind="stable")]
+    bounds = np.cumsum(np.bincount(rank))
+    for lo, hi in zip(np.r_[0, bounds[:-1]], bounds):
+        yield by_rank[lo:hi]
+
+
+def history_blocks(history, cell_ids, since_ns, params, max_elements=BLOCK_ELEMENTS):
+    """History samples newer than ``since_ns``, as time-ordered blocks.
+
+    ``cell_ids`` are a model's cells and ``since_ns`` the newest reading
+    it has seen, per cell (the oldest of them counts) or for all. Yields
+    ``(timestamps_ns, cells, {param: (cells, samples) array})`` with
+    ``cells`` the model positions that the history holds.
+    """
+    index = {cell_id: row for row, cell_id in enumerate(history.cell_ids)}
+    rows = np.array([index.get(cell_id, -1) for cell_id in cell_ids], dtype=int)
+    cells = np.flatnonzero(rows >= 0)
+    timestamps = history.timestamps()
+    if not len(cells) or not len(timestamps):
+        return
+    since_ns = np.asarray(since_ns)
+    if since_ns.ndim:
+        since_ns = since_ns[cells].min()
+    start = np.searchsorted(timestamps, since_ns, side="right")
+    n = len(timestamps) - start
+    per_block = max(1, max_elements // (len(cells) * len(params)))
+    for first in range(0, n, per_block):
+        count = min(per_block, n - first)
+        # Blocks count back from the newest sample
+        yield timestamps[start + first : start + first + count], cells, {
+            param: history.param_block(param, n - first)[rows[cells], :count]
+            for param in params
+        }
+
+
+def flatten_block(timestamps_ns, cells, block):
+    """A (cells, samples) block as flat readings: (timestamps, cells, {param: values})"""
+    return (
+        np.tile(timestamps_ns, len(cells)),
+        np.repeat(cells, len(timestamps_ns)),
+        {param: values.ravel() for param, values in block.items()},
+    )
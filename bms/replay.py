@@ -0,0 +1,458 @@
+import threading
+import time
+
+import numpy as np
+
+from bms.ingest import accepted_frames, apply_frames
+from bms.rules import RuleEngine, raise_alerts, safety_rules
+
+LOG_FORMATS = ("csv", "candump")
+
+# Frames parsed from a log; like the ingest frames but kept in float64 so
+# replayed values are not rounded on the way into the history
+REPLAY_DTYPE = np.dtype(
+    [
+        ("timestamp_ns", "<i8"),
+        ("cell", "<u4"),
+        ("voltage", "<f8"),
+        ("current", "<f8"),
+        ("temp", "<f8"),
+    ]
+)
+
+# Log lines parsed per chunk, keeps peak memory flat for day-long logs
+DEFAULT_CHUNK_ROWS = 200_000
+
+# Longest wall-clock gap between applied slices of a paced replay (s)
+PACE_INTERVAL_S = 0.1
+
+# candump frames arrive one cell at a time; they are grouped into samples
+# of this width so every sample holds a reading of (nearly) every cell
+CANDUMP_SAMPLE_PERIOD_S = 0.1
+
+# CAN id of cell 0, cell n reports on CANDUMP_BASE_ID + n
+CANDUMP_BASE_ID = 0x300
+
+# First six payload bytes: voltage (mV), current (10 mA), temperature (0.1 °C)
+CANDUMP_PAYLOAD = np.dtype([("voltage", ">u2"), ("current", ">i2"), ("temp", ">i2")])
+CANDUMP_SCALES = {"voltage": 0.001, "current": 0.01, "temp": 0.1}
+
+# Typical length of a candump line, sizes the blocks read per chunk
+CANDUMP_LINE_BYTES = 42
+
+READINGS = ("voltage", "current", "temp")
+
+
+def detect_format(source, name=None):
+    """Guess the log format from the file name or its first line"""
+    name = name or getattr(source, "name", source if isinstance(source, str) else "")
+    if str(name).lower().endswith(".csv"):
+        return "csv"
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            head = f.readline()
+    else:
+        head = source.readline()
+        source.seek(0)
+    if isinstance(head, str):
+        head = head.encode()
+    return "candump" if head.lstrip().startswith(b"(") else "csv"
+
+
+def _frames(timestamps_ns, cells, voltage, current, temp):
+    """Frames from parsed columns, dropping readings with a missing value"""
+    frames = np.empty(len(cells), dtype=REPLAY_DTYPE)
+    frames["timestamp_ns"] = timestamps_ns
+    frames["cell"] = cells
+    frames["voltage"] = voltage
+    frames["current"] = current
+    frames["temp"] = temp
+    missing = np.isnan(frames["voltage"]) | np.isnan(frames["current"])
+    missing |= np.isnan(frames["temp"])
+    return frames[~missing] if missing.any() else frames
+
+
+def _timestamps_ns(column):
+    """Timestamp column (ISO text or epoch seconds) to ns since epoch"""
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(column):
+        return np.round(column.to_numpy(np.float64) * 1e9).astype(np.int64)
+    return pd.to_datetime(column).to_numpy("datetime64[ns]").astype(np.int64)
+
+
+def read_csv_log(source, pack, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield frame arrays from a CSV log, ``chunk_rows`` lines at a time.
+
+    Two layouts are accepted: the wide history export (``timestamp`` plus
+    ``{cell}_{param}`` columns) and a long log with ``timestamp``,
+    ``cell``, ``voltage``, ``current`` and ``temp`` columns, where ``cell``
+    is a cell id or a pack position. Cells not in the pack are skipped.
+    """
+    import pandas as pd
+
+    positions = {cell_id: i for i, cell_id in enumerate(pack.cell_ids)}
+    layout = None
+    for chunk in pd.read_csv(source, chunksize=chunk_rows):
+        if layout is None:
+            layout = _csv_layout(chunk.columns, positions)
+        timestamps_ns = _timestamps_ns(chunk["timestamp"])
+        if layout == "long":
+            cells = chunk["cell"]
+            if not pd.api.types.is_numeric_dtype(cells):
+                cells = cells.map(positions)
+            cells = cells.to_numpy(np.float64)
+            known = (cells >= 0) & (cells < len(pack))
+            yield _frames(
+                timestamps_ns[known],
+                cells[known],
+                *(chunk[param].to_numpy(np.float64)[known] for param in READINGS),
+            )
+        else:
+            rows, columns = layout
+            n = len(chunk)
+            values = [
+                chunk.reindex(columns=columns[param]).to_numpy(np.float64)
+                for param in READINGS
+            ]
+            yield _frames(
+                np.repeat(timestamps_ns, len(rows)),
+                np.tile(rows, n),
+                *(block.ravel() for block in values),
+            )
+
+
+def _csv_layout(columns, positions):
+    """'long', or (pack rows, {param: column names}) for a wide export"""
+    columns = list(columns)
+    if "timestamp" not in columns:
+        raise ValueError("log has no timestamp column")
+    if "cell" in columns:
+        missing = [param for param in READINGS if param not in columns]
+        if missing:
+            raise ValueError(f"log is missing columns: {', '.join(missing)}")
+        return "long"
+    cell_ids = []
+    for column in columns:
+        cell_id, _, param = column.rpartition("_")
+        if param in READINGS and cell_id in positions and cell_id not in cell_ids:
+            cell_ids.append(cell_id)
+    if not cell_ids:
+        raise ValueError("no log columns match cells of the pack")
+    rows = np.array([positions[cell_id] for cell_id in cell_ids], dtype=np.uint32)
+    return rows, {
+        param: [f"{cell_id}_{param}" for cell_id in cell_ids] for param in READINGS
+    }
+
+
+def _digit_table():
+    table = np.full(256, 99, dtype=np.int64)
+    for offset, chars in ((0, b"0123456789"), (10, b"abcdef"), (10, b"ABCDEF")):
+        table[np.frombuffer(chars, np.uint8)] = offset + np.arange(len(chars))
+    return table
+
+
+# Byte -> hex digit value (99 for anything that is not a hex digit)
+DIGIT_VALUES = _digit_table()
+
+
+def _number(raw, start, stop, width, base):
+    """Parse raw[start:stop] per line as a number of at most ``width`` digits.
+
+    Returns (values, bad) where ``bad`` flags empty, too long or
+    non-numeric fields.
+    """
+    idx = stop[:, np.newaxis] - width + np.arange(width)
+    inside = idx >= start[:, np.newaxis]
+    digits = np.where(inside, DIGIT_VALUES[raw[np.where(inside, idx, 0)]], 0)
+    bad = (digits >= base).any(axis=1) | (stop - start > width) | (stop <= start)
+    weights = base ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return digits @ weights, bad
+
+
+def _candump_frames(block, n_cells, base_id):
+    """Vectorized parse of whole ``candump -l`` lines held in ``block`` (bytes)"""
+    raw = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(raw == ord("\n"))
+    n = len(ends)
+    valid = np.ones(n, dtype=bool)
+    marks = {}
+    for char in "()#":
+        pos = np.flatnonzero(raw == ord(char))
+        line = np.searchsorted(ends, pos)
+        valid &= np.bincount(line, minlength=n) == 1
+        marks[char] = np.full(n, -1)
+        marks[char][line] = pos
+    opening, closing, hash_ = marks["("], marks[")"], marks["#"]
+    # Remote frames and payloads under six bytes cannot hold a reading
+    valid &= (opening < closing) & (closing < hash_) & (ends - hash_ > 12)
+
+    # Fraction separator inside the brackets, last blank before the id
+    dot = np.full(n, -1)
+    pos = np.flatnonzero(raw == ord("."))
+    line = np.searchsorted(ends, pos)
+    inside = (pos > opening[line]) & (pos < closing[line])
+    dot[line[inside]] = pos[inside]
+    blank = np.full(n, -1)
+    pos = np.flatnonzero((raw == ord(" ")) | (raw == ord("\t")))
+    line = np.searchsorted(ends, pos)
+    np.maximum.at(blank, line[pos < hash_[line]], pos[pos < hash_[line]])
+    valid &= (dot > 0) & (blank > closing)
+
+    ends, opening, closing, hash_ = (
+        ends[valid],
+        opening[valid],
+        closing[valid],
+        hash_[valid],
+    )
+    dot, blank = dot[valid], blank[valid]
+    seconds, bad = _number(raw, opening + 1, dot, 12, 10)
+    fraction, bad_fraction = _number(raw, dot + 1, closing, 9, 10)
+    can_ids, bad_id = _number(raw, blank + 1, hash_, 8, 16)
+    digits = DIGIT_VALUES[raw[hash_[:, np.newaxis] + 1 + np.arange(12)]]
+    bad |= bad_fraction | bad_id | (digits > 15).any(axis=1)
+
+    # A fraction of k digits is in units of 10**-k s
+    scale = 10 ** (9 - (closing - dot - 1)).clip(0, 9)
+    timestamps_ns = seconds * 1_000_000_000 + fraction * scale
+    payload = (digits[:, 0::2] * 16 + digits[:, 1::2]).astype(np.uint8)
+    data = payload.view(CANDUMP_PAYLOAD)[:, 0]
+    cells = can_ids - base_id
+    keep = ~bad & (cells >= 0) & (cells < n_cells)
+    return _frames(
+        timestamps_ns[keep],
+        cells[keep],
+        *(data[param][keep] * CANDUMP_SCALES[param] for param in READINGS),
+    )
+
+
+def read_candump(source, pack, chunk_rows=DEFAULT_CHUNK_ROWS, base_id=CANDUMP_BASE_ID):
+    """Yield frame arrays from a ``candump -l`` log, about ``chunk_rows`` lines at a time.
+
+    Lines look like ``(1697040000.123456) can0 301#0E7400C80136``. Each
+    block of lines is parsed as one byte array without a per-line Python
+    step. Ids outside the pack's cell range, remote and CAN FD frames and
+    payloads shorter than six bytes are skipped.
+    """
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        leftover = b""
+        while True:
+            block = f.read(chunk_rows * CANDUMP_LINE_BYTES)
+            if isinstance(block, str):
+                block = block.encode()
+            if not block:
+                break
+            block = leftover + block
+            cut = block.rfind(b"\n") + 1
+            block, leftover = block[:cut], block[cut:]
+            if block:
+                yield _candump_frames(block, len(pack), base_id)
+        if leftover.strip():
+            yield _candump_frames(leftover + b"\n", len(pack), base_id)
+    finally:
+        if f is not source:
+            f.close()
+
+
+def format_candump(timestamps_ns, cells, voltage, current, temp, interface="can0"):
+    """Format readings as ``candump -l`` lines (the inverse of read_candump)"""
+    payload = np.empty(len(cells), dtype=CANDUMP_PAYLOAD)
+    payload["voltage"] = np.round(np.asarray(voltage) / CANDUMP_SCALES["voltage"])
+    payload["current"] = np.round(np.asarray(current) / CANDUMP_SCALES["current"])
+    payload["temp"] = np.round(np.asarray(temp) / CANDUMP_SCALES["temp"])
+    data = payload.tobytes().hex().upper()
+    size = 2 * CANDUMP_PAYLOAD.itemsize
+    lines = []
+    for i, (timestamp_ns, cell) in enumerate(zip(timestamps_ns, cells)):
+        seconds, nanoseconds = divmod(int(timestamp_ns), 1_000_000_000)
+        lines.append(
+            f"({seconds}.{nanoseconds // 1000:06d}) {interface}"
+            f" {CANDUMP_BASE_ID + int(cell):03X}#{data[i * size:(i + 1) * size]}\n"
+        )
+    return "".join(lines)
+
+
+def _whole_samples(chunks, period_ns=None):
+    """Re-chunk frame arrays so no sample (timestamp) spans two chunks.
+
+    Timestamps are first floored to ``period_ns`` when given. The frames
+    of the last timestamp of a chunk are held back until the next chunk
+    shows whether more frames of that sample follow.
+    """
+    pending = None
+    for frames in chunks:
+        if period_ns:
+            frames["timestamp_ns"] -= frames["timestamp_ns"] % period_ns
+        if pending is not None:
+            frames = np.concatenate([pending, frames])
+        if not len(frames):
+            pending = frames
+            continue
+        timestamps = frames["timestamp_ns"]
+        last = timestamps.max()
+        tail = timestamps == last
+        pending = frames[tail]
+        if not tail.all():
+            yield frames[~tail]
+    if pending is not None and len(pending):
+        yield pending
+
+
+def replay_log(
+    source,
+    pack,
+    history,
+    fmt=None,
+    speed=None,
+    archive=None,
+    alerts=None,
+    engine=None,
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    sample_period_s=None,
+    progress=None,
+    lock=None,
+    stop=None,
+):
+    """Replay a recorded log into the pack state, the history and the alerts.
+
+    ``source`` is a path or an open file in one of LOG_FORMATS (guessed
+    when ``fmt`` is None). Frames go through the same ``apply_frames``
+    path as live ingest, so rollups and the archive are filled as usual
+    (the archive is flushed at the end). Every reading goes through
+    ``engine`` (a RuleEngine, default: the safety limits) and its alerts
+    are added to ``alerts`` (an AlertLog) with the log's timestamp.
+
+    The log's timestamps lie in the past, so ``history`` (and
+    ``archive``) should be fresh stores rather than ones holding live
+    samples. ``speed`` is a multiple of the recorded rate (1 = real
+    time); None replays as fast as the log can be parsed. Each slice is
+    applied under ``lock`` when given, so readers in other threads see
+    whole slices. ``progress`` is called with the running stats after
+    each applied slice; setting the ``stop`` event ends the replay early.
+    Returns the stats dict.
+    """
+    fmt = fmt or detect_format(source)
+    if fmt == "csv":
+        chunks = read_csv_log(source, pack, chunk_rows)
+    elif fmt == "candump":
+        chunks = read_candump(source, pack, chunk_rows)
+        if sample_period_s is None:
+            sample_period_s = CANDUMP_SAMPLE_PERIOD_S
+    else:
+        raise ValueError(f"unknown log format: {fmt}")
+    period_ns = int(sample_period_s * 1e9) if sample_period_s else None
+
+    if engine is None:
+        engine = RuleEngine(safety_rules(), pack)
+    if lock is None:
+        lock = threading.Lock()
+    if stop is None:
+        stop = threading.Event()
+    stats = {
+        "frames": 0,
+        "samples": 0,
+        "alerts": 0,
+        "start_ns": None,
+        "end_ns": None,
+        "elapsed_s": 0.0,
+    }
+    started = time.perf_counter()
+    for frames in _whole_samples(chunks, period_ns):
+        frames = frames[np.argsort(frames["timestamp_ns"], kind="stable")]
+        if stats["start_ns"] is None:
+            stats["start_ns"] = int(frames["timestamp_ns"][0])
+        for part in _paced(frames, speed, stats["start_ns"], started, stop):
+            timestamps = part["timestamp_ns"]
+            with lock:
+                # Only frames the history takes alert, like in the ingest service
+                part = accepted_frames(pack, history, part)
+                events = engine.evaluate_frames(part)
+                stats["frames"] += apply_frames(pack, history, part, archive=archive)
+                if alerts is not None:
+                    raise_alerts(alerts, events)
+            stats["samples"] += int(np.count_nonzero(np.diff(timestamps))) + 1
+            stats["alerts"] += len(events)
+            stats["end_ns"] = int(timestamps[-1])
+            stats["elapsed_s"] = time.perf_counter() - started
+            if progress is not None:
+                progress(stats)
+        if stop.is_set():
+            break
+    if archive is not None:
+        archive.flush()
+    stats["elapsed_s"] = time.perf_counter() - started
+    return stats
+
+
+def _paced(frames, speed, start_ns, started, stop):
+    """Split time-ordered frames into slices released at ``speed`` x recorded time"""
+    if not speed:
+        yield frames
+        return
+    timestamps = frames["timestamp_ns"]
+    window_ns = max(1, int(speed * PACE_INTERVAL_S * 1e9))
+    edges = np.arange(timestamps[0], timestamps[-1] + window_ns, window_ns)
+    bounds = np.unique(np.append(np.searchsorted(timestamps, edges), len(frames)))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        due = started + (timestamps[hi - 1] - start_ns) / 1e9 / speed
+        delay = due - time.perf_counter()
+        if delay > 0 and stop.wait(delay):
+            return
+        yield frames[lo:hi]
+
+
+class LogReplay:
+    """Runs ``replay_log`` in a daemon thread, so a paced replay does not block.
+
+    ``stats`` is updated as slices are applied and holds the final stats
+    once the thread ends; ``error`` is the exception that ended the
+    replay early, if any. Keyword arguments are passed to ``replay_log``.
+    """
+
+    def __init__(self, source, pack, history, **kwargs):
+        self.source = source
+        self.pack = pack
+        self.history = history
+        self.kwargs = kwargs
+        self.stats = {"frames": 0, "samples": 0, "alerts": 0, "end_ns": None}
+        self.error = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            self.stats = replay_log(
+                self.source,
+                self.pack,
+                self.history,
+                progress=lambda stats: setattr(self, "stats", dict(stats)),
+                stop=self._stop,
+                **self.kwargs,
+            )
+        except Exception as exc:
+            self.error = exc
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="bms-log-replay", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def join(self, timeout=None):
+        """Wait for the replay thread; returns True while it is still running"""
+        if self._thread is None:
+            return False
+        self._thread.join(timeout)
+        return self._thread.is_alive()
@@ -0,0 +1,16 @@
+def mirrored_write(target, head, capacity, block):
+    """Write ``block`` at ring position ``head`` in both halves of ``target``.
+
+    ``target``'s last axis has length ``2 * capacity`` and ``block``'s last
+    axis holds at most ``capacity`` samples. Writing every sample at ``i``
+    and ``i + capacity`` keeps the newest samples contiguous, so readers
+    can always take a plain slice ending at ``head + capacity``.
+    """
+    n = block.shape[-1]
+    target[..., head : head + n] = block
+    split = capacity - head  # samples that land before the wrap point
+    if n <= split:
+        target[..., head + capacity : head + capacity + n] = block
+    else:
+        target[..., head + capacity :] = block[..., :split]
+        target[..., : n - split] = block[..., split:]
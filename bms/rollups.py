@@ -0,0 +1,195 @@
+import numpy as np
+
+from bms.ring import mirrored_write
+
+# Bucket widths of the rollup tiers in seconds (1 s / 1 min / 1 h)
+ROLLUP_RESOLUTIONS = (1, 60, 3600)
+
+# Buckets kept per tier, enough for one point per pixel on a wide chart
+DEFAULT_TIER_CAPACITY = 2048
+
+
+class RollupTier:
+    """Fixed-width time buckets holding min, max, sum, count and last per column.
+
+    Buckets are stored like the raw history: one row per (cell, parameter),
+    written mirrored so the newest buckets are always a contiguous view.
+    The newest bucket stays open and is merged into as samples arrive.
+    """
+
+    def __init__(self, resolution_s, capacity=DEFAULT_TIER_CAPACITY, n_params=4):
+        self.resolution_s = resolution_s
+        self.resolution_ns = int(resolution_s * 1e9)
+        self.capacity = int(capacity)
+        self.n_params = n_params
+        self._bucket_ids = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._min = self._empty(0)
+        self._max = self._empty(0)
+        self._sum = self._empty(0)
+        self._last = self._empty(0)
+        self._count = np.zeros((0, n_params, 2 * self.capacity), dtype=np.int32)
+        self._head = 0
+        self._size = 0
+
+    def _empty(self, n_cells):
+        return np.full((n_cells, self.n_params, 2 * self.capacity), np.nan)
+
+    def __len__(self):
+        return self._size
+
+    def add_cells(self, n_new):
+        """Grow the cell axis for newly tracked cells"""
+        self._min = np.concatenate([self._min, self._empty(n_new)])
+        self._max = np.concatenate([self._max, self._empty(n_new)])
+        self._sum = np.concatenate([self._sum, self._empty(n_new)])
+        self._last = np.concatenate([self._last, self._empty(n_new)])
+        self._count = np.concatenate(
+            [
+                self._count,
+                np.zeros((n_new, self.n_params, 2 * self.capacity), dtype=np.int32),
+            ]
+        )
+
+    def copy(self, readonly=False):
+        """Independent copy of the tier (``readonly`` freezes its arrays).
+
+        A read-only copy is never written to, so it only holds the retained
+        buckets, once, instead of both mirrored halves of the capacity.
+        """
+        if not readonly:
+            tier = RollupTier(self.resolution_s, self.capacity, self.n_params)
+            for name in ("_bucket_ids", "_min", "_max", "_sum", "_last", "_count"):
+                setattr(tier, name, getattr(self, name).copy())
+            tier._head = self._head
+            tier._size = self._size
+            return tier
+        tier = RollupTier(self.resolution_s, max(self._size, 1), self.n_params)
+        window = self._window()
+        tier._bucket_ids = self._bucket_ids[window].copy()
+        for name in ("_min", "_max", "_sum", "_last", "_count"):
+            setattr(tier, name, getattr(self, name)[:, :, window].copy())
+        for name in ("_bucket_ids", "_min", "_max", "_sum", "_last", "_count"):
+            getattr(tier, name).flags.writeable = False
+        tier._size = self._size
+        return tier
+
+    @property
+    def first_ns(self):
+        """Start of the oldest retained bucket, or None when empty"""
+        if not self._size:
+            return None
+        return int(self._bucket_ids[self._window().start]) * self.resolution_ns
+
+    def update(self, timestamps_ns, values):
+        """Fold a time-ordered block of shape (samples, cells, params) into buckets.
+
+        Returns the per-bucket stats of the block, see ``update_stats``.
+        """
+        return self.update_stats(timestamps_ns, *sample_stats(values))
+
+    def update_stats(self, timestamps_ns, mins, maxs, sums, counts, lasts):
+        """Fold time-ordered partial stats (e.g. a finer tier's buckets) into buckets.
+
+        Returns ``(bucket_start_ns, mins, maxs, sums, counts, lasts)`` for
+        the buckets touched by this block, so a coarser tier can be fed
+        from them instead of from the raw samples.
+        """
+        if len(timestamps_ns) == 0:
+            return None
+        ids = timestamps_ns // self.resolution_ns
+        if self._size and ids[0] < self._last_id():
+            raise ValueError("samples are older than the open bucket")
+
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])
+        if len(starts) < len(ids):
+            ends = np.concatenate([starts[1:], [len(ids)]])
+            mins = np.fmin.reduceat(mins, starts, axis=0)
+            maxs = np.fmax.reduceat(maxs, starts, axis=0)
+            sums = np.add.reduceat(sums, starts, axis=0)
+            counts = np.add.reduceat(counts, starts, axis=0)
+            lasts = lasts[ends - 1]
+            ids = ids[starts]
+        # else: one input row per bucket, nothing to reduce
+        groups = (ids * self.resolution_ns, mins, maxs, sums, counts, lasts)
+
+        if self._size and ids[0] == self._last_id():
+            self._merge_open(mins[0], maxs[0], sums[0], counts[0], lasts[0])
+            ids, mins, maxs = ids[1:], mins[1:], maxs[1:]
+            sums, counts, lasts = sums[1:], counts[1:], lasts[1:]
+
+        n = len(ids)
+        if n > self.capacity:
+            keep = slice(n - self.capacity, n)
+            ids, mins, maxs = ids[keep], mins[keep], maxs[keep]
+            sums, counts, lasts = sums[keep], counts[keep], lasts[keep]
+            n = self.capacity
+        if n:
+            mirrored_write(self._bucket_ids, self._head, self.capacity, ids)
+            for target, block in (
+                (self._min, mins),
+                (self._max, maxs),
+                (self._sum, sums),
+                (self._count, counts),
+                (self._last, lasts),
+            ):
+                # (buckets, cells, params) -> (cells, params, buckets)
+                mirrored_write(
+                    target, self._head, self.capacity, block.transpose(1, 2, 0)
+                )
+            self._head = (self._head + n) % self.capacity
+            self._size = min(self._size + n, self.capacity)
+        return groups
+
+    def _last_id(self):
+        return self._bucket_ids[self._head + self.capacity - 1]
+
+    def _merge_open(self, mins, maxs, sums, counts, lasts):
+        """Merge per-(cell, param) stats into the open bucket"""
+        pos = (self._head - 1) % self.capacity
+        for i in (pos, pos + self.capacity):
+            self._min[:, :, i] = np.fmin(self._min[:, :, i], mins)
+            self._max[:, :, i] = np.fmax(self._max[:, :, i], maxs)
+            self._sum[:, :, i] += sums
+            self._count[:, :, i] += counts
+            self._last[:, :, i] = np.where(np.isnan(lasts), self._last[:, :, i], lasts)
+
+    def _window(self, start_ns=None, end_ns=None):
+        """Slice of the buckets overlapping [start_ns, end_ns)"""
+        stop = self._head + self.capacity
+        window = slice(stop - self._size, stop)
+        if start_ns is None and end_ns is None:
+            return window
+        ids = self._bucket_ids[window]
+        lo = (
+            0
+            if start_ns is None
+            else np.searchsorted(ids, start_ns // self.resolution_ns)
+        )
+        hi = (
+            len(ids)
+            if end_ns is None
+            else np.searchsorted(ids, -(-end_ns // self.resolution_ns))
+        )
+        return slice(window.start + int(lo), window.start + int(hi))
+
+    def view(self, row, col, start_ns=None, end_ns=None):
+        """Return bucket start times and min/max/mean/count/last for one column"""
+        window = self._window(start_ns, end_ns)
+        count = self._count[row, col, window]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._sum[row, col, window] / count
+        return {
+            "timestamp": self._bucket_ids[window] * self.resolution_ns,
+            "min": self._min[row, col, window],
+            "max": self._max[row, col, window],
+            "mean": mean,
+            "count": count,
+            "last": self._last[row, col, window],
+        }
+
+
+def sample_stats(values):
+    """Per-sample (min, max, sum, count, last) of a (samples, cells, params) block"""
+    present = ~np.isnan(values)
+    sums = np.where(present, values, 0.0)
+    return values, values, sums, present.astype(np.int32), values
@@ -0,0 +1,318 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from bms.alerts import SAFETY_CHECKS
+
+# One alert rule. ``limit`` is a number or a limit-table column (times
+# ``scale``); ``op`` is "above" or "below". With ``rate`` the rule checks the
+# change per second of ``field`` instead of its value. An active rule clears
+# only once the value is ``hysteresis`` back inside the limit, and alerts
+# only after it has been active for ``debounce_s`` seconds.
+Rule = namedtuple(
+    "Rule",
+    [
+        "name",
+        "field",
+        "op",
+        "limit",
+        "severity",
+        "hysteresis",
+        "debounce_s",
+        "rate",
+        "scale",
+    ],
+    defaults=(0.0, 0.0, False, 1.0),
+)
+
+RULE_FIELDS = ("voltage", "current", "temp")
+
+UNITS = {"voltage": "V", "current": "A", "temp": "°C"}
+
+# Defaults of the Alerts & Safety page settings
+DEFAULT_TEMP_HIGH = 50
+DEFAULT_TEMP_LOW = 0
+DEFAULT_VOLTAGE_TOLERANCE = 5
+DEFAULT_CURRENT_LIMIT = 10
+
+# Temperature rise (°C/s) treated as a thermal runaway precursor
+TEMP_RISE_LIMIT = 1.0
+
+
+def safety_rules():
+    """Rules equivalent to SAFETY_CHECKS: spec limits, no hysteresis or debounce"""
+    return [
+        Rule(
+            issue, field, "above" if compare is np.greater else "below", limit, severity
+        )
+        for issue, field, limit, compare, _, severity in SAFETY_CHECKS
+    ]
+
+
+def alert_rules(
+    temp_high=DEFAULT_TEMP_HIGH,
+    temp_low=DEFAULT_TEMP_LOW,
+    voltage_tolerance=DEFAULT_VOLTAGE_TOLERANCE,
+    current_limit=DEFAULT_CURRENT_LIMIT,
+):
+    """Warning rules of the Alerts & Safety settings.
+
+    ``voltage_tolerance`` (%) is the margin inside each chemistry's voltage
+    window at which a cell is flagged, ahead of the critical safety checks.
+    """
+    margin = voltage_tolerance / 100
+    return [
+        Rule("High temperature", "temp", "above", temp_high, "warning", 2.0, 5.0),
+        Rule("Low temperature", "temp", "below", temp_low, "warning", 2.0, 5.0),
+        Rule(
+            "Voltage near maximum",
+            "voltage",
+            "above",
+            "max_voltage",
+            "warning",
+            0.02,
+            2.0,
+            scale=1 - margin,
+        ),
+        Rule(
+            "Voltage near minimum",
+            "voltage",
+            "below",
+            "min_voltage",
+            "warning",
+            0.02,
+            2.0,
+            scale=1 + margin,
+        ),
+        Rule(
+            "Charge overcurrent", "current", "above", current_limit, "warning", 0.5, 1.0
+        ),
+        Rule(
+            "Discharge overcurrent",
+            "current",
+            "below",
+            -current_limit,
+            "warning",
+            0.5,
+            1.0,
+        ),
+        Rule(
+            "Rapid temperature rise",
+            "temp",
+            "above",
+            TEMP_RISE_LIMIT,
+            "critical",
+            0.5,
+            rate=True,
+        ),
+    ]
+
+
+def _shift(values, first, carried):
+    """Each element's predecessor within its cell; ``carried`` for the first"""
+    previous = np.empty_like(values)
+    previous[..., 1:] = values[..., :-1]
+    previous[..., first] = carried
+    return previous
+
+
+def _fill_forward(marks, group_start):
+    """Index of the latest marked element of the same cell, -1 when none yet"""
+    n = marks.shape[-1]
+    latest = np.maximum.accumulate(np.where(marks, np.arange(n), -1), axis=-1)
+    return np.where(latest >= group_start, latest, -1)
+
+
+class RuleEngine:
+    """Evaluates a rule set for every cell over batches of readings.
+
+    Rules are compiled into (rules x cells) limit arrays, so a batch of
+    frames is checked against all rules in a handful of NumPy passes.
+    Hysteresis and debounce are resolved along each cell's readings with
+    cumulative scans, and the per-cell state at the end of a batch is
+    carried into the next, so results do not depend on how readings are
+    split into batches. Only the reading where an alert becomes due
+    produces an event.
+    """
+
+    def __init__(self, rules, pack):
+        self.lock = threading.Lock()
+        self.rules = []
+        self.cell_ids = None
+        self.configure(rules, pack)
+
+    def configure(self, rules, pack):
+        """Compile ``rules`` against the pack's limits.
+
+        State is kept for rules whose name is unchanged, so moving a
+        threshold does not re-raise alerts that are already active.
+        """
+        rules = list(rules)
+        n_cells = len(pack)
+        limits = np.empty((len(rules), n_cells))
+        for k, rule in enumerate(rules):
+            base = (
+                pack.spec_column(rule.limit)
+                if isinstance(rule.limit, str)
+                else rule.limit
+            )
+            limits[k] = np.asarray(base, dtype=np.float64) * rule.scale
+
+        with self.lock:
+            same_cells = self.cell_ids == pack.cell_ids
+            old = (
+                {rule.name: k for k, rule in enumerate(self.rules)}
+                if same_cells
+                else {}
+            )
+            keep = [old.get(rule.name, -1) for rule in rules]
+            state = []
+            for name, fill in (("active", False), ("fired", False), ("since", 0)):
+                array = np.full((len(rules), n_cells), fill, dtype=type(fill))
+                for k, j in enumerate(keep):
+                    if j >= 0:
+                        array[k] = getattr(self, name)[j]
+                state.append(array)
+            self.active, self.fired, self.since = state
+            if not same_cells:
+                self.last_ns = np.zeros(n_cells, dtype=np.int64)
+                self.last = {field: np.full(n_cells, np.nan) for field in RULE_FIELDS}
+
+            self.rules = rules
+            self.cell_ids = pack.cell_ids
+            self.limits = limits
+            self.sign = np.array(
+                [1.0 if rule.op == "above" else -1.0 for rule in rules]
+            )
+            self.hysteresis = np.array([rule.hysteresis for rule in rules])
+            self.debounce_ns = np.array(
+                [int(rule.debounce_s * 1e9) for rule in rules], dtype=np.int64
+            )
+
+    def evaluate(self, timestamps_ns, cells, readings):
+        """Check a batch of readings and return the alerts that became due.
+
+        ``cells`` are pack positions and ``readings`` maps each of
+        RULE_FIELDS to an array aligned with them. Returns one dict per
+        event (timestamp_ns, Cell, Issue, Value, Limit, Severity, plus the
+        raw ``value``, ``limit`` and ``unit``) in time order.
+        """
+        cells = np.asarray(cells, dtype=np.intp)
+        if not len(cells) or not self.rules:
+            return []
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        order = np.lexsort((timestamps_ns, cells))
+        cells, timestamps_ns = cells[order], timestamps_ns[order]
+        n = len(cells)
+        first = np.ones(n, dtype=bool)
+        first[1:] = cells[1:] != cells[:-1]
+        last = np.ones(n, dtype=bool)
+        last[:-1] = first[1:]
+        group_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+
+        with self.lock:
+            values = {}
+            rates = {}
+            for field in RULE_FIELDS:
+                values[field] = np.asarray(readings[field], dtype=np.float64)[order]
+            for field in {rule.field for rule in self.rules if rule.rate}:
+                previous = _shift(values[field], first, self.last[field][cells[first]])
+                previous_ns = _shift(timestamps_ns, first, self.last_ns[cells[first]])
+                elapsed = (timestamps_ns - previous_ns) / 1e9
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    rates[field] = np.where(
+                        (previous_ns > 0) & (elapsed > 0),
+                        (values[field] - previous) / elapsed,
+                        np.nan,
+                    )
+            inputs = np.stack(
+                [(rates if rule.rate else values)[rule.field] for rule in self.rules]
+            )
+
+            # Hysteresis: the latest decisive reading sets or clears the rule
+            margin = self.sign[:, np.newaxis] * (inputs - self.limits[:, cells])
+            trip = margin > 0
+            clear = margin <= -self.hysteresis[:, np.newaxis]
+            decisive = _fill_forward(trip | clear, group_start)
+            active = np.where(
+                decisive >= 0,
+                np.take_along_axis(trip, np.maximum(decisive, 0), axis=1),
+                self.active[:, cells],
+            )
+
+            # Debounce: alert once the rule has been active long enough
+            rising = active & ~_shift(active, first, self.active[:, cells[first]])
+            latest = _fill_forward(rising, group_start)
+            since = np.where(
+                latest >= 0,
+                timestamps_ns[np.maximum(latest, 0)],
+                self.since[:, cells],
+            )
+            fired = active & (timestamps_ns - since >= self.debounce_ns[:, np.newaxis])
+            due = fired & ~_shift(fired, first, self.fired[:, cells[first]])
+
+            ends = cells[last]
+            self.active[:, ends] = active[:, last]
+            self.since[:, ends] = since[:, last]
+            self.fired[:, ends] = fired[:, last]
+            self.last_ns[ends] = timestamps_ns[last]
+            for field in RULE_FIELDS:
+                self.last[field][ends] = values[field][last]
+
+        events = []
+        for k, i in zip(*np.nonzero(due)):
+            rule = self.rules[k]
+            unit = UNITS[rule.field] + ("/s" if rule.rate else "")
+            precision = 2 if rule.field == "voltage" and not rule.rate else 1
+            events.append(
+                {
+                    "timestamp_ns": int(timestamps_ns[i]),
+                    "Cell": self.cell_ids[cells[i]],
+                    "Issue": rule.name,
+                    "Value": f"{inputs[k, i]:.{precision}f}{unit}",
+                    "Limit": f"{self.limits[k, cells[i]]:.{precision}f}{unit}",
+                    "Severity": rule.severity,
+                    "value": float(inputs[k, i]),
+                    "limit": float(self.limits[k, cells[i]]),
+                    "unit": unit,
+                }
+            )
+        events.sort(key=lambda event: event["timestamp_ns"])
+        return events
+
+    def evaluate_frames(self, frames, now_ns=None):
+        """Evaluate ingest or replay frames (timestamp 0 means "now")"""
+        timestamps = frames["timestamp_ns"]
+        if not timestamps.all():
+            timestamps = np.where(timestamps == 0, now_ns or time.time_ns(), timestamps)
+        known = frames["cell"] < len(self.cell_ids)
+        return self.evaluate(
+            timestamps[known],
+            frames["cell"][known],
+            {field: frames[field][known] for field in RULE_FIELDS},
+        )
+
+    def evaluate_pack(self, pack, timestamp_ns=None):
+        """Evaluate the pack's current state as one sample of every cell"""
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        return self.evaluate(
+            np.full(len(pack), timestamp_ns, dtype=np.int64),
+            np.arange(len(pack)),
+            {field: pack.data[field] for field in RULE_FIELDS},
+        )
+
+    def status(self):
+        """Per rule: the rule and the positions of the cells currently alerting"""
+        with self.lock:
+            return [
+                (rule, np.flatnonzero(self.fired[k]))
+                for k, rule in enumerate(self.rules)
+            ]
+
+
+def raise_alerts(alerts, events):
+    """Add rule events to an AlertLog, stamped with their reading time"""
+    alerts.extend(events)
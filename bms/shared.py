@@ -0,0 +1,182 @@
+import threading
+import time
+
+from bms.alertlog import AlertLog
+from bms.alerts import safety_issues
+from bms.history import HistoryStore
+from bms.pack import PackState
+from bms.rules import raise_alerts
+
+# Raw history copied into each snapshot; older ranges are read from the rollups
+SNAPSHOT_HISTORY_BYTES = 32 * 1024**2
+
+# Seconds between snapshots published for a changing history
+PUBLISH_INTERVAL_S = 1.0
+
+
+def follow_estimates(history, estimator, detector, health):
+    """Bring the SOC filter, anomaly detector and health estimator up to date.
+
+    Returns ``(estimates, events)``: ``estimates`` holds copies that other
+    threads can read while the estimators move on (soc and soc_std 0-1,
+    anomaly_z (drift, pack) x field x cell, anomaly_limits and the
+    health ``metrics``), ``events`` the anomalies of the new samples.
+    """
+    estimator.follow(history)
+    events = detector.follow(history)
+    health.follow(history)
+    estimates = {
+        "soc": estimator.soc,
+        "soc_std": estimator.soc_std,
+        "anomaly_z": detector.z.copy(),
+        "anomaly_limits": detector.limits.copy(),
+        "metrics": health.metrics(),
+    }
+    return estimates, events
+
+
+class PackSnapshot:
+    """Read-only copy of a shared pack and its history at one moment.
+
+    The alert log is append-only, so it is shared rather than copied;
+    ``alert_count`` is its length when the snapshot was taken. The arrays
+    are frozen, so one snapshot can be rendered by any number
+    of sessions at once. Aggregates the pages need are computed once when
+    the snapshot is taken instead of once per viewer, and ``estimates``
+    (see ``follow_estimates``) come from the writer's estimators, or are
+    None when it has not attached any.
+    """
+
+    def __init__(self, version, pack, history, alerts, estimates=None):
+        self.version = version
+        self.taken_at = time.time()
+        self.pack = pack
+        self.history = history
+        self.alerts = alerts
+        self.estimates = estimates
+        self.alert_count = len(alerts)
+        self.summary = pack.summary()
+        self.issues = safety_issues(pack)
+
+    @property
+    def age_s(self):
+        return time.time() - self.taken_at
+
+
+class SharedPack:
+    """Process-wide pack with a single writer and any number of readers.
+
+    The writer (one session, plus its ingest thread through ``lock``)
+    changes ``pack``, ``history`` and the ``alerts`` log in place.
+    ``publish`` copies the pack and history under ``lock`` into a
+    PackSnapshot and swaps it in with one reference assignment, so readers
+    only ever read ``snapshot`` and never take a lock or see a half-applied
+    update. The history copy (and the estimates, which only follow the
+    history) is reused while the history is unchanged.
+    """
+
+    def __init__(
+        self,
+        pack=None,
+        history=None,
+        alerts=None,
+        history_bytes=SNAPSHOT_HISTORY_BYTES,
+        interval_s=PUBLISH_INTERVAL_S,
+    ):
+        self.pack = PackState() if pack is None else pack
+        self.history = HistoryStore() if history is None else history
+        self.alerts = AlertLog() if alerts is None else alerts
+        self.estimators = None  # (SocEstimator, AnomalyDetector, HealthEstimator)
+        self.history_bytes = history_bytes
+        self.interval_s = interval_s
+        self.lock = threading.RLock()
+        self.writer = None
+        self.version = 0
+        self._published = None  # (history object, history version) last copied
+        self._copied = None  # (history copy, estimates) made for it
+        self._snapshot = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.publish()
+
+    @property
+    def snapshot(self):
+        """The newest PackSnapshot"""
+        return self._snapshot
+
+    def claim(self, owner, force=False):
+        """Make ``owner`` the writer; fails while another writer holds it"""
+        with self.lock:
+            if self.writer is not None and self.writer != owner and not force:
+                return False
+            self.writer = owner
+            return True
+
+    def release(self, owner):
+        with self.lock:
+            if self.writer == owner:
+                self.writer = None
+
+    def attach(self, pack, history, alerts, estimators=None):
+        """Point the shared state at the writer's (possibly replaced) objects.
+
+        ``estimators`` is the writer's (SocEstimator, AnomalyDetector,
+        HealthEstimator); snapshots then carry their estimates, and the
+        anomalies they find are added to ``alerts``.
+        """
+        with self.lock:
+            self.pack, self.history, self.alerts = pack, history, alerts
+            if estimators != self.estimators:
+                self._published = None  # the next snapshot needs their estimates
+            self.estimators = estimators
+
+    def publish(self):
+        """Copy the writer's state into a new snapshot and swap it in"""
+        events = []
+        with self.lock:
+            pack, history, alerts = self.pack, self.history, self.alerts
+            if self._published == (history, history.version):
+                history_copy, estimates = self._copied
+            else:
+                n_values = max(len(history.cell_ids), 1) * len(history.params)
+                n_samples = self.history_bytes // (8 * n_values)
+                history_copy = history.copy(n_samples, readonly=True)
+                estimates = None
+                if self.estimators is not None and all(
+                    model.matches(pack) for model in self.estimators
+                ):
+                    estimates, events = follow_estimates(history, *self.estimators)
+            pack_copy = pack.copy(readonly=True)
+            self._published = (history, history.version)
+            self._copied = (history_copy, estimates)
+            self.version += 1
+            version = self.version
+            # Under the lock, like every other writer of the alert log
+            raise_alerts(alerts, events)
+        # Aggregates are computed outside the lock, the copies no longer change
+        snapshot = PackSnapshot(version, pack_copy, history_copy, alerts, estimates)
+        with self.lock:
+            # A concurrent publish may have swapped in a newer snapshot meanwhile
+            if self._snapshot is None or version > self._snapshot.version:
+                self._snapshot = snapshot
+            return self._snapshot
+
+    def start(self):
+        """Publish from a daemon thread whenever the history has changed"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._publish_loop, name="bms-publisher", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _publish_loop(self):
+        while not self._stopping.wait(self.interval_s):
+            if self._published != (self.history, self.history.version):
+                self.publish()
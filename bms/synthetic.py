@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import numpy as np
+
+NOISE_MODELS = ("uniform", "gaussian", "random_walk")
+
+# Noise amplitude per parameter: voltage (V), current (A), temperature (°C)
+NOISE_AMPLITUDE = np.array([0.1, 0.5, 2.0])
+
+# Upper bound on values generated per chunk, keeps peak memory flat
+CHUNK_ELEMENTS = 4_000_000
+
+
+def _noise(rng, model, shape, walk_state):
+    """Draw noise of ``shape`` (samples, cells, 3) for one chunk"""
+    if model == "uniform":
+        return rng.uniform(-1.0, 1.0, shape) * NOISE_AMPLITUDE
+    if model == "gaussian":
+        return rng.normal(0.0, 0.5, shape) * NOISE_AMPLITUDE
+    if model == "random_walk":
+        steps = rng.normal(0.0, 0.05, shape) * NOISE_AMPLITUDE
+        walk = walk_state + np.cumsum(steps, axis=0)
+        # Keep the walk within the noise amplitude
+        walk = np.clip(walk, -NOISE_AMPLITUDE, NOISE_AMPLITUDE)
+        walk_state[...] = walk[-1]
+        return walk
+    raise ValueError(f"unknown noise model: {model}")
+
+
+def generate_history(
+    pack,
+    store,
+    n_samples=None,
+    duration_s=None,
+    rate_hz=1.0,
+    start_ns=None,
+    noise="uniform",
+    seed=None,
+    voltage_range=None,
+    temp_range=(15, 60),
+    archive=None,
+):
+    """Write synthetic samples around the pack's current state into ``store``.
+
+    Give either ``n_samples`` or ``duration_s``; samples are spaced at
+    ``rate_hz`` starting from ``start_ns``, by default so that the last
+    one is stamped now. They must all be newer than the samples already
+    in the store or ``archive`` (ValueError otherwise), so demo data is
+    backfilled into an empty store. Voltages are clipped to
+    ``voltage_range``, by default each cell's chemistry limits. Values
+    are generated in chunks with a seeded NumPy Generator and appended
+    as (samples, cells, params) blocks, so millions of samples for
+    thousands of cells never need to be in memory at once. Returns the
+    number of samples written.
+    """
+    if n_samples is None:
+        if duration_s is None:
+            raise ValueError("give n_samples or duration_s")
+        n_samples = int(duration_s * rate_hz)
+    n_cells = len(pack)
+    if n_samples <= 0 or n_cells == 0:
+        return 0
+
+    rng = np.random.default_rng(seed)
+    step_ns = int(1e9 / rate_hz)
+    if start_ns is None:
+        now_ns = int(np.datetime64(datetime.now(), "ns").astype(np.int64))
+        start_ns = now_ns - step_ns * (n_samples - 1)
+    newest = [target.last_ns for target in (store, archive) if target is not None]
+    newest = [ns for ns in newest if ns is not None]
+    if newest and start_ns <= max(newest):
+        raise ValueError("the history already has samples after the start")
+    if voltage_range is None:
+        voltage_range = (
+            pack.spec_column("min_voltage"),
+            pack.spec_column("max_voltage"),
+        )
+
+    cell_ids = pack.cell_ids
+    base = np.stack(
+        [pack.data["voltage"], pack.data["current"], pack.data["temp"]], axis=-1
+    )
+    walk_state = np.zeros((n_cells, 3))
+    chunk = max(1, CHUNK_ELEMENTS // (n_cells * 4))
+
+    for first in range(0, n_samples, chunk):
+        k = min(chunk, n_samples - first)
+        timestamps_ns = start_ns + step_ns * np.arange(first, first + k, dtype=np.int64)
+        values = np.empty((k, n_cells, 4))
+        values[:, :, :3] = base + _noise(rng, noise, (k, n_cells, 3), walk_state)
+        np.clip(values[:, :, 0], *voltage_range, out=values[:, :, 0])
+        np.clip(values[:, :, 2], *temp_range, out=values[:, :, 2])
+        values[:, :, 3] = values[:, :, 0] * values[:, :, 1]
+        store.append_array(timestamps_ns, values, cell_ids)
+        if archive is not None:
+            archive.append_array(timestamps_ns, values, cell_ids)
+    return n_samples
@@ -0,0 +1,159 @@
+import numpy as np
+
+from bms.ecm import dc_resistance
+
+# Heat capacity of one cell (J/K)
+CELL_HEAT_CAPACITY = 45.0
+
+# Thermal conductance (W/K) between neighbouring cells of a module, and the
+# fraction of it left across the gap between two modules
+CELL_CONDUCTANCE = 0.5
+MODULE_GAP_FACTOR = 0.1
+
+# Conductance (W/K) from each cell to the coolant, and the coolant temperature
+COOLANT_CONDUCTANCE = 0.2
+COOLANT_TEMP = 25.0
+
+# Cell temperature (°C) at which thermal runaway sets in, per chemistry
+RUNAWAY_ONSET = {"lfp": 210.0, "nmc": 170.0, "lto": 250.0, "nca": 150.0}
+DEFAULT_RUNAWAY_ONSET = 170.0
+
+# Heat released by a cell in runaway: total energy (J) at a fixed rate (W)
+RUNAWAY_ENERGY = 40_000.0
+RUNAWAY_POWER = 2_000.0
+
+
+def neighbour_pairs(pack):
+    """Pairs of adjacent cells and their conductance.
+
+    Cells are adjacent when their series and parallel indices differ by
+    one step in one of them. Pairs in different modules are coupled
+    through the module gap.
+    """
+    data = pack.data
+    series = data["series"].astype(np.int64)
+    parallel = data["parallel"].astype(np.int64)
+    width = int(parallel.max()) + 2 if len(pack) else 1
+    keys = series * width + parallel
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    first, second = [], []
+    for offset in (1, width):  # next parallel cell, same cell of the next group
+        found = np.searchsorted(sorted_keys, keys + offset)
+        found = np.minimum(found, len(keys) - 1)
+        hit = sorted_keys[found] == keys + offset
+        first.append(np.flatnonzero(hit))
+        second.append(order[found[hit]])
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+    conductance = np.where(
+        data["module"][first] == data["module"][second],
+        CELL_CONDUCTANCE,
+        CELL_CONDUCTANCE * MODULE_GAP_FACTOR,
+    )
+    return first, second, conductance
+
+
+class ThermalModel:
+    """Lumped thermal model of a pack with conduction between neighbours.
+
+    Every cell is one heat capacity, heated by I²R losses (and by its own
+    runaway once past the onset temperature), conducting to adjacent
+    cells and to the coolant. A step is an implicit Euler solve of one
+    sparse linear system over the whole pack, so large steps stay stable;
+    the LU factorization is reused for as long as the step size and the
+    coolant conductance stay the same.
+    """
+
+    def __init__(self, pack, coolant_temp=COOLANT_TEMP):
+        from scipy import sparse
+
+        self.pack = pack
+        self.cell_ids = pack.cell_ids
+        n = len(pack)
+        first, second, conductance = neighbour_pairs(pack)
+        # Weighted graph Laplacian: conduction out of each cell minus the inflow
+        coupling = sparse.coo_matrix(
+            (conductance, (first, second)), shape=(n, n)
+        ).tocsr()
+        coupling = coupling + coupling.T
+        self.laplacian = (
+            sparse.diags(np.asarray(coupling.sum(axis=1)).ravel()) - coupling
+        ).tocsc()
+        self.n_links = len(first)
+
+        self.heat_capacity = np.full(n, CELL_HEAT_CAPACITY)
+        self.resistance = dc_resistance(pack)
+        keys = pack.table.keys
+        onset = np.array(
+            [RUNAWAY_ONSET.get(key, DEFAULT_RUNAWAY_ONSET) for key in keys]
+        )
+        self.onset = onset[pack.data["chemistry"]] if n else np.zeros(0)
+        self.coolant_temp = coolant_temp
+        self.coolant_conductance = COOLANT_CONDUCTANCE
+
+        self.temp = pack.data["temp"].copy()
+        self.runaway_energy = np.full(n, RUNAWAY_ENERGY)  # left to release
+        self.runaway_at = np.full(n, np.nan)  # simulated time runaway began
+        self.elapsed_s = 0.0
+        self._solver = None  # (dt_s, coolant conductance, LU factorization)
+
+    def matches(self, pack):
+        """Whether the model was built for this pack's cells"""
+        return self.pack is pack and self.cell_ids == pack.cell_ids
+
+    def sync(self):
+        """Take over temperatures changed outside the model"""
+        changed = self.pack.data["temp"] != self.temp
+        self.temp[changed] = self.pack.data["temp"][changed]
+        return int(np.count_nonzero(changed))
+
+    def ignite(self, idx):
+        """Force cells into thermal runaway (a nail or internal short)"""
+        self.temp[idx] = np.maximum(self.temp[idx], self.onset[idx])
+
+    @property
+    def in_runaway(self):
+        return ~np.isnan(self.runaway_at)
+
+    def heat(self, current):
+        """Heat generated in every cell (W): I²R plus any runaway"""
+        heat = np.square(current) * self.resistance
+        burning = self.in_runaway & (self.runaway_energy > 0)
+        heat[burning] += RUNAWAY_POWER
+        return heat
+
+    def _factorized(self, dt_s):
+        from scipy import sparse
+        from scipy.sparse.linalg import splu
+
+        key = (dt_s, self.coolant_conductance)
+        if self._solver is None or self._solver[:2] != key:
+            diagonal = self.heat_capacity / dt_s + self.coolant_conductance
+            system = (sparse.diags(diagonal) + self.laplacian).tocsc()
+            self._solver = key + (splu(system),)
+        return self._solver[2]
+
+    def step(self, current, dt_s, write=True):
+        """Advance every cell temperature by ``dt_s`` at ``current`` (A)"""
+        started = (self.temp >= self.onset) & ~self.in_runaway
+        self.runaway_at[started] = self.elapsed_s
+        heat = self.heat(current)
+        burning = self.in_runaway & (self.runaway_energy > 0)
+        self.runaway_energy[burning] -= RUNAWAY_POWER * dt_s
+
+        rhs = (
+            self.heat_capacity / dt_s * self.temp
+            + heat
+            + self.coolant_conductance * self.coolant_temp
+        )
+        self.temp = self._factorized(dt_s).solve(rhs)
+        self.elapsed_s += dt_s
+        if write:
+            self.write()
+        return self.temp
+
+    def write(self):
+        """Store the model temperatures in the pack"""
+        self.pack.data["temp"] = self.temp
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class PackTopology:
+    """Series string of parallel groups, split into modules.
+
+    An ``NsMp`` pack has ``series`` groups connected in series, each made
+    of ``parallel`` cells in parallel. Consecutive series groups are
+    grouped into modules of ``groups_per_module``.
+    """
+
+    def __init__(self, series, parallel=1, groups_per_module=None):
+        if series < 1 or parallel < 1:
+            raise ValueError("series and parallel counts must be at least 1")
+        self.series = int(series)
+        self.parallel = int(parallel)
+        self.groups_per_module = int(groups_per_module or series)
+
+    @property
+    def n_cells(self):
+        return self.series * self.parallel
+
+    @property
+    def n_modules(self):
+        return -(-self.series // self.groups_per_module)
+
+    def __str__(self):
+        return f"{self.series}s{self.parallel}p"
+
+    def indices(self):
+        """Series, parallel and module index of every cell, in pack order"""
+        cell = np.arange(self.n_cells)
+        series = cell // self.parallel
+        parallel = cell % self.parallel
+        module = series // self.groups_per_module
+        return series, parallel, module
+
+    def build(self, pack, chemistries, specs, temp=25.0):
+        """Add all cells of this topology to ``pack`` at nominal voltage.
+
+        ``chemistries`` is a single chemistry key or one key per cell.
+        """
+        if isinstance(chemistries, str):
+            chemistries = [chemistries] * self.n_cells
+        if len(chemistries) != self.n_cells:
+            raise ValueError("need one chemistry per cell")
+        nominal = {key: specs[key]["nominal_voltage"] for key in set(chemistries)}
+        cell_ids = [f"cell_{i + 1}_{chem}" for i, chem in enumerate(chemistries)]
+        voltage = np.array([nominal[chem] for chem in chemistries])
+        series, parallel, module = self.indices()
+        pack.add_cells(
+            cell_ids,
+            chemistries,
+            voltage=voltage,
+            temp=temp,
+            series=series,
+            parallel=parallel,
+            module=module,
+        )
+        pack.topology = self
+        return cell_ids
@@ -46,15 +46,118 @@
 #     print(f"{key}: {values}")
 
 #! =================================================================================================
+import time
+
+# Taken before the other imports so the first run of a process includes them
+RUN_STARTED = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
+import importlib.util
 import io
+import os
+import threading
+import uuid
+
+from bms.alertlog import SEVERITIES, AlertLog
+from bms.anomaly import FIELD_LABELS, AnomalyDetector
+from bms.balance import BALANCE_STRATEGIES, CellBalancer
+from bms.alerts import safety_issues as find_safety_issues
+from bms.archive import TelemetryArchive
+from bms.chemistry import CELL_SPECS, calculate_soc, get_cell_status
+from bms.ecm import PackSimulator, dc_resistance
+from bms.ekf import SocEstimator
+from bms.health import HealthEstimator
+from bms.export import config_backup, current_state_frame, excel_report, to_csv
+from bms.history import HistoryStore, record_sample
+from bms.pack import PackState, PackTotals
+from bms.rules import (
+    DEFAULT_CURRENT_LIMIT,
+    DEFAULT_TEMP_HIGH,
+    DEFAULT_TEMP_LOW,
+    DEFAULT_VOLTAGE_TOLERANCE,
+    RULE_FIELDS,
+    UNITS,
+    RuleEngine,
+    alert_rules,
+    raise_alerts,
+    safety_rules,
+)
+from bms.shared import PUBLISH_INTERVAL_S, SharedPack, follow_estimates
+from bms.synthetic import NOISE_MODELS, generate_history
+from bms.thermal import COOLANT_TEMP, ThermalModel
+from bms.topology import PackTopology
+
+# Number of samples kept in the in-memory history buffer
+HISTORY_CAPACITY = 10_000
+
+# Memory budget for one session's in-memory history (large packs keep fewer samples)
+HISTORY_MEMORY_BUDGET = 256 * 1024**2
+
+# Cells shown per page on the per-cell views
+CELLS_PER_PAGE = 8
+EDA_CELLS_PER_PAGE = 2
+
+# Above this many cells the Dashboard charts show module aggregates
+DASHBOARD_CELL_LIMIT = 64
+
+# Default listen address of the live telemetry ingest
+INGEST_ADDRESS = os.environ.get("BMS_INGEST_ADDRESS", "127.0.0.1:9750")
+
+# Directory of the persistent on-disk telemetry archive
+ARCHIVE_DIR = os.environ.get("BMS_ARCHIVE_DIR", "telemetry_archive")
+
+# Directory holding one telemetry archive per replayed log
+REPLAY_ARCHIVE_DIR = os.environ.get("BMS_REPLAY_ARCHIVE_DIR", "replay_archive")
+
+# Directory of the persistent alert log
+ALERT_LOG_DIR = os.environ.get("BMS_ALERT_LOG_DIR", "alert_log")
+
+# Alert History page size and time windows (seconds back from now)
+ALERTS_PER_PAGE = 20
+ALERT_WINDOWS = {
+    "All time": None,
+    "Last hour": 3600,
+    "Last 24 hours": 86400,
+    "Last 7 days": 7 * 86400,
+}
+
+# Maximum points sent to Plotly per time-series trace
+CHART_POINTS = 800
+
+# "minmax" keeps every spike, "lttb" gives smoother looking lines
+DECIMATION_METHOD = "minmax"
+
+# Longest stretch of wall time (s) the cell simulator catches up on in one run
+SIMULATION_CATCH_UP_S = 300
+
+# Coolant temperatures (°C) of the heat-up and cool-down scenarios and how
+# long (s) the pack soaks in them
+HEAT_UP_COOLANT_TEMP = 60.0
+COOL_DOWN_COOLANT_TEMP = 15.0
+THERMAL_SOAK_S = 120
+
+# Current profiles of the equivalent-circuit simulation
+SIMULATION_PROFILES = (
+    "Hold current sliders",
+    "Constant current",
+    "Pulsed 1 min on/off",
+)
+
+# Replay speeds offered for recorded logs (multiples of real time)
+REPLAY_SPEEDS = {"As fast as possible": None, "1×": 1, "10×": 10, "100×": 100}
+
+# How a session relates to the process-wide shared pack
+SESSION_ROLES = ("Standalone", "Shared Writer", "Viewer")
+
+# Pages that change the pack, hidden from viewers of the shared snapshot
+EDITING_PAGES = ("Cell Configuration", "Real-time Monitoring")
+
+# Script run time budgets in seconds: first run of a session, later reruns
+COLD_START_BUDGET_S = 2.0
+RERUN_BUDGET_S = 0.5
 
 # Page configuration
 st.set_page_config(
@@ -65,8 +168,7 @@ st.set_page_config(
 )
 
 # Enhanced Custom CSS
-st.markdown(
-    """
+APP_CSS = """
 <style>
     .metric-card {
         background-color: #f8f9fa;
@@ -145,19 +247,28 @@ st.markdown(
         font-weight: bold;
     }
 </style>
-""",
-    unsafe_allow_html=True,
-)
+"""
+
+
+@st.cache_resource
+def page_style():
+    """Whitespace-collapsed <style> block, built once per server process"""
+    return " ".join(APP_CSS.split())
+
+
+st.markdown(page_style(), unsafe_allow_html=True)
 
 # Initialize session state
 if "cells_data" not in st.session_state:
-    st.session_state.cells_data = {}
-if "historical_data" not in st.session_state:
-    st.session_state.historical_data = []
+    st.session_state.cells_data = PackState()
+if "history" not in st.session_state:
+    st.session_state.history = HistoryStore(HISTORY_CAPACITY)
 if "last_update" not in st.session_state:
     st.session_state.last_update = datetime.now()
-if "alerts" not in st.session_state:
-    st.session_state.alerts = []
+if "alerts_cleared_ns" not in st.session_state:
+    st.session_state.alerts_cleared_ns = 0
+if "session_token" not in st.session_state:
+    st.session_state.session_token = uuid.uuid4().hex
 
 # Generate some sample historical data for better visualization
 if "sample_data_generated" not in st.session_state:
@@ -166,129 +277,418 @@ if "sample_data_generated" not in st.session_state:
 
 def generate_sample_data():
     """Generate sample historical data for demonstration"""
+    if role == "Viewer":
+        return  # the shared snapshot is read-only
     if not st.session_state.sample_data_generated and st.session_state.cells_data:
-        base_time = datetime.now() - timedelta(hours=2)
+        # 50 historical data points, two minutes apart, ending now; only
+        # backfilled into an empty history, never after recorded samples
+        with writer_lock():
+            if not len(st.session_state.history):
+                generate_history(
+                    st.session_state.cells_data,
+                    st.session_state.history,
+                    n_samples=50,
+                    rate_hz=1 / 120,
+                    noise="uniform",
+                )
 
-        for i in range(50):  # Generate 50 historical data points
-            timestamp = base_time + timedelta(minutes=i * 2)
-            record = {"timestamp": timestamp}
+        st.session_state.sample_data_generated = True
 
-            for cell_id, cell_data in st.session_state.cells_data.items():
-                # Add some realistic variation to the data
-                voltage_noise = random.uniform(-0.1, 0.1)
-                current_noise = random.uniform(-0.5, 0.5)
-                temp_noise = random.uniform(-2, 2)
 
-                record[f"{cell_id}_voltage"] = max(
-                    2.5, min(4.2, cell_data["voltage"] + voltage_noise)
-                )
-                record[f"{cell_id}_current"] = cell_data["current"] + current_noise
-                record[f"{cell_id}_temp"] = max(
-                    15, min(60, cell_data["temp"] + temp_noise)
-                )
-                record[f"{cell_id}_power"] = (
-                    record[f"{cell_id}_voltage"] * record[f"{cell_id}_current"]
-                )
+def add_alert(message, alert_type="info"):
+    """Add alert to the alert log"""
+    get_alert_log().add(message, alert_type)
 
-            st.session_state.historical_data.append(record)
 
-        st.session_state.sample_data_generated = True
+@st.cache_resource
+def get_archive():
+    """Open the telemetry archive once per server process"""
+    return TelemetryArchive(ARCHIVE_DIR)
 
 
-# Cell specifications
-CELL_SPECS = {
-    "lfp": {
-        "name": "Lithium Iron Phosphate (LFP)",
-        "nominal_voltage": 3.2,
-        "min_voltage": 2.8,
-        "max_voltage": 3.6,
-        "max_temp": 60,
-        "min_temp": -20,
-        "color": "#2E8B57",
-    },
-    "nmc": {
-        "name": "Nickel Manganese Cobalt (NMC)",
-        "nominal_voltage": 3.6,
-        "min_voltage": 3.0,
-        "max_voltage": 4.2,
-        "max_temp": 45,
-        "min_temp": -10,
-        "color": "#FF6347",
-    },
-    "lto": {
-        "name": "Lithium Titanate (LTO)",
-        "nominal_voltage": 2.4,
-        "min_voltage": 1.5,
-        "max_voltage": 2.8,
-        "max_temp": 55,
-        "min_temp": -30,
-        "color": "#4169E1",
-    },
-    "nca": {
-        "name": "Nickel Cobalt Aluminum (NCA)",
-        "nominal_voltage": 3.6,
-        "min_voltage": 3.0,
-        "max_voltage": 4.2,
-        "max_temp": 45,
-        "min_temp": -10,
-        "color": "#FF1493",
-    },
-}
+@st.cache_resource
+def get_alert_log():
+    """Open the alert log once per server process"""
+    return AlertLog(ALERT_LOG_DIR)
 
 
-def get_cell_status(cell_data, cell_type):
-    """Determine cell status based on operating parameters"""
-    specs = CELL_SPECS[cell_type]
-    voltage = cell_data["voltage"]
-    temp = cell_data["temp"]
+@st.cache_resource
+def get_shared_pack():
+    """Pack shared by every session of this server process, published once a second"""
+    return SharedPack(
+        history=HistoryStore(HISTORY_CAPACITY), alerts=get_alert_log()
+    ).start()
 
-    # Check voltage range
-    if voltage < specs["min_voltage"] * 0.95 or voltage > specs["max_voltage"] * 1.05:
-        return "critical"
-    elif voltage < specs["min_voltage"] * 1.05 or voltage > specs["max_voltage"] * 0.95:
-        return "warning"
 
-    # Check temperature range
-    if temp < specs["min_temp"] or temp > specs["max_temp"]:
-        return "critical"
-    elif temp < specs["min_temp"] + 5 or temp > specs["max_temp"] - 5:
-        return "warning"
+def apply_session_role():
+    """Point this session at its own state or the shared snapshot; returns the role.
 
-    return "healthy"
+    A "Shared Writer" publishes its own pack to the shared store (only one
+    session can hold the role); a "Viewer" renders the newest read-only
+    snapshot instead of keeping a pack of its own.
+    """
+    role = st.session_state.get("session_role", SESSION_ROLES[0])
+    shared = get_shared_pack()
+    token = st.session_state.session_token
+    if role != "Shared Writer":
+        shared.release(token)
+    elif not shared.claim(token):
+        role = "Standalone"
+
+    if role == "Viewer":
+        # Keep the session's own state to come back to
+        if "own_state" not in st.session_state:
+            st.session_state.own_state = (
+                st.session_state.cells_data,
+                st.session_state.history,
+            )
+        snapshot = shared.snapshot
+        st.session_state.cells_data = snapshot.pack
+        st.session_state.history = snapshot.history
+        st.session_state.snapshot_version = snapshot.version
+    elif "own_state" in st.session_state:
+        (
+            st.session_state.cells_data,
+            st.session_state.history,
+        ) = st.session_state.pop("own_state")
+    return role
+
+
+def pack_summary():
+    """Aggregates of the displayed pack, computed once per snapshot for viewers"""
+    if role == "Viewer":
+        return get_shared_pack().snapshot.summary
+    return st.session_state.cells_data.summary()
+
+
+@st.fragment(run_every=PUBLISH_INTERVAL_S)
+def follow_snapshot():
+    """Rerun a viewer's page whenever the writer publishes a new snapshot"""
+    snapshot = get_shared_pack().snapshot
+    st.caption(f"📺 Snapshot #{snapshot.version}, {snapshot.age_s:.0f} s old")
+    if snapshot.version != st.session_state.snapshot_version:
+        st.rerun()
+
+
+def alert_rule_set():
+    """Safety limits plus the rules of the Alerts & Safety settings sliders"""
+    return safety_rules() + alert_rules(
+        st.session_state.get("alert_temp_high", DEFAULT_TEMP_HIGH),
+        st.session_state.get("alert_temp_low", DEFAULT_TEMP_LOW),
+        st.session_state.get("alert_voltage_tolerance", DEFAULT_VOLTAGE_TOLERANCE),
+        st.session_state.get("alert_current_limit", DEFAULT_CURRENT_LIMIT),
+    )
 
 
-def calculate_soc(voltage, cell_type):
-    """Calculate State of Charge based on voltage"""
-    specs = CELL_SPECS[cell_type]
-    min_v = specs["min_voltage"]
-    max_v = specs["max_voltage"]
+def rule_engine():
+    """This session's rule engine, recompiled for the current pack and settings"""
+    pack = st.session_state.cells_data
+    if "rule_engine" not in st.session_state:
+        st.session_state.rule_engine = RuleEngine(alert_rule_set(), pack)
+    else:
+        st.session_state.rule_engine.configure(alert_rule_set(), pack)
+    return st.session_state.rule_engine
 
-    soc = ((voltage - min_v) / (max_v - min_v)) * 100
-    return max(0, min(100, soc))
 
+def session_model(key, build):
+    """This session's ``key`` model, rebuilt with ``build(pack)`` when the cells change"""
+    pack = st.session_state.cells_data
+    model = st.session_state.get(key)
+    if model is None or not model.matches(pack):
+        model = st.session_state[key] = build(pack)
+    return model
 
-def add_alert(message, alert_type="info"):
-    """Add alert to session state"""
-    alert = {"timestamp": datetime.now(), "message": message, "type": alert_type}
-    st.session_state.alerts.insert(0, alert)
-    # Keep only last 10 alerts
-    st.session_state.alerts = st.session_state.alerts[:10]
+
+def new_simulator(pack):
+    """A simulator that starts running from now"""
+    st.session_state.simulated_until = time.time()
+    return PackSimulator(pack)
+
+
+def cell_simulator():
+    """This session's equivalent-circuit simulator"""
+    simulator = session_model("cell_simulator", new_simulator)
+    simulator.sync()  # voltages set elsewhere (configuration, replay) are taken over
+    return simulator
+
+
+def anomaly_detector():
+    """This session's anomaly detector"""
+    return session_model("anomaly_detector", AnomalyDetector)
+
+
+def soc_estimator():
+    """This session's SOC filter"""
+    return session_model("soc_estimator", SocEstimator)
+
+
+def cell_health():
+    """This session's health estimator"""
+    return session_model("cell_health", HealthEstimator)
+
+
+def health_text(value, template):
+    """A health metric formatted with ``template``, or a dash until it is known"""
+    return "—" if np.isnan(value) else template.format(value)
+
+
+def pack_thermal():
+    """This session's thermal model"""
+    thermal = session_model("pack_thermal", ThermalModel)
+    thermal.sync()  # temperatures set elsewhere are taken over
+    return thermal
+
+
+def advance_simulation():
+    """Run the cells at their present currents for the wall time since the last run"""
+    simulator = cell_simulator()
+    now = time.time()
+    elapsed = min(now - st.session_state.simulated_until, SIMULATION_CATCH_UP_S)
+    st.session_state.simulated_until = now
+    thermal = pack_thermal()
+    with writer_lock():
+        simulator.run(
+            elapsed, st.session_state.cells_data.data["current"].copy(), thermal=thermal
+        )
+
+
+def soak(coolant_temp, duration_s=THERMAL_SOAK_S):
+    """Run the pack at its present currents with the coolant at ``coolant_temp``"""
+    thermal = pack_thermal()
+    thermal.coolant_temp = coolant_temp
+    simulator = cell_simulator()
+    try:
+        with writer_lock():
+            simulator.run(
+                duration_s,
+                st.session_state.cells_data.data["current"].copy(),
+                thermal=thermal,
+            )
+    finally:
+        thermal.coolant_temp = COOLANT_TEMP
 
 
 def update_historical_data():
     """Update historical data with current cell states"""
-    if st.session_state.cells_data:
-        record = {
-            "timestamp": datetime.now(),
-            **{
-                f"{cell_id}_{param}": value
-                for cell_id, cell_data in st.session_state.cells_data.items()
-                for param, value in cell_data.items()
-            },
-        }
-        st.session_state.historical_data.append(record)
-        # Keep only last 100 records
-        st.session_state.historical_data = st.session_state.historical_data[-100:]
+    pack = st.session_state.cells_data
+    engine, detector = rule_engine(), anomaly_detector()
+    with writer_lock():
+        timestamp_ns = record_sample(pack, st.session_state.history, get_archive())
+        if timestamp_ns is None:
+            return
+        events = engine.evaluate_pack(pack, timestamp_ns)
+        events += detector.update_pack(pack, timestamp_ns)
+    raise_alerts(get_alert_log(), events)
+
+
+def start_log_replay(log_file, speed, to_archive):
+    """Replay an uploaded log in the background into a fresh session history"""
+    from bms.replay import LogReplay
+
+    stop_ingest()  # live frames would interleave with the log
+    pack = st.session_state.cells_data
+    # The log's past timestamps cannot follow the samples recorded so far
+    history = st.session_state.history = HistoryStore.sized_for(
+        len(pack), HISTORY_MEMORY_BUDGET, HISTORY_CAPACITY
+    )
+    source = io.BytesIO(log_file.getvalue())
+    source.name = log_file.name
+    archive = None
+    if to_archive:
+        stem = os.path.splitext(os.path.basename(log_file.name))[0]
+        archive = TelemetryArchive(
+            os.path.join(REPLAY_ARCHIVE_DIR, f"{stem}_{datetime.now():%Y%m%d_%H%M%S}")
+        )
+    st.session_state.log_replay = LogReplay(
+        source,
+        pack,
+        history,
+        engine=RuleEngine(alert_rule_set(), pack),
+        speed=speed,
+        archive=archive,
+        alerts=get_alert_log(),
+        lock=writer_lock(),
+    ).start()
+
+
+@st.fragment(run_every="1s")
+def log_replay_status():
+    """Progress of this session's log replay, polled once a second"""
+    job = st.session_state.get("log_replay")
+    if job is None:
+        return
+    stats = job.stats
+    if job.running:
+        at = ""
+        if stats["end_ns"] is not None:
+            at = f", at {datetime.fromtimestamp(stats['end_ns'] / 1e9):%Y-%m-%d %H:%M:%S}"
+        st.info(
+            f"Replaying: {stats['frames']:,} frames, {stats['alerts']:,} alerts{at}"
+        )
+        if st.button("⏹️ Stop Replay", use_container_width=True):
+            job.stop()
+            st.rerun()
+    elif job.error is not None:
+        st.error(f"Could not replay {job.source.name}: {job.error}")
+    else:
+        st.success(
+            f"Replayed {stats['frames']:,} frames ({stats['samples']:,} samples)"
+            f" in {stats['elapsed_s']:.1f} s, {stats['alerts']:,} alert(s) raised"
+        )
+
+
+def pack_estimates():
+    """SOC, anomaly and health estimates of the displayed pack.
+
+    Viewers read the ones the writer published with the snapshot (None
+    until it has); other sessions bring their own estimators up to date
+    and raise the anomalies found on the way.
+    """
+    if role == "Viewer":
+        return get_shared_pack().snapshot.estimates
+    estimators = soc_estimator(), anomaly_detector(), cell_health()
+    # The ingest thread and the publisher update the same estimators
+    with writer_lock():
+        estimates, events = follow_estimates(st.session_state.history, *estimators)
+    raise_alerts(get_alert_log(), events)
+    return estimates
+
+
+def paginate(n_items, key, page_size=CELLS_PER_PAGE):
+    """Show a page picker when needed and return the item range of the current page"""
+    n_pages = max(1, -(-n_items // page_size))
+    page = 1
+    if n_pages > 1:
+        page = st.number_input(
+            f"Page (1-{n_pages})", min_value=1, max_value=n_pages, value=1, key=key
+        )
+    start = (page - 1) * page_size
+    return range(start, min(start + page_size, n_items))
+
+
+def configure_pack(topology, chemistries):
+    """Rebuild the pack from a topology and size the history buffer for it"""
+    stop_ingest()  # live frames address cells by position in the old pack
+    pack = st.session_state.cells_data
+    pack.clear()
+    temps = np.round(np.random.uniform(25, 35, topology.n_cells), 1)
+    topology.build(pack, chemistries, CELL_SPECS, temp=temps)
+    st.session_state.history = HistoryStore.sized_for(
+        len(pack), HISTORY_MEMORY_BUDGET, HISTORY_CAPACITY
+    )
+    st.session_state.sample_data_generated = False
+    # Let the per-cell type selectors pick up the new chemistries
+    for key in [k for k in st.session_state.keys() if str(k).startswith("cell_type_")]:
+        del st.session_state[key]
+
+
+def writer_lock():
+    """Lock held by every thread that writes this session's pack and history"""
+    if role == "Shared Writer":
+        # Publishing copies the pack under the same lock
+        return get_shared_pack().lock
+    if "writer_lock" not in st.session_state:
+        st.session_state.writer_lock = threading.Lock()
+    return st.session_state.writer_lock
+
+
+def stop_ingest():
+    """Stop this session's live ingest, its local replay server and any log replay"""
+    for key in ("replay_server", "ingest_service", "log_replay"):
+        service = st.session_state.pop(key, None)
+        if service is not None:
+            service.stop()
+    fd = st.session_state.pop("replay_fd", None)
+    if fd is not None:
+        os.close(fd)  # the pseudo terminal the replay server wrote to
+
+
+def live_ingest_panel():
+    """Start or stop live frame ingestion into this session's pack and history"""
+    from bms.ingest import (
+        OVERLOAD_POLICIES,
+        IngestService,
+        ReplayServer,
+        open_pty,
+        parse_address,
+    )
+
+    service = st.session_state.get("ingest_service")
+    with st.expander("📡 Live Telemetry Ingest", expanded=service is not None):
+        if service is None:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                protocol = st.selectbox("Protocol", ["TCP", "UDP", "Serial"])
+            with col2:
+                if protocol == "Serial":
+                    address = st.text_input("Device", "/dev/ttyUSB0")
+                else:
+                    address = st.text_input("Listen Address", INGEST_ADDRESS)
+            with col3:
+                policy = st.selectbox("Overload Policy", OVERLOAD_POLICIES)
+            use_replay = st.checkbox("Feed from a local replay server", value=True)
+            replay_rate = st.number_input(
+                "Replay Rate (samples/s)", min_value=1.0, max_value=1000.0, value=10.0
+            )
+
+            if st.button("▶️ Start Ingest", use_container_width=True):
+                pack = st.session_state.cells_data
+                replay = ReplayServer(pack, rate_hz=replay_rate) if use_replay else None
+                kwargs = {
+                    "policy": policy,
+                    "archive": get_archive(),
+                    "engine": rule_engine(),
+                    "alerts": get_alert_log(),
+                    "estimator": soc_estimator(),
+                    "detector": anomaly_detector(),
+                    "lock": writer_lock(),
+                }
+                if protocol == "Serial":
+                    if replay is not None:
+                        fd, address = open_pty()
+                        st.session_state.replay_fd = fd  # closed by stop_ingest
+                    kwargs["serial"] = address
+                else:
+                    kwargs[protocol.lower()] = parse_address(address)
+                service = IngestService(pack, st.session_state.history, **kwargs)
+                try:
+                    service.start()
+                except OSError as exc:
+                    stop_ingest()
+                    st.error(f"Could not start ingest: {exc}")
+                    return
+                st.session_state.ingest_service = service
+                if replay is not None:
+                    if protocol == "Serial":
+                        replay.start(replay.send_fd, fd)
+                    else:
+                        send = getattr(replay, f"send_{protocol.lower()}")
+                        replay.start(send, *kwargs[protocol.lower()])
+                    st.session_state.replay_server = replay
+                add_alert(f"Live ingest started ({protocol} {address})", "info")
+                st.rerun()
+        else:
+            stats = service.snapshot_stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Frames Applied", f"{stats['applied']:,}")
+            with col2:
+                st.metric("Pending", f"{stats['pending']:,}")
+            with col3:
+                st.metric("Dropped", f"{stats['dropped']:,}")
+            with col4:
+                st.metric("Coalesced", f"{stats['coalesced']:,}")
+            st.caption(f"Last batch applied in {stats['last_apply_ms']:.1f} ms")
+            if stats["errors"]:
+                st.error(
+                    f"{stats['errors']:,} batch(es) failed to apply, the last with"
+                    f" {stats['last_error']}"
+                )
+
+            if st.button("⏹️ Stop Ingest", use_container_width=True):
+                stop_ingest()
+                add_alert("Live ingest stopped", "info")
+                st.rerun()
 
 
 def create_cell_wise_eda():
@@ -296,10 +696,29 @@ def create_cell_wise_eda():
     if not st.session_state.cells_data:
         return
 
-    generate_sample_data()  # Generate sample data if not exists
+    from bms.charts import (
+        cell_history_figure,
+        correlation_figure,
+        distribution_figure,
+        summary_table,
+    )
 
-    for cell_id, cell_data in st.session_state.cells_data.items():
-        cell_type = cell_id.split("_")[2]
+    generate_sample_data()  # Generate sample data if not exists
+    history = st.session_state.history
+    pack = st.session_state.cells_data
+    estimates = pack_estimates()
+    if estimates is None:
+        st.info("Waiting for the shared writer to publish its estimates.")
+        return
+    soc_estimates, soc_std = estimates["soc"] * 100, estimates["soc_std"] * 100
+    metrics = estimates["metrics"]
+    limits = estimates["anomaly_limits"]
+    resistance = dc_resistance(pack)
+
+    for idx in paginate(len(pack), "eda_page", EDA_CELLS_PER_PAGE):
+        cell_id = pack.cell_ids[idx]
+        cell_data = pack[cell_id]
+        cell_type = pack.chemistry_of(cell_id)
         cell_name = cell_id.replace("_", " ").title()
 
         st.markdown(f"## 📊 {cell_name} - Complete Analysis")
@@ -308,7 +727,7 @@ def create_cell_wise_eda():
         col1, col2, col3, col4 = st.columns(4)
 
         status = get_cell_status(cell_data, cell_type)
-        soc = calculate_soc(cell_data["voltage"], cell_type)
+        soc = calculate_soc(cell_data["voltage"], cell_type, cell_data["temp"])
 
         with col1:
             status_class = f"cell-status-{status}"
@@ -322,13 +741,30 @@ def create_cell_wise_eda():
             )
 
         with col2:
-            st.metric("State of Charge", f"{soc:.1f}%")
+            if np.isnan(soc_estimates[idx]):
+                st.metric("State of Charge", f"{soc:.1f}%")
+            else:
+                st.metric(
+                    "State of Charge",
+                    f"{soc_estimates[idx]:.1f} ± {2 * soc_std[idx]:.1f}%",
+                    help=f"Kalman filter estimate (95% band); {soc:.1f}% from the"
+                    " voltage alone",
+                )
 
         with col3:
-            st.metric("Efficiency", f"{random.uniform(85, 98):.1f}%")
+            st.metric(
+                "Efficiency",
+                health_text(metrics["efficiency"][idx] * 100, "{:.1f}%"),
+                help="Discharge vs charge energy per unit of charge in the history",
+            )
 
         with col4:
-            st.metric("Health Score", f"{random.uniform(90, 100):.1f}%")
+            st.metric(
+                "Health Score",
+                health_text(metrics["soh"][idx] * 100, "{:.1f}%"),
+                help="Lower of the capacity retention and the resistance health"
+                " (0% at twice the model resistance)",
+            )
 
         # Detailed metrics in columns
         col1, col2, col3 = st.columns(3)
@@ -342,7 +778,14 @@ def create_cell_wise_eda():
             )
             st.metric("Current", f"{cell_data['current']:.3f} A")
             st.metric("Power", f"{cell_data['power']:.3f} W")
-            st.metric("Internal Resistance", f"{random.uniform(10, 50):.1f} mΩ")
+            ratio = metrics["resistance_ratio"][idx]
+            st.metric(
+                "Internal Resistance",
+                health_text(metrics["resistance"][idx] * 1e3, "{:.1f} mΩ"),
+                None if np.isnan(ratio) else f"{(ratio - 1) * 100:+.0f}% vs model",
+                delta_color="inverse",
+                help="ΔV/ΔI regression over the load steps in the history",
+            )
 
         with col2:
             st.markdown("### 🌡️ Thermal Parameters")
@@ -351,209 +794,248 @@ def create_cell_wise_eda():
                 f"{cell_data['temp']:.1f} °C",
                 f"{cell_data['temp'] - 25:.1f}",
             )
-            st.metric("Heat Generation", f"{abs(cell_data['power']) * 0.05:.2f} W")
-            st.metric("Thermal Efficiency", f"{random.uniform(92, 99):.1f}%")
+            heat = cell_data["current"] ** 2 * resistance[idx]
+            st.metric("Heat Generation", f"{heat:.2f} W")
+            st.metric(
+                "Thermal Efficiency",
+                health_text(metrics["thermal_efficiency"][idx] * 100, "{:.1f}%"),
+                help="Share of the energy throughput not lost as I²R heat",
+            )
 
         with col3:
             st.markdown("### 📈 Performance Metrics")
             specs = CELL_SPECS[cell_type]
             voltage_util = (cell_data["voltage"] / specs["max_voltage"]) * 100
             st.metric("Voltage Utilization", f"{voltage_util:.1f}%")
-            st.metric("Capacity Retention", f"{random.uniform(85, 98):.1f}%")
-            st.metric("Cycle Count", f"{random.randint(100, 1000)}")
-
-        # Historical Analysis Charts
-        if st.session_state.historical_data:
-            df = pd.DataFrame(st.session_state.historical_data)
-
-            # Multi-parameter time series
-            fig_multi = make_subplots(
-                rows=2,
-                cols=2,
-                subplot_titles=(
-                    f"{cell_name} - Voltage Over Time",
-                    f"{cell_name} - Current Over Time",
-                    f"{cell_name} - Temperature Over Time",
-                    f"{cell_name} - Power Over Time",
-                ),
-                specs=[
-                    [{"secondary_y": False}, {"secondary_y": False}],
-                    [{"secondary_y": False}, {"secondary_y": False}],
-                ],
+            st.metric(
+                "Capacity Retention",
+                health_text(metrics["capacity_retention"][idx] * 100, "{:.1f}%"),
+                help="Coulomb counting between rested SOC points"
+                + health_text(metrics["capacity_ah"][idx], ": {:.2f} Ah"),
+            )
+            st.metric(
+                "Cycle Count",
+                f"{metrics['cycles'][idx]:.1f}",
+                help="Equivalent full cycles of the charge throughput in the history",
             )
 
-            voltage_col = f"{cell_id}_voltage"
-            current_col = f"{cell_id}_current"
-            temp_col = f"{cell_id}_temp"
-            power_col = f"{cell_id}_power"
-
-            if voltage_col in df.columns:
-                fig_multi.add_trace(
-                    go.Scatter(
-                        x=df["timestamp"],
-                        y=df[voltage_col],
-                        name="Voltage",
-                        line=dict(color="blue", width=2),
-                    ),
-                    row=1,
-                    col=1,
-                )
-
-            if current_col in df.columns:
-                fig_multi.add_trace(
-                    go.Scatter(
-                        x=df["timestamp"],
-                        y=df[current_col],
-                        name="Current",
-                        line=dict(color="red", width=2),
-                    ),
-                    row=1,
-                    col=2,
-                )
-
-            if temp_col in df.columns:
-                fig_multi.add_trace(
-                    go.Scatter(
-                        x=df["timestamp"],
-                        y=df[temp_col],
-                        name="Temperature",
-                        line=dict(color="orange", width=2),
-                    ),
-                    row=2,
-                    col=1,
-                )
-
-            if power_col in df.columns:
-                fig_multi.add_trace(
-                    go.Scatter(
-                        x=df["timestamp"],
-                        y=df[power_col],
-                        name="Power",
-                        line=dict(color="green", width=2),
-                    ),
-                    row=2,
-                    col=2,
+        st.markdown("### 🔎 Anomaly Scores")
+        st.dataframe(
+            [
+                {
+                    "Parameter": FIELD_LABELS[param],
+                    "Drift (σ)": round(float(drift), 1),
+                    "vs Pack (σ)": round(float(pack_z), 1),
+                    "Flagged": abs(drift) > limits[0] or abs(pack_z) > limits[1],
+                }
+                for param, drift, pack_z in zip(
+                    RULE_FIELDS, *estimates["anomaly_z"][:, :, idx]
                 )
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.caption(
+            "Drift compares the latest reading with the cell's own moving average;"
+            " vs Pack with the median of the cells of the same chemistry."
+            f" Limits: {limits[0]:g}σ and {limits[1]:g}σ."
+        )
 
-            fig_multi.update_layout(height=600, showlegend=False)
-            fig_multi.update_xaxes(title_text="Time")
-            fig_multi.update_yaxes(title_text="Voltage (V)", row=1, col=1)
-            fig_multi.update_yaxes(title_text="Current (A)", row=1, col=2)
-            fig_multi.update_yaxes(title_text="Temperature (°C)", row=2, col=1)
-            fig_multi.update_yaxes(title_text="Power (W)", row=2, col=2)
+        # Historical Analysis Charts
+        if len(history) and history.has_cell(cell_id):
+            cell_frame = history.cell_frame(cell_id)
 
+            # Multi-parameter time series
+            fig_multi = cell_history_figure(
+                history, cell_id, cell_name, CHART_POINTS, DECIMATION_METHOD
+            )
             st.plotly_chart(fig_multi, use_container_width=True)
 
             # Distribution Analysis
             col1, col2 = st.columns(2)
 
             with col1:
-                if voltage_col in df.columns:
-                    fig_hist = px.histogram(
-                        df,
-                        x=voltage_col,
-                        nbins=20,
-                        title=f"{cell_name} - Voltage Distribution",
-                        color_discrete_sequence=["#1f77b4"],
-                    )
-                    fig_hist.add_vline(
-                        x=cell_data["voltage"],
-                        line_dash="dash",
-                        line_color="red",
-                        annotation_text="Current",
-                    )
-                    st.plotly_chart(fig_hist, use_container_width=True)
+                fig_hist = distribution_figure(
+                    cell_frame,
+                    "voltage",
+                    cell_data["voltage"],
+                    f"{cell_name} - Voltage Distribution",
+                    "#1f77b4",
+                )
+                st.plotly_chart(fig_hist, use_container_width=True)
 
             with col2:
-                if temp_col in df.columns:
-                    fig_temp_hist = px.histogram(
-                        df,
-                        x=temp_col,
-                        nbins=20,
-                        title=f"{cell_name} - Temperature Distribution",
-                        color_discrete_sequence=["#ff7f0e"],
-                    )
-                    fig_temp_hist.add_vline(
-                        x=cell_data["temp"],
-                        line_dash="dash",
-                        line_color="red",
-                        annotation_text="Current",
-                    )
-                    st.plotly_chart(fig_temp_hist, use_container_width=True)
+                fig_temp_hist = distribution_figure(
+                    cell_frame,
+                    "temp",
+                    cell_data["temp"],
+                    f"{cell_name} - Temperature Distribution",
+                    "#ff7f0e",
+                )
+                st.plotly_chart(fig_temp_hist, use_container_width=True)
 
             # Statistical Summary Table
             st.markdown("### 📊 Statistical Summary")
 
-            stats_data = []
-            for param in ["voltage", "current", "temp", "power"]:
-                col_name = f"{cell_id}_{param}"
-                if col_name in df.columns:
-                    data = df[col_name]
-                    stats_data.append(
-                        {
-                            "Parameter": param.title(),
-                            "Current": f"{cell_data[param]:.3f}",
-                            "Mean": f"{data.mean():.3f}",
-                            "Std Dev": f"{data.std():.3f}",
-                            "Min": f"{data.min():.3f}",
-                            "Max": f"{data.max():.3f}",
-                            "Range": f"{data.max() - data.min():.3f}",
-                        }
-                    )
-
-            if stats_data:
-                stats_df = pd.DataFrame(stats_data)
-                st.dataframe(stats_df, use_container_width=True)
+            stats_df = summary_table(cell_frame, cell_data, history.params)
+            st.dataframe(stats_df, use_container_width=True)
 
             # Correlation Analysis
             st.markdown("### 🔗 Parameter Correlations")
 
-            cell_columns = [
-                col
-                for col in df.columns
-                if col.startswith(cell_id) and col != f"{cell_id}_timestamp"
-            ]
-            if len(cell_columns) > 1:
-                corr_data = df[cell_columns].corr()
-
-                fig_corr = px.imshow(
-                    corr_data,
-                    title=f"{cell_name} - Parameter Correlation Matrix",
-                    color_continuous_scale="RdBu_r",
-                    aspect="auto",
-                )
-                fig_corr.update_layout(height=400)
-                st.plotly_chart(fig_corr, use_container_width=True)
+            fig_corr = correlation_figure(cell_frame, cell_name)
+            st.plotly_chart(fig_corr, use_container_width=True)
 
         st.markdown("---")
 
 
+def soc_gauge(cell_id, soc):
+    """SOC gauge of one cell"""
+    import plotly.graph_objects as go
+
+    fig_gauge = go.Figure(
+        go.Indicator(
+            mode="gauge+number+delta",
+            value=soc,
+            domain={"x": [0, 1], "y": [0, 1]},
+            title={"text": f"{cell_id}<br>SOC (%)"},
+            delta={"reference": 80},
+            gauge={
+                "axis": {"range": [None, 100]},
+                "bar": {"color": "darkblue"},
+                "steps": [
+                    {"range": [0, 25], "color": "lightgray"},
+                    {"range": [25, 50], "color": "yellow"},
+                    {"range": [50, 85], "color": "lightgreen"},
+                    {"range": [85, 100], "color": "green"},
+                ],
+                "threshold": {
+                    "line": {"color": "red", "width": 4},
+                    "thickness": 0.75,
+                    "value": 90,
+                },
+            },
+        )
+    )
+    fig_gauge.update_layout(height=300)
+    return fig_gauge
+
+
+def apply_current(idx, key):
+    """Slider callback: set one cell's current and its voltage under load"""
+    pack = st.session_state.cells_data
+    cell_data = pack[pack.cell_ids[idx]]
+    current = st.session_state[key]
+
+    simulator = cell_simulator()
+    with writer_lock():
+        # Load step on the equivalent circuit: the R0 drop follows at once
+        new_voltage = simulator.load_step(idx, current)
+
+        # Update cell data and fold the change into the pack totals
+        st.session_state.pack_totals.set_cell(
+            pack,
+            idx,
+            current=current,
+            power=new_voltage * current,
+            voltage=new_voltage,
+        )
+    if role == "Shared Writer":
+        get_shared_pack().publish()  # fragment reruns skip the end-of-run publish
+
+
+@st.fragment
+def cell_monitor(idx):
+    """Current slider, readings and SOC gauge of one cell.
+
+    Moving the slider reruns only this fragment: the cell's power and
+    voltage are recomputed and folded into the pack totals incrementally.
+    """
+    pack = st.session_state.cells_data
+    cell_id = pack.cell_ids[idx]
+    cell_data = pack[cell_id]
+    cell_type = pack.chemistry_of(cell_id)
+
+    st.markdown(f"**{cell_id.replace('_', ' ').title()}**")
+
+    # Show the pack's current when it was changed elsewhere (load test, live ingest)
+    key = f"current_{cell_id}"
+    st.session_state[key] = min(max(cell_data["current"], -10.0), 10.0)
+    st.slider(
+        "Current (A)",
+        min_value=-10.0,
+        max_value=10.0,
+        step=0.1,
+        key=key,
+        on_change=apply_current,
+        args=(idx, key),
+    )
+
+    # Display current values
+    st.metric("Power", f"{cell_data['power']:.2f} W")
+    st.metric("Voltage", f"{cell_data['voltage']:.2f} V")
+
+    soc = calculate_soc(cell_data["voltage"], cell_type, cell_data["temp"])
+    st.plotly_chart(soc_gauge(cell_id, soc), use_container_width=True)
+
+
+@st.fragment(run_every="1s")
+def pack_totals_panel():
+    """Pack totals kept current by the cell fragments, polled once a second"""
+    totals = st.session_state.pack_totals
+    if "ingest_service" in st.session_state:
+        # Live frames change every cell, so recompute instead of patching
+        totals.reset(st.session_state.cells_data)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Current", f"{totals.current:.2f} A")
+    with col2:
+        st.metric("Total Power", f"{totals.power:.2f} W")
+    with col3:
+        st.metric("Average Voltage", f"{totals.average_voltage:.2f} V")
+    with col4:
+        st.metric("Healthy Cells", f"{totals.healthy}/{totals.cells}")
+
+
+role = apply_session_role()
+
 # Sidebar
 with st.sidebar:
     st.title("🔋 Battery Monitor")
 
-    page = st.selectbox(
-        "Navigation",
-        [
-            "Dashboard",
-            "Cell Configuration",
-            "Real-time Monitoring",
-            "Cell-wise EDA",
-            "Alerts & Safety",
-            "Data Export",
-        ],
+    pages = [
+        "Dashboard",
+        "Cell Configuration",
+        "Real-time Monitoring",
+        "Cell-wise EDA",
+        "Alerts & Safety",
+        "Data Export",
+    ]
+    if role == "Viewer":
+        pages = [name for name in pages if name not in EDITING_PAGES]
+    page = st.selectbox("Navigation", pages)
+
+    st.radio(
+        "Session Role",
+        SESSION_ROLES,
+        key="session_role",
+        help="Writers publish their pack to every viewer of this server",
     )
+    if role == "Viewer":
+        follow_snapshot()
+    elif st.session_state.session_role == "Shared Writer" and role != "Shared Writer":
+        st.warning("Another session is the shared writer.")
+        if st.button("Take Over", use_container_width=True):
+            get_shared_pack().claim(st.session_state.session_token, force=True)
+            st.rerun()
 
     st.markdown("---")
 
     # System Status
     if st.session_state.cells_data:
-        total_cells = len(st.session_state.cells_data)
-        healthy_cells = sum(
-            1
-            for cell_id, cell_data in st.session_state.cells_data.items()
-            if get_cell_status(cell_data, cell_id.split("_")[2]) == "healthy"
-        )
+        summary = pack_summary()
+        total_cells = summary["cells"]
+        healthy_cells = summary["healthy"]
 
         st.metric("Total Cells", total_cells)
         st.metric("Healthy Cells", f"{healthy_cells}/{total_cells}")
@@ -567,8 +1049,15 @@ with st.sidebar:
             else:
                 st.error("Critical system status")
 
+    # Filled in at the end of the run with this run's time
+    run_time_slot = st.empty()
+
 # Main content based on selected page
 if page == "Dashboard":
+    # Plotly is only loaded once a page that draws charts is opened
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     st.title("🔋 Battery Management System Dashboard")
 
     if not st.session_state.cells_data:
@@ -579,18 +1068,12 @@ if page == "Dashboard":
         # System Overview Metrics
         col1, col2, col3, col4 = st.columns(4)
 
-        total_power = sum(
-            cell["power"] for cell in st.session_state.cells_data.values()
-        )
-        avg_temp = np.mean(
-            [cell["temp"] for cell in st.session_state.cells_data.values()]
-        )
-        avg_voltage = np.mean(
-            [cell["voltage"] for cell in st.session_state.cells_data.values()]
-        )
-        total_current = sum(
-            cell["current"] for cell in st.session_state.cells_data.values()
-        )
+        pack = st.session_state.cells_data
+        summary = pack_summary()
+        total_power = summary["total_power"]
+        avg_temp = summary["average_temp"]
+        avg_voltage = summary["average_voltage"]
+        total_current = summary["total_current"]
 
         with col1:
             st.metric("Total Power", f"{total_power:.2f} W", f"{total_power-50:.1f}")
@@ -611,11 +1094,20 @@ if page == "Dashboard":
 
         with col1:
             # Enhanced voltage comparison with status colors
-            cell_names = list(st.session_state.cells_data.keys())
-            voltages = [
-                st.session_state.cells_data[cell]["voltage"] for cell in cell_names
-            ]
-            colors = [CELL_SPECS[cell.split("_")[2]]["color"] for cell in cell_names]
+            if len(pack) > DASHBOARD_CELL_LIMIT:
+                # Large packs are summarised per module to keep the charts light
+                totals = pack.module_totals()
+                cell_names = [f"Module {m + 1}" for m in totals["module"]]
+                voltages = totals["voltage"]
+                temps = totals["temp"]
+                powers = totals["power"]
+                colors = None
+            else:
+                cell_names = pack.cell_ids
+                voltages = pack.data["voltage"]
+                temps = pack.data["temp"]
+                powers = pack.data["power"]
+                colors = pack.spec_column("color")
 
             fig_voltage = go.Figure(
                 data=go.Bar(
@@ -631,8 +1123,6 @@ if page == "Dashboard":
 
         with col2:
             # Enhanced temperature comparison
-            temps = [st.session_state.cells_data[cell]["temp"] for cell in cell_names]
-
             fig_temp = go.Figure(
                 data=go.Bar(
                     x=cell_names, y=temps, marker_color=colors, name="Temperature"
@@ -648,8 +1138,6 @@ if page == "Dashboard":
         # System Power Distribution
         st.subheader("Power Distribution Analysis")
 
-        powers = [st.session_state.cells_data[cell]["power"] for cell in cell_names]
-
         col1, col2 = st.columns(2)
 
         with col1:
@@ -675,12 +1163,16 @@ if page == "Dashboard":
         # Cell Status Grid
         st.subheader("Cell Status Overview")
 
+        statuses = pack.status_labels()
+        socs = pack.soc()
+        cell_range = paginate(len(pack), "dashboard_page")
         cols = st.columns(4)
-        for idx, (cell_id, cell_data) in enumerate(st.session_state.cells_data.items()):
+        for idx in cell_range:
+            cell_id = pack.cell_ids[idx]
+            cell_data = pack[cell_id]
             col_idx = idx % 4
-            cell_type = cell_id.split("_")[2]
-            status = get_cell_status(cell_data, cell_type)
-            soc = calculate_soc(cell_data["voltage"], cell_type)
+            status = statuses[idx]
+            soc = socs[idx]
 
             with cols[col_idx]:
                 status_class = f"cell-status-{status}"
@@ -702,7 +1194,23 @@ elif page == "Cell Configuration":
     st.title("⚙️ Cell Configuration")
 
     st.info(
-        "Configure your 8 battery cells by selecting their types and setting initial parameters."
+        "Configure your battery pack topology and cell types, then fine-tune individual cells."
+    )
+
+    # Pack topology
+    st.subheader("Pack Topology")
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        series = st.number_input("Cells in Series (S)", 1, 2000, 8)
+    with col2:
+        parallel = st.number_input("Cells in Parallel (P)", 1, 50, 1)
+    with col3:
+        groups_per_module = st.number_input("Series Groups per Module", 1, 2000, 8)
+
+    topology = PackTopology(series, parallel, groups_per_module)
+    st.caption(
+        f"{topology}: {topology.n_cells} cells in {topology.n_modules} module(s)"
     )
 
     # Preset configurations
@@ -711,53 +1219,25 @@ elif page == "Cell Configuration":
 
     with col1:
         if st.button("All LFP Pack", use_container_width=True):
-            for i in range(8):
-                cell_id = f"cell_{i+1}_lfp"
-                specs = CELL_SPECS["lfp"]
-                st.session_state.cells_data[cell_id] = {
-                    "voltage": specs["nominal_voltage"],
-                    "current": 0.0,
-                    "temp": round(random.uniform(25, 35), 1),
-                    "power": 0.0,
-                    "min_voltage": specs["min_voltage"],
-                    "max_voltage": specs["max_voltage"],
-                }
+            configure_pack(topology, "lfp")
             st.success("LFP pack configured!")
 
     with col2:
         if st.button("All NMC Pack", use_container_width=True):
-            for i in range(8):
-                cell_id = f"cell_{i+1}_nmc"
-                specs = CELL_SPECS["nmc"]
-                st.session_state.cells_data[cell_id] = {
-                    "voltage": specs["nominal_voltage"],
-                    "current": 0.0,
-                    "temp": round(random.uniform(25, 35), 1),
-                    "power": 0.0,
-                    "min_voltage": specs["min_voltage"],
-                    "max_voltage": specs["max_voltage"],
-                }
+            configure_pack(topology, "nmc")
             st.success("NMC pack configured!")
 
     with col3:
         if st.button("Mixed Pack 1", use_container_width=True):
-            types = ["lfp", "lfp", "lfp", "lfp", "nmc", "nmc", "nmc", "nmc"]
-            for i, cell_type in enumerate(types):
-                cell_id = f"cell_{i+1}_{cell_type}"
-                specs = CELL_SPECS[cell_type]
-                st.session_state.cells_data[cell_id] = {
-                    "voltage": specs["nominal_voltage"],
-                    "current": 0.0,
-                    "temp": round(random.uniform(25, 35), 1),
-                    "power": 0.0,
-                    "min_voltage": specs["min_voltage"],
-                    "max_voltage": specs["max_voltage"],
-                }
+            half = topology.n_cells // 2
+            types = ["lfp"] * half + ["nmc"] * (topology.n_cells - half)
+            configure_pack(topology, types)
             st.success("Mixed pack configured!")
 
     with col4:
         if st.button("Clear All", use_container_width=True):
-            st.session_state.cells_data = {}
+            stop_ingest()  # live frames address cells by position
+            st.session_state.cells_data.clear()
             st.session_state.sample_data_generated = False
             st.success("All cells cleared!")
 
@@ -766,44 +1246,50 @@ elif page == "Cell Configuration":
     # Individual cell configuration
     st.subheader("Individual Cell Configuration")
 
+    pack = st.session_state.cells_data
+    chemistry_options = list(CELL_SPECS.keys())
+    cell_range = paginate(len(pack) or 8, "config_page")
     cols = st.columns(2)
 
-    for i in range(8):
+    for i in cell_range:
         col_idx = i % 2
 
         with cols[col_idx]:
             st.markdown(f"**Cell {i+1}**")
 
+            existing_id = pack.cell_ids[i] if i < len(pack) else None
+            current_type = pack.chemistry_of(existing_id) if existing_id else "lfp"
+
             cell_type = st.selectbox(
                 f"Cell {i+1} Type",
-                options=list(CELL_SPECS.keys()),
+                options=chemistry_options,
                 format_func=lambda x: CELL_SPECS[x]["name"],
                 key=f"cell_type_{i}",
-                index=0,
+                index=chemistry_options.index(current_type),
             )
 
             specs = CELL_SPECS[cell_type]
             cell_id = f"cell_{i+1}_{cell_type}"
 
-            # Initialize or update cell data
-            if cell_id not in st.session_state.cells_data:
-                st.session_state.cells_data[cell_id] = {
-                    "voltage": specs["nominal_voltage"],
-                    "current": 0.0,
-                    "temp": round(random.uniform(25, 35), 1),
-                    "power": 0.0,
-                    "min_voltage": specs["min_voltage"],
-                    "max_voltage": specs["max_voltage"],
-                }
-
-            # Remove old cell data if type changed
-            old_cells = [
-                k
-                for k in st.session_state.cells_data.keys()
-                if k.startswith(f"cell_{i+1}_") and k != cell_id
-            ]
-            for old_cell in old_cells:
-                del st.session_state.cells_data[old_cell]
+            # Initialize the cell, or swap it in place if its type changed
+            if existing_id is None:
+                with writer_lock():
+                    pack[cell_id] = {
+                        "chemistry": cell_type,
+                        "voltage": specs["nominal_voltage"],
+                        "current": 0.0,
+                        "temp": round(random.uniform(25, 35), 1),
+                        "power": 0.0,
+                    }
+            elif existing_id != cell_id:
+                with writer_lock():
+                    pack.replace_cell(
+                        existing_id,
+                        cell_id,
+                        cell_type,
+                        voltage=specs["nominal_voltage"],
+                        temp=round(random.uniform(25, 35), 1),
+                    )
 
             col_a, col_b = st.columns(2)
             with col_a:
@@ -830,122 +1316,26 @@ elif page == "Real-time Monitoring":
                 update_historical_data()
                 st.success("Data logged!")
 
+        live_ingest_panel()
+        if "ingest_service" not in st.session_state and role != "Viewer":
+            advance_simulation()
+
+        # Pack totals, refreshed on their own while sliders rerun single cells
+        pack = st.session_state.cells_data
+        st.session_state.pack_totals = PackTotals(pack)
+        totals_slot = st.container()
+
         # Current input section
         st.subheader("Current Input Controls")
 
         cols = st.columns(2)
+        for idx in paginate(len(pack), "monitoring_page"):
+            with cols[idx % 2]:
+                cell_monitor(idx)
 
-        for idx, (cell_id, cell_data) in enumerate(st.session_state.cells_data.items()):
-            col_idx = idx % 2
-
-            with cols[col_idx]:
-                st.markdown(f"**{cell_id.replace('_', ' ').title()}**")
-
-                current = st.slider(
-                    f"Current (A)",
-                    min_value=-10.0,
-                    max_value=10.0,
-                    value=cell_data["current"],
-                    step=0.1,
-                    key=f"current_{cell_id}",
-                )
-
-                # Update cell data
-                st.session_state.cells_data[cell_id]["current"] = current
-                st.session_state.cells_data[cell_id]["power"] = round(
-                    cell_data["voltage"] * current, 2
-                )
-
-                # Simulate voltage drop under load
-                base_voltage = CELL_SPECS[cell_id.split("_")[2]]["nominal_voltage"]
-                voltage_drop = abs(current) * 0.05  # Simple internal resistance model
-                new_voltage = base_voltage - voltage_drop
-                st.session_state.cells_data[cell_id]["voltage"] = round(new_voltage, 2)
-
-                # Display current values
-                st.metric(
-                    "Power", f"{st.session_state.cells_data[cell_id]['power']:.2f} W"
-                )
-                st.metric("Voltage", f"{new_voltage:.2f} V")
-
-        st.markdown("---")
-
-        # Real-time gauges
-        st.subheader("Live SOC Gauges")
-
-        gauge_cols = st.columns(4)
-        cell_items = list(st.session_state.cells_data.items())
-
-        for i in range(min(4, len(cell_items))):
-            cell_id, cell_data = cell_items[i]
-            cell_type = cell_id.split("_")[2]
-            soc = calculate_soc(cell_data["voltage"], cell_type)
-
-            with gauge_cols[i]:
-                fig_gauge = go.Figure(
-                    go.Indicator(
-                        mode="gauge+number+delta",
-                        value=soc,
-                        domain={"x": [0, 1], "y": [0, 1]},
-                        title={"text": f"{cell_id}<br>SOC (%)"},
-                        delta={"reference": 80},
-                        gauge={
-                            "axis": {"range": [None, 100]},
-                            "bar": {"color": "darkblue"},
-                            "steps": [
-                                {"range": [0, 25], "color": "lightgray"},
-                                {"range": [25, 50], "color": "yellow"},
-                                {"range": [50, 85], "color": "lightgreen"},
-                                {"range": [85, 100], "color": "green"},
-                            ],
-                            "threshold": {
-                                "line": {"color": "red", "width": 4},
-                                "thickness": 0.75,
-                                "value": 90,
-                            },
-                        },
-                    )
-                )
-
-                fig_gauge.update_layout(height=300)
-                st.plotly_chart(fig_gauge, use_container_width=True)
-
-        # More gauges for remaining cells if more than 4
-        if len(cell_items) > 4:
-            gauge_cols2 = st.columns(4)
-            for i in range(4, min(8, len(cell_items))):
-                cell_id, cell_data = cell_items[i]
-                cell_type = cell_id.split("_")[2]
-                soc = calculate_soc(cell_data["voltage"], cell_type)
-
-                with gauge_cols2[i - 4]:
-                    fig_gauge = go.Figure(
-                        go.Indicator(
-                            mode="gauge+number+delta",
-                            value=soc,
-                            domain={"x": [0, 1], "y": [0, 1]},
-                            title={"text": f"{cell_id}<br>SOC (%)"},
-                            delta={"reference": 80},
-                            gauge={
-                                "axis": {"range": [None, 100]},
-                                "bar": {"color": "darkblue"},
-                                "steps": [
-                                    {"range": [0, 25], "color": "lightgray"},
-                                    {"range": [25, 50], "color": "yellow"},
-                                    {"range": [50, 85], "color": "lightgreen"},
-                                    {"range": [85, 100], "color": "green"},
-                                ],
-                                "threshold": {
-                                    "line": {"color": "red", "width": 4},
-                                    "thickness": 0.75,
-                                    "value": 90,
-                                },
-                            },
-                        )
-                    )
-
-                    fig_gauge.update_layout(height=300)
-                    st.plotly_chart(fig_gauge, use_container_width=True)
+        # Drawn after the cells so a full run shows their updated values
+        with totals_slot:
+            pack_totals_panel()
 
         # Temperature simulation
         st.subheader("Environmental Simulation")
@@ -954,38 +1344,61 @@ elif page == "Real-time Monitoring":
 
         with temp_col1:
             if st.button("🔥 Simulate Heat Up", use_container_width=True):
-                for cell_id in st.session_state.cells_data:
-                    current_temp = st.session_state.cells_data[cell_id]["temp"]
-                    new_temp = min(current_temp + random.uniform(5, 15), 70)
-                    st.session_state.cells_data[cell_id]["temp"] = round(new_temp, 1)
-                    if new_temp > 45:
-                        add_alert(
-                            f"{cell_id} temperature high: {new_temp:.1f}°C", "warning"
-                        )
+                pack = st.session_state.cells_data
+                soak(HEAT_UP_COOLANT_TEMP)
+                for idx in np.flatnonzero(pack.data["temp"] > 45):
+                    add_alert(
+                        f"{pack.cell_ids[idx]} temperature high: "
+                        f"{pack.data['temp'][idx]:.1f}°C",
+                        "warning",
+                    )
                 st.success("Temperature increased!")
 
         with temp_col2:
             if st.button("❄️ Simulate Cool Down", use_container_width=True):
-                for cell_id in st.session_state.cells_data:
-                    current_temp = st.session_state.cells_data[cell_id]["temp"]
-                    new_temp = max(current_temp - random.uniform(5, 10), 15)
-                    st.session_state.cells_data[cell_id]["temp"] = round(new_temp, 1)
+                soak(COOL_DOWN_COOLANT_TEMP)
                 st.success("Temperature decreased!")
 
         with temp_col3:
             if st.button("🎲 Random Load Test", use_container_width=True):
-                for cell_id in st.session_state.cells_data:
-                    random_current = random.uniform(-5, 5)
-                    st.session_state.cells_data[cell_id]["current"] = round(
-                        random_current, 2
-                    )
-                    st.session_state.cells_data[cell_id]["power"] = round(
-                        st.session_state.cells_data[cell_id]["voltage"]
-                        * random_current,
-                        2,
+                pack = st.session_state.cells_data
+                random_current = np.random.uniform(-5, 5, len(pack))
+                with writer_lock():
+                    pack.data["current"] = np.round(random_current, 2)
+                    pack.data["power"] = np.round(
+                        pack.data["voltage"] * random_current, 2
                     )
                 st.success("Random loads applied!")
 
+        with st.expander("🔥 Thermal Runaway Propagation"):
+            col1, col2 = st.columns(2)
+            with col1:
+                origin = st.selectbox("Initiating Cell", pack.cell_ids)
+            with col2:
+                runaway_s = st.number_input(
+                    "Simulated Time (s)", min_value=10, max_value=3600, value=600
+                )
+            if st.button("🔥 Trigger Runaway", use_container_width=True):
+                thermal = pack_thermal()
+                simulator = cell_simulator()
+                with writer_lock():
+                    thermal.ignite(pack.cell_ids.index(origin))
+                    simulator.run(
+                        runaway_s, pack.data["current"].copy(), thermal=thermal
+                    )
+                started = thermal.runaway_at[thermal.in_runaway]
+                spread = len(started) - 1
+                add_alert(
+                    f"Thermal runaway in {origin} spread to {spread} cell(s)"
+                    f" within {runaway_s} s",
+                    "critical",
+                )
+                st.error(
+                    f"{len(started)} cell(s) in runaway, the last"
+                    f" {started.max() - started.min():.0f} s after {origin};"
+                    f" peak temperature {thermal.temp.max():.0f} °C"
+                )
+
 elif page == "Cell-wise EDA":
     st.title("🔬 Cell-wise Exploratory Data Analysis")
 
@@ -1001,60 +1414,16 @@ elif page == "Alerts & Safety":
     st.subheader("Safety Status Dashboard")
 
     if st.session_state.cells_data:
-        safety_issues = []
-
-        for cell_id, cell_data in st.session_state.cells_data.items():
-            cell_type = cell_id.split("_")[2]
-            specs = CELL_SPECS[cell_type]
-
-            # Check voltage limits
-            if cell_data["voltage"] > specs["max_voltage"]:
-                safety_issues.append(
-                    {
-                        "Cell": cell_id,
-                        "Issue": "Overvoltage",
-                        "Value": f"{cell_data['voltage']:.2f}V",
-                        "Limit": f"{specs['max_voltage']}V",
-                        "Severity": "critical",
-                    }
-                )
-            elif cell_data["voltage"] < specs["min_voltage"]:
-                safety_issues.append(
-                    {
-                        "Cell": cell_id,
-                        "Issue": "Undervoltage",
-                        "Value": f"{cell_data['voltage']:.2f}V",
-                        "Limit": f"{specs['min_voltage']}V",
-                        "Severity": "critical",
-                    }
-                )
-
-            # Check temperature limits
-            if cell_data["temp"] > specs["max_temp"]:
-                safety_issues.append(
-                    {
-                        "Cell": cell_id,
-                        "Issue": "Overtemperature",
-                        "Value": f"{cell_data['temp']:.1f}°C",
-                        "Limit": f"{specs['max_temp']}°C",
-                        "Severity": "critical",
-                    }
-                )
-            elif cell_data["temp"] < specs["min_temp"]:
-                safety_issues.append(
-                    {
-                        "Cell": cell_id,
-                        "Issue": "Undertemperature",
-                        "Value": f"{cell_data['temp']:.1f}°C",
-                        "Limit": f"{specs['min_temp']}°C",
-                        "Severity": "warning",
-                    }
-                )
+        if role == "Viewer":
+            safety_issues = get_shared_pack().snapshot.issues
+        else:
+            safety_issues = find_safety_issues(st.session_state.cells_data)
 
         if safety_issues:
             st.error(f"🚨 {len(safety_issues)} safety issue(s) detected!")
 
-            for issue in safety_issues:
+            issue_range = paginate(len(safety_issues), "safety_page", page_size=20)
+            for issue in safety_issues[issue_range.start : issue_range.stop]:
                 severity_icon = {"critical": "🔴", "warning": "🟡", "info": "🔵"}
                 alert_class = f"alert-{issue['Severity']}"
 
@@ -1080,67 +1449,177 @@ elif page == "Alerts & Safety":
                 unsafe_allow_html=True,
             )
 
-        # Safety thresholds configuration
-        st.subheader("Safety Thresholds Configuration")
-
-        col1, col2 = st.columns(2)
+        # Viewers watch the shared pack, only its writer acts on it
+        if role != "Viewer":
+            # Safety thresholds configuration
+            st.subheader("Safety Thresholds Configuration")
 
-        with col1:
-            st.markdown("**Temperature Monitoring**")
-            temp_alert_high = st.slider("High Temperature Alert (°C)", 40, 70, 50)
-            temp_alert_low = st.slider("Low Temperature Alert (°C)", -20, 10, 0)
-
-        with col2:
-            st.markdown("**Voltage Monitoring**")
-            voltage_tolerance = st.slider("Voltage Tolerance (%)", 1, 10, 5)
-            current_limit = st.slider("Current Limit (A)", 5, 20, 10)
-
-        # Emergency actions
-        st.subheader("Emergency Actions")
+            col1, col2 = st.columns(2)
 
-        col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown("**Temperature Monitoring**")
+                st.slider(
+                    "High Temperature Alert (°C)",
+                    40,
+                    70,
+                    DEFAULT_TEMP_HIGH,
+                    key="alert_temp_high",
+                )
+                st.slider(
+                    "Low Temperature Alert (°C)",
+                    -20,
+                    10,
+                    DEFAULT_TEMP_LOW,
+                    key="alert_temp_low",
+                )
 
-        with col1:
-            if st.button("🛑 Emergency Stop", use_container_width=True):
-                for cell_id in st.session_state.cells_data:
-                    st.session_state.cells_data[cell_id]["current"] = 0.0
-                    st.session_state.cells_data[cell_id]["power"] = 0.0
-                add_alert(
-                    "Emergency stop activated - all currents set to zero", "critical"
+            with col2:
+                st.markdown("**Voltage Monitoring**")
+                st.slider(
+                    "Voltage Tolerance (%)",
+                    1,
+                    10,
+                    DEFAULT_VOLTAGE_TOLERANCE,
+                    key="alert_voltage_tolerance",
+                )
+                st.slider(
+                    "Current Limit (A)",
+                    5,
+                    20,
+                    DEFAULT_CURRENT_LIMIT,
+                    key="alert_current_limit",
                 )
-                st.success("Emergency stop activated!")
 
-        with col2:
-            if st.button("⚖️ Balance Cells", use_container_width=True):
-                if st.session_state.cells_data:
-                    # Simple balancing - bring all voltages to average
-                    voltages = [
-                        cell["voltage"] for cell in st.session_state.cells_data.values()
-                    ]
-                    avg_voltage = np.mean(voltages)
-
-                    for cell_id in st.session_state.cells_data:
-                        cell_type = cell_id.split("_")[2]
-                        specs = CELL_SPECS[cell_type]
-                        balanced_voltage = min(avg_voltage, specs["max_voltage"])
-                        balanced_voltage = max(balanced_voltage, specs["min_voltage"])
-                        st.session_state.cells_data[cell_id]["voltage"] = round(
-                            balanced_voltage, 2
+            # The sliders apply from the next recorded sample; rules are only
+            # evaluated where samples are recorded, never on a page rerun
+            engine = rule_engine()
+
+            st.markdown("**Alert Rules**")
+            pack = st.session_state.cells_data
+            rule_rows = []
+            for rule, alerting in engine.status():
+                unit = f"{UNITS[rule.field]}{'/s' if rule.rate else ''}"
+                if isinstance(rule.limit, str):
+                    limit = f"{rule.scale:.0%} of {rule.limit.replace('_', ' ')}"
+                else:
+                    limit = f"{rule.limit:g} {unit}"
+                rule_rows.append(
+                    {
+                        "Rule": rule.name,
+                        "Trips": f"{rule.op} {limit}",
+                        "Hysteresis": f"{rule.hysteresis:g} {unit}",
+                        "Debounce": f"{rule.debounce_s:g} s",
+                        "Severity": rule.severity,
+                        "Cells Alerting": ", ".join(
+                            pack.cell_ids[idx] for idx in alerting[:5]
                         )
+                        + (f" (+{len(alerting) - 5})" if len(alerting) > 5 else ""),
+                    }
+                )
+            st.dataframe(rule_rows, use_container_width=True, hide_index=True)
+
+            # Emergency actions
+            st.subheader("Emergency Actions")
+            strategy = st.selectbox(
+                "Balancing Strategy",
+                list(BALANCE_STRATEGIES),
+                help="Passive bleeds the high cells through resistors; active moves"
+                " their charge into the low cells",
+            )
+            balance_results = None
 
-                    add_alert("Cell balancing completed", "info")
-                    st.success("Cell balancing completed!")
+            col1, col2, col3 = st.columns(3)
 
-        with col3:
-            if st.button("🔄 Reset Alerts", use_container_width=True):
-                st.session_state.alerts = []
-                st.success("Alert history cleared!")
+            with col1:
+                if st.button("🛑 Emergency Stop", use_container_width=True):
+                    with writer_lock():
+                        st.session_state.cells_data.data["current"] = 0.0
+                        st.session_state.cells_data.data["power"] = 0.0
+                    add_alert(
+                        "Emergency stop activated - all currents set to zero",
+                        "critical",
+                    )
+                    st.success("Emergency stop activated!")
+
+            with col2:
+                if st.button("⚖️ Balance Cells", use_container_width=True):
+                    if st.session_state.cells_data:
+                        # Every strategy runs from the same state for comparison
+                        with writer_lock():
+                            balancer = CellBalancer(st.session_state.cells_data)
+                            balance_results = balancer.sweep()
+                            result = balance_results[strategy]
+                            balancer.apply(result)
+                        message = (
+                            f"Cell balancing ({strategy}) took"
+                            f" {result['time_s'] / 60:,.0f} min and dissipated"
+                            f" {result['energy_j'] / 1e3:,.2f} kJ; spread"
+                            f" {result['voltage_spread_before'] * 1e3:.0f} →"
+                            f" {result['voltage_spread_after'] * 1e3:.0f} mV"
+                        )
+                        if not result["converged"]:
+                            message += " (stopped before finishing)"
+                        add_alert(message, "info")
+                        st.success(message)
+
+            with col3:
+                if st.button("🔄 Reset Alerts", use_container_width=True):
+                    st.session_state.alerts_cleared_ns = time.time_ns()
+                    st.success("Alert history cleared!")
+
+            if balance_results:
+                st.dataframe(
+                    [
+                        {
+                            "Strategy": name,
+                            "Time (min)": round(result["time_s"] / 60, 1),
+                            "Energy Dissipated (kJ)": round(
+                                result["energy_j"] / 1e3, 2
+                            ),
+                            "Voltage Spread (mV)": round(
+                                result["voltage_spread_after"] * 1e3, 1
+                            ),
+                            "SOC Spread (%)": round(
+                                result["soc_spread_after"] * 100, 1
+                            ),
+                            "Finished": result["converged"],
+                        }
+                        for name, result in balance_results.items()
+                    ],
+                    use_container_width=True,
+                    hide_index=True,
+                )
 
     # Alert history
     st.subheader("Alert History")
 
-    if st.session_state.alerts:
-        for alert in st.session_state.alerts:
+    alert_log = get_alert_log()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        severities = st.multiselect(
+            "Severity", SEVERITIES, default=list(SEVERITIES), key="alert_severities"
+        )
+    with col2:
+        cells = st.multiselect(
+            "Cells", alert_log.cell_ids, placeholder="All cells", key="alert_cells"
+        )
+    with col3:
+        window = st.selectbox("Time Window", list(ALERT_WINDOWS), key="alert_window")
+
+    # "Reset Alerts" hides older events from this session; the log keeps them
+    start_ns = st.session_state.alerts_cleared_ns
+    if ALERT_WINDOWS[window] is not None:
+        start_ns = max(start_ns, time.time_ns() - int(ALERT_WINDOWS[window] * 1e9))
+    rows = alert_log.query(
+        start_ns=start_ns or None,
+        cells=cells or None,
+        severities=None if len(severities) == len(SEVERITIES) else severities,
+    )
+
+    if len(rows):
+        st.caption(f"{len(rows):,} of {len(alert_log):,} logged alerts")
+        alert_range = paginate(len(rows), "alert_page", page_size=ALERTS_PER_PAGE)
+        for alert in alert_log.records(rows[alert_range.start : alert_range.stop]):
             alert_class = f"alert-{alert['type']}"
             severity_icons = {"critical": "🔴", "warning": "🟡", "info": "🔵"}
 
@@ -1172,37 +1651,15 @@ elif page == "Data Export":
 
     if st.session_state.cells_data:
         # Prepare current data for export
-        export_data = []
-        for cell_id, cell_data in st.session_state.cells_data.items():
-            cell_type = cell_id.split("_")[2]
-            soc = calculate_soc(cell_data["voltage"], cell_type)
-            status = get_cell_status(cell_data, cell_type)
-
-            export_data.append(
-                {
-                    "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "Cell_ID": cell_id,
-                    "Cell_Type": cell_type.upper(),
-                    "Voltage_V": cell_data["voltage"],
-                    "Current_A": cell_data["current"],
-                    "Power_W": cell_data["power"],
-                    "Temperature_C": cell_data["temp"],
-                    "SOC_Percent": round(soc, 1),
-                    "Status": status,
-                    "Min_Voltage": cell_data["min_voltage"],
-                    "Max_Voltage": cell_data["max_voltage"],
-                }
-            )
-
-        current_df = pd.DataFrame(export_data)
+        current_df = current_state_frame(st.session_state.cells_data)
 
         col1, col2 = st.columns(2)
 
+        # Files are only built when a download button is clicked
         with col1:
-            csv = current_df.to_csv(index=False)
             st.download_button(
                 label="📄 Download Current State (CSV)",
-                data=csv,
+                data=lambda: to_csv(current_df),
                 file_name=f"battery_status_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv",
                 use_container_width=True,
@@ -1210,28 +1667,18 @@ elif page == "Data Export":
 
         with col2:
             # Excel export
-            buffer = io.BytesIO()
-            try:
-                with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-                    current_df.to_excel(
-                        writer, sheet_name="Current_Status", index=False
-                    )
-
-                    # Add historical data if available
-                    if st.session_state.historical_data:
-                        historical_df = pd.DataFrame(st.session_state.historical_data)
-                        historical_df.to_excel(
-                            writer, sheet_name="Historical_Data", index=False
-                        )
-
+            if importlib.util.find_spec("openpyxl"):
+                history = st.session_state.history
                 st.download_button(
                     label="📊 Download Complete Report (Excel)",
-                    data=buffer.getvalue(),
+                    data=lambda: excel_report(
+                        current_df, history.to_frame() if len(history) else None
+                    ),
                     file_name=f"battery_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     use_container_width=True,
                 )
-            except:
+            else:
                 st.info(
                     "Excel export requires openpyxl. Install with: pip install openpyxl"
                 )
@@ -1241,32 +1688,28 @@ elif page == "Data Export":
         st.dataframe(current_df, use_container_width=True)
 
     # Export historical data
-    if st.session_state.historical_data:
+    history = st.session_state.history
+    if len(history):
         st.subheader("Historical Data Export")
 
-        historical_df = pd.DataFrame(st.session_state.historical_data)
-
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.metric("Total Records", len(historical_df))
+            st.metric("Total Records", len(history))
 
         with col2:
-            if len(historical_df) > 0:
-                time_span = (
-                    historical_df["timestamp"].max() - historical_df["timestamp"].min()
-                )
-                st.metric("Time Span", f"{time_span.total_seconds()/60:.1f} min")
+            timestamps = history.timestamps()
+            time_span_ns = timestamps.max() - timestamps.min()
+            st.metric("Time Span", f"{time_span_ns / 60e9:.1f} min")
 
         with col3:
-            data_size = len(str(historical_df)) / 1024  # Rough size estimate
+            data_size = history.nbytes / 1024
             st.metric("Data Size", f"{data_size:.1f} KB")
 
         # Historical data download
-        historical_csv = historical_df.to_csv(index=False)
         st.download_button(
             label="📈 Download Historical Data (CSV)",
-            data=historical_csv,
+            data=lambda: to_csv(history.to_frame()),
             file_name=f"battery_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv",
             use_container_width=True,
@@ -1274,83 +1717,225 @@ elif page == "Data Export":
 
         # Historical data preview
         st.subheader("Historical Data Preview (Last 10 Records)")
-        st.dataframe(historical_df.tail(10), use_container_width=True)
+        st.dataframe(history.to_frame(10), use_container_width=True)
 
-    # Configuration backup
-    st.subheader("Configuration Backup")
+    # Bulk synthetic data for load testing
+    if st.session_state.cells_data and role != "Viewer":
+        with st.expander("🧪 Generate Synthetic History"):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                synth_rate = st.number_input(
+                    "Rate (Hz)", min_value=0.01, max_value=1000.0, value=1.0
+                )
+            with col2:
+                synth_duration = st.number_input(
+                    "Duration (s)", min_value=1, max_value=7 * 24 * 3600, value=3600
+                )
+            with col3:
+                synth_noise = st.selectbox("Noise Model", NOISE_MODELS)
+            with col4:
+                synth_seed = st.number_input("Seed", min_value=0, value=0)
+            synth_archive = st.checkbox("Also write to the telemetry archive")
+
+            st.caption(
+                "The history is backfilled up to now, so clear the recorded"
+                " history first."
+            )
 
-    if st.session_state.cells_data:
-        config_data = {
-            "configuration": {
-                "cells": {
-                    k: {
-                        param: (float(v) if isinstance(v, (int, float)) else v)
-                        for param, v in cell_data.items()
-                    }
-                    for k, cell_data in st.session_state.cells_data.items()
-                },
-                "backup_time": datetime.now().isoformat(),
-                "total_cells": len(st.session_state.cells_data),
-                "cell_types": list(
-                    set(
-                        cell_id.split("_")[2]
-                        for cell_id in st.session_state.cells_data.keys()
+            if st.button("🧪 Generate", use_container_width=True):
+                try:
+                    with writer_lock():
+                        written = generate_history(
+                            st.session_state.cells_data,
+                            st.session_state.history,
+                            duration_s=synth_duration,
+                            rate_hz=synth_rate,
+                            noise=synth_noise,
+                            seed=int(synth_seed),
+                            archive=get_archive() if synth_archive else None,
+                        )
+                except ValueError as error:
+                    st.error(f"Cannot generate: {error}")
+                else:
+                    st.success(
+                        f"Generated {written:,} samples for "
+                        f"{len(st.session_state.cells_data)} cells"
                     )
-                ),
-            }
-        }
 
-        import json
+    # Equivalent-circuit simulation from the current pack state
+    if st.session_state.cells_data and role != "Viewer":
+        with st.expander("🔋 Simulate Operation"):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                sim_hours = st.number_input(
+                    "Duration (h)", min_value=0.01, max_value=168.0, value=1.0
+                )
+            with col2:
+                sim_profile = st.selectbox("Current Profile", SIMULATION_PROFILES)
+            with col3:
+                sim_current = st.number_input(
+                    "Current (A, + charges)",
+                    min_value=-10.0,
+                    max_value=10.0,
+                    value=-1.0,
+                    disabled=sim_profile == SIMULATION_PROFILES[0],
+                )
+            with col4:
+                sim_step = st.number_input(
+                    "Time Step (s)", min_value=0.1, max_value=60.0, value=1.0
+                )
+            sim_every = st.number_input(
+                "Record every n-th step", min_value=1, max_value=3600, value=10
+            )
+            sim_archive = st.checkbox(
+                "Also write to the telemetry archive", key="sim_archive"
+            )
 
-        config_json = json.dumps(config_data, indent=2)
+            if st.button("🔋 Simulate", use_container_width=True):
+                stop_ingest()  # live frames would overwrite the simulated state
+                pack = st.session_state.cells_data
+                if sim_profile == SIMULATION_PROFILES[0]:
+                    profile = pack.data["current"].copy()
+                elif sim_profile == SIMULATION_PROFILES[1]:
+                    profile = sim_current
+                else:
+                    profile = lambda t: sim_current if t % 120 < 60 else 0.0
+                started = time.perf_counter()
+                simulator = cell_simulator()
+                with writer_lock():
+                    recorded = simulator.run(
+                        sim_hours * 3600,
+                        profile,
+                        dt_s=sim_step,
+                        history=st.session_state.history,
+                        archive=get_archive() if sim_archive else None,
+                        sample_every=int(sim_every),
+                    )
+                st.session_state.simulated_until = time.time()
+                st.success(
+                    f"Simulated {sim_hours:g} h in {time.perf_counter() - started:.1f} s,"
+                    f" {recorded:,} samples recorded"
+                )
 
+    # Post-incident analysis of recorded telemetry
+    if st.session_state.cells_data and role != "Viewer":
+        with st.expander(
+            "📼 Replay Recorded Log", expanded="log_replay" in st.session_state
+        ):
+            st.caption(
+                "Replays a CSV log (history export or timestamp, cell, voltage,"
+                " current, temp rows) or a candump log through the monitoring"
+                " pipeline, raising alerts with the recorded timestamps. The"
+                " replay runs in the background into a fresh history that"
+                " replaces this session's."
+            )
+            log_file = st.file_uploader(
+                "Telemetry log", type=["csv", "log", "txt"], key="replay_log_file"
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                replay_speed = st.selectbox("Replay Speed", list(REPLAY_SPEEDS))
+            with col2:
+                replay_archive = st.checkbox(
+                    "Also write to a replay archive",
+                    key="replay_archive",
+                    help=f"A new archive under {REPLAY_ARCHIVE_DIR}/ for each replay,"
+                    " apart from the live telemetry archive",
+                )
+
+            if log_file is not None and st.button(
+                "📼 Replay Log", use_container_width=True
+            ):
+                start_log_replay(log_file, REPLAY_SPEEDS[replay_speed], replay_archive)
+            if "log_replay" in st.session_state:
+                log_replay_status()
+
+    # Persistent archive
+    archive = get_archive()
+    time_range = archive.time_range()
+    if time_range:
+        st.subheader("Telemetry Archive")
+
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.metric("Archived Records", len(archive))
+
+        with col2:
+            st.metric("Time Span", f"{(time_range[1] - time_range[0]) / 3600e9:.1f} h")
+
+        with col3:
+            st.metric("Disk Size", f"{archive.nbytes / 1024**2:.1f} MB")
+
+        archive_hours = st.number_input(
+            "Export last N hours", min_value=1, max_value=24 * 30, value=24
+        )
+        start_ns = time_range[1] - int(archive_hours * 3600e9)
+        st.download_button(
+            label="📦 Download Archive (CSV)",
+            data=lambda: to_csv(archive.to_frame(start_ns=start_ns)),
+            file_name=f"battery_archive_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True,
+        )
+
+    # Configuration backup
+    st.subheader("Configuration Backup")
+
+    if st.session_state.cells_data:
+        pack = st.session_state.cells_data
         st.download_button(
             label="⚙️ Backup Configuration (JSON)",
-            data=config_json,
+            data=lambda: config_backup(pack),
             file_name=f"battery_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
             mime="application/json",
             use_container_width=True,
         )
 
     # Data management
-    st.subheader("Data Management")
+    if role != "Viewer":
+        st.subheader("Data Management")
 
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        if st.button("🗑️ Clear Historical Data", use_container_width=True):
-            st.session_state.historical_data = []
-            st.session_state.sample_data_generated = False
-            st.success("Historical data cleared!")
+        col1, col2, col3 = st.columns(3)
 
-    with col2:
-        if st.button("🔄 Reset All Data", use_container_width=True):
-            st.session_state.cells_data = {}
-            st.session_state.historical_data = []
-            st.session_state.alerts = []
-            st.session_state.sample_data_generated = False
-            st.success("All data reset!")
+        with col1:
+            if st.button("🗑️ Clear Historical Data", use_container_width=True):
+                with writer_lock():
+                    st.session_state.history.clear()
+                st.session_state.sample_data_generated = False
+                st.success("Historical data cleared!")
 
-    with col3:
-        if st.button("📊 Generate Sample Data", use_container_width=True):
-            if st.session_state.cells_data:
+        with col2:
+            if st.button("🔄 Reset All Data", use_container_width=True):
+                stop_ingest()  # live frames address cells by position
+                with writer_lock():
+                    st.session_state.cells_data.clear()
+                    st.session_state.history.clear()
+                # Estimates of the dropped data start over
+                for key in ("soc_estimator", "anomaly_detector", "cell_health"):
+                    st.session_state.pop(key, None)
+                st.session_state.alerts_cleared_ns = time.time_ns()
                 st.session_state.sample_data_generated = False
-                generate_sample_data()
-                st.success("Sample historical data generated!")
+                st.success("All data reset!")
+
+        with col3:
+            if st.button("📊 Generate Sample Data", use_container_width=True):
+                if st.session_state.cells_data:
+                    st.session_state.sample_data_generated = False
+                    generate_sample_data()
+                    st.success("Sample historical data generated!")
 
 # Footer
 st.markdown("---")
 
 # System status footer
 if st.session_state.cells_data:
-    total_power = sum(cell["power"] for cell in st.session_state.cells_data.values())
-    avg_temp = np.mean([cell["temp"] for cell in st.session_state.cells_data.values()])
+    summary = pack_summary()
+    total_power = summary["total_power"]
+    avg_temp = summary["average_temp"]
     system_status = (
         "🟢 Operational"
-        if all(
-            get_cell_status(cell_data, cell_id.split("_")[2]) == "healthy"
-            for cell_id, cell_data in st.session_state.cells_data.items()
-        )
+        if summary["healthy"] == summary["cells"]
         else "🟡 Attention Required"
     )
 else:
@@ -1368,3 +1953,29 @@ st.markdown(
 """,
     unsafe_allow_html=True,
 )
+
+# The writer's changes of this run become visible to the viewers
+if role == "Shared Writer":
+    shared = get_shared_pack()
+    shared.attach(
+        st.session_state.cells_data,
+        st.session_state.history,
+        get_alert_log(),
+        (soc_estimator(), anomaly_detector(), cell_health()),
+    )
+    shared.publish()
+
+# Script run time against the budget (the first run of a session is the cold start)
+run_time = time.perf_counter() - RUN_STARTED
+cold_start = "cold_start_time" not in st.session_state
+if cold_start:
+    st.session_state.cold_start_time = run_time
+run_budget = COLD_START_BUDGET_S if cold_start else RERUN_BUDGET_S
+run_label = (
+    f"⏱️ {'Cold start' if cold_start else 'Rerun'}: {run_time:.2f} s "
+    f"(budget {run_budget:.1f} s) | Cold start: {st.session_state.cold_start_time:.2f} s"
+)
+if run_time > run_budget:
+    run_time_slot.warning(run_label)
+else:
+    run_time_slot.caption(run_label)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from bms.anomaly import WARMUP_SAMPLES, AnomalyDetector
+from bms.pack import PackState
+
+CELLS = [f"c{i}" for i in range(6)]
+
+
+def make_detector():
+    pack = PackState()
+    pack.add_cells(CELLS, "nmc", voltage=3.7, temp=25.0)
+    return AnomalyDetector(pack)
+
+
+def score(detector, rng, second, temp_offset=0.0):
+    """One noisy sample of every cell, c0's temperature shifted by ``temp_offset``"""
+    n = len(CELLS)
+    temp = 25.0 + rng.normal(0.0, 0.2, n)
+    temp[0] += temp_offset
+    return detector.update(
+        np.full(n, second * 1_000_000_000),
+        np.arange(n),
+        {
+            "voltage": 3.7 + rng.normal(0.0, 0.005, n),
+            "current": rng.normal(0.0, 0.05, n),
+            "temp": temp,
+        },
+    )
+
+
+def test_a_temperature_step_is_flagged_once_until_it_clears():
+    detector = make_detector()
+    rng = np.random.default_rng(1)
+    second = 0
+    for second in range(1, 2 * WARMUP_SAMPLES):
+        assert score(detector, rng, second) == []
+
+    events = score(detector, rng, second + 1, temp_offset=10.0)
+    issues = sorted(event["Issue"] for event in events)
+    assert issues == ["Temperature deviates from pack", "Temperature drift"]
+    assert {event["Cell"] for event in events} == {"c0"}
+    assert all(event["value"] > event["limit"] for event in events)
+    # Still out of range: nothing new
+    assert score(detector, rng, second + 2, temp_offset=10.0) == []
+    # Back to normal, then the step again
+    assert score(detector, rng, second + 3) == []
+    events = score(detector, rng, second + 4, temp_offset=10.0)
+    assert "Temperature deviates from pack" in [event["Issue"] for event in events]
+
+
+def test_no_drift_scores_during_warmup():
+    detector = make_detector()
+    rng = np.random.default_rng(2)
+    for second in range(1, WARMUP_SAMPLES):
+        score(detector, rng, second, temp_offset=10.0 * (second % 2))
+    assert np.all(detector.z[0] == 0.0)
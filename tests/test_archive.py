@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+from bms.archive import MAX_COLUMN_BYTES, TelemetryArchive
+
+CELLS = ["c0", "c1"]
+
+
+def block(n, value=1.0):
+    return np.full((n, len(CELLS), 4), value)
+
+
+def test_out_of_order_append_is_rejected(tmp_path):
+    archive = TelemetryArchive(str(tmp_path))
+    archive.append_array([10, 20], block(2), CELLS)
+
+    with pytest.raises(ValueError):
+        archive.append_array([15], block(1), CELLS)
+    archive.append_array([20, 30], block(2), CELLS)
+
+    timestamps, _ = archive.read("c0", "voltage")
+    assert list(timestamps) == [10, 20, 20, 30]
+
+
+def test_segments_reopen_in_time_order(tmp_path):
+    archive = TelemetryArchive(str(tmp_path), segment_seconds=1)
+    archive.append_array([1_000_000_000], block(1, 1.0), CELLS)
+    archive.append_array([2_000_000_000], block(1, 2.0), CELLS)
+    archive.flush()
+    # Directory names that sort the other way round
+    early, late = (segment.path for segment in archive.segments)
+    os.rename(early, tmp_path / "seg_z")
+    os.rename(late, tmp_path / "seg_a")
+
+    reopened = TelemetryArchive(str(tmp_path), segment_seconds=1)
+    timestamps, values = reopened.read("c0", "voltage")
+    assert list(values) == [1.0, 2.0]
+    assert [segment.writable for segment in reopened.segments] == [False, True]
+    with pytest.raises(ValueError):
+        reopened.append_array([1_500_000_000], block(1), CELLS)
+
+
+def test_segments_are_sized_for_their_span(tmp_path):
+    archive = TelemetryArchive(str(tmp_path), segment_seconds=60, rate_hz=2.0)
+    archive.append_array([1_000_000_000], block(1), CELLS)
+    (segment,) = archive.segments
+    assert segment.capacity == 120
+    assert os.path.getsize(os.path.join(segment.path, "voltage.f64")) == 120 * 2 * 8
+
+    wide = [f"c{i}" for i in range(100_000)]
+    capacity = TelemetryArchive(str(tmp_path / "wide"))._capacity(len(wide))
+    assert capacity * len(wide) * 8 <= MAX_COLUMN_BYTES
+
+
+def test_only_the_writable_segment_stays_mapped(tmp_path):
+    archive = TelemetryArchive(str(tmp_path), segment_seconds=1)
+    for second in range(1, 6):
+        archive.append_array([second * 1_000_000_000], block(1, second), CELLS)
+    archive.flush()
+
+    reopened = TelemetryArchive(str(tmp_path), segment_seconds=1)
+    segments = reopened.segments
+    assert [segment._maps is None for segment in segments] == [True] * 4 + [False]
+    assert reopened.time_range() == (1_000_000_000, 5_000_000_000)
+    assert [segment._maps is None for segment in segments[:-1]] == [True] * 4
+    _, values = reopened.read("c1", "temp", start_ns=2_000_000_000)
+    assert list(values) == [2.0, 3.0, 4.0, 5.0]
+    assert all(segment._maps is None for segment in segments[:-1])
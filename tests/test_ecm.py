@@ -0,0 +1,20 @@
+import numpy as np
+
+from bms.ecm import PackSimulator
+from bms.history import HistoryStore
+from bms.pack import PackState
+
+
+def test_runs_follow_the_recorded_history():
+    pack = PackState()
+    pack.add_cells(["c0", "c1"], "nmc", voltage=3.7)
+    store = HistoryStore(capacity=1000, rollup_resolutions=(1, 60))
+    sim = PackSimulator(pack)
+
+    sim.run(60, -2.0, dt_s=1.0, history=store, start_ns=0)
+    assert store.last_ns == 60_000_000_000
+    sim.run(60, 0.0, dt_s=1.0, history=store)
+
+    timestamps = store.timestamps()
+    assert len(timestamps) == 120
+    assert np.all(np.diff(timestamps) == 1_000_000_000)
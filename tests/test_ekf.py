@@ -0,0 +1,55 @@
+import numpy as np
+
+from bms.ecm import PackSimulator
+from bms.ekf import SocEstimator
+from bms.history import HistoryStore
+from bms.pack import PackState
+
+
+def pulsed_run():
+    """Two hours of 2 A discharge pulses, rests at 0.5 A charge"""
+    pack = PackState()
+    pack.add_cells(
+        ["n0", "n1", "l0", "l1"],
+        ["nmc", "nmc", "lfp", "lfp"],
+        voltage=[3.9, 3.9, 3.3, 3.3],
+        temp=25.0,
+    )
+    sim = PackSimulator(pack, soc=0.9)
+    history = HistoryStore(capacity=2000, rollup_resolutions=(60,))
+    sim.run(
+        2 * 3600,
+        lambda t: -2.0 if (t // 300) % 2 == 0 else 0.5,
+        history=history,
+        sample_every=5,
+    )
+    return pack, sim, history
+
+
+def test_filter_converges_from_a_wrong_initial_soc():
+    pack, sim, history = pulsed_run()
+    estimator = SocEstimator(pack)
+    first = history.timestamps()[0]
+    estimator.update(
+        np.full(len(pack), first),
+        np.arange(len(pack)),
+        history.param_block("voltage")[:, 0],
+        history.param_block("current")[:, 0],
+        history.param_block("temp")[:, 0],
+    )
+    estimator.x[:, 0] = 0.5  # far from the simulated 0.9
+
+    assert estimator.follow(history) == len(history) - 1
+    assert np.allclose(estimator.soc, sim.soc, atol=0.01)
+    # The flat LFP curve leaves more doubt than the NMC one
+    assert np.all(estimator.soc_std[2:] > estimator.soc_std[:2])
+    assert np.all(estimator.soc_std < 0.01)
+
+
+def test_following_again_filters_nothing():
+    pack, _, history = pulsed_run()
+    estimator = SocEstimator(pack)
+    assert estimator.follow(history) == len(history)
+    soc = estimator.soc.copy()
+    assert estimator.follow(history) == 0
+    assert np.array_equal(estimator.soc, soc)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from bms.ecm import PackSimulator
+from bms.health import HealthEstimator
+from bms.history import HistoryStore
+from bms.pack import PackState
+
+
+def cycle(t):
+    """Discharge, rest, charge, rest: 100 minutes per cycle"""
+    t = t % 6000
+    return -2.0 if t < 1800 else 0.0 if t < 3000 else 2.0 if t < 4800 else 0.0
+
+
+def simulated_history(hours=6):
+    pack = PackState()
+    pack.add_cells(["c0", "c1", "c2", "c3"], "nmc", voltage=4.0, temp=25.0)
+    sim = PackSimulator(pack, soc=0.9)
+    # c0 and c1 are aged: more resistance, less capacity
+    sim.r0[:2] *= 1.5
+    sim.capacity_as[:2] *= 0.8
+    history = HistoryStore(capacity=20_000, rollup_resolutions=(60,))
+    sim.run(hours * 3600, cycle, history=history, sample_every=2, start_ns=0)
+    return pack, sim, history
+
+
+def test_resistance_and_capacity_match_the_simulated_cells():
+    pack, sim, history = simulated_history()
+    estimator = HealthEstimator(pack)
+    assert estimator.follow(history) == len(history)
+    metrics = estimator.metrics()
+
+    fresh, aged = slice(2, 4), slice(0, 2)
+    # Load steps include some RC polarisation, so R reads a little above r0
+    assert np.allclose(metrics["resistance"], sim.r0, rtol=0.1)
+    assert np.all(metrics["resistance"] > sim.r0)
+    growth = metrics["resistance_ratio"][aged] / metrics["resistance_ratio"][fresh]
+    assert np.allclose(growth, 1.5, atol=0.05)
+    assert np.allclose(metrics["capacity_retention"][fresh], 1.0, atol=0.03)
+    assert np.allclose(metrics["capacity_retention"][aged], 0.8, atol=0.03)
+    assert np.all(metrics["soh"][aged] < metrics["soh"][fresh])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from bms.history import HistoryStore
+
+CELLS = ["c0", "c1"]
+
+
+def block(n, value=1.0):
+    return np.full((n, len(CELLS), 4), value)
+
+
+def test_out_of_order_append_is_rejected():
+    store = HistoryStore(capacity=16, rollup_resolutions=(1, 60))
+    store.append_array([10_000_000_000, 11_000_000_000], block(2), CELLS)
+    version = store.version
+
+    with pytest.raises(ValueError):
+        store.append_array([5_000_000_000], block(1, 9.0), CELLS)
+
+    # Nothing of the late block reached the buffer or the tiers
+    assert store.version == version
+    assert list(store.timestamps()) == [10_000_000_000, 11_000_000_000]
+    assert store.last_ns == 11_000_000_000
+    view = store.tiers[0].view(0, 0)
+    assert list(view["timestamp"]) == [10_000_000_000, 11_000_000_000]
+    assert np.all(view["max"] == 1.0)
+
+
+def test_unordered_block_is_sorted():
+    store = HistoryStore(capacity=16, rollup_resolutions=(1,))
+    values = block(3)
+    values[:, 0, 0] = [3.0, 1.0, 2.0]
+    store.append_array([3_000_000_000, 1_000_000_000, 2_000_000_000], values, CELLS)
+
+    assert list(store.timestamps()) == [1_000_000_000, 2_000_000_000, 3_000_000_000]
+    assert list(store.series("c0", "voltage")) == [1.0, 2.0, 3.0]
+    selection = store.select("c0", "voltage", target_points=1)
+    assert list(selection.values) == [1.0, 2.0, 3.0]
+
+
+def test_equal_timestamp_is_accepted():
+    store = HistoryStore(capacity=16, rollup_resolutions=(1,))
+    store.append_array([1_000_000_000], block(1), CELLS)
+    store.append_array([1_000_000_000], block(1, 2.0), CELLS)
+
+    assert len(store) == 2
+    assert store.tiers[0].view(0, 0)["count"][-1] == 2
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from bms.alertlog import AlertLog
+from bms.archive import TelemetryArchive
+from bms.history import HistoryStore
+from bms.ingest import FrameQueue, IngestService, decode_frames, encode_frames
+from bms.pack import PackState
+from bms.rules import RuleEngine, safety_rules
+
+
+def frames_at(timestamp_ns, n_cells):
+    cells = np.arange(n_cells)
+    frames, _ = decode_frames(
+        encode_frames(timestamp_ns, cells, np.full(n_cells, 3.7), 0.0, 25.0)
+    )
+    return frames
+
+
+def test_failed_batches_are_counted_and_later_batches_still_apply(tmp_path):
+    pack = PackState()
+    pack.add_cells(["c0", "c1"], "nmc", voltage=3.6)
+    history = HistoryStore(capacity=16, rollup_resolutions=(1,))
+    # A file where the archive directory should be makes every archive write fail
+    blocker = tmp_path / "archive"
+    blocker.write_text("")
+    service = IngestService(pack, history, archive=TelemetryArchive(str(blocker)))
+
+    async def drain():
+        service.queue = FrameQueue()
+        writer = asyncio.create_task(service._write_loop())
+        for second in (1, 2):
+            service.queue.put(frames_at(second * 1_000_000_000, 2))
+            await asyncio.sleep(0.05)
+        alive = not writer.done()
+        writer.cancel()
+        return alive
+
+    assert asyncio.run(drain())
+    assert service.stats["errors"] == 2
+    assert "FileExistsError" in service.stats["last_error"]
+    # The pack and history were written before the archive failed
+    assert len(history) == 2
+    assert np.allclose(pack.data["voltage"], 3.7)
+
+
+def test_late_frames_neither_apply_nor_alert():
+    pack = PackState()
+    pack.add_cells(["c0", "c1"], "nmc", voltage=3.6)
+    history = HistoryStore(capacity=16, rollup_resolutions=(1,))
+    alerts = AlertLog()
+    engine = RuleEngine(safety_rules(), pack)
+    service = IngestService(pack, history, engine=engine, alerts=alerts)
+
+    assert service._apply(frames_at(2_000_000_000, 2)) == 2
+    late = frames_at(1_000_000_000, 2).copy()
+    late["voltage"] = 9.0  # far above the NMC maximum
+    assert service._apply(late) == 0
+    assert len(alerts) == 0
+    assert np.allclose(pack.data["voltage"], 3.7)
+
+
+def test_start_reports_any_failure_without_waiting_for_the_timeout():
+    pack = PackState()
+    service = IngestService(pack, HistoryStore(capacity=16))
+
+    async def broken():
+        raise RuntimeError("listener setup failed")
+
+    service.run = broken
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        service.start(timeout=5.0)
+    assert time.perf_counter() - started < 1.0
+    service._thread.join(1.0)
+    assert not service.running
@@ -0,0 +1,53 @@
+import numpy as np
+
+from bms.history import HistoryStore
+from bms.pack import PackState
+from bms.replay import LogReplay, format_candump, replay_log
+
+T0 = 1_700_000_000_000_000_000
+
+
+def make_log(path, pack, n=50):
+    n_cells = len(pack)
+    timestamps = np.repeat(T0 + np.arange(n) * 100_000_000, n_cells)
+    cells = np.tile(np.arange(n_cells), n)
+    path.write_text(
+        format_candump(
+            timestamps,
+            cells,
+            np.tile(pack.data["voltage"], n),
+            np.tile(pack.data["current"], n),
+            np.tile(pack.data["temp"], n),
+        )
+    )
+    return str(path)
+
+
+def make_pack():
+    pack = PackState()
+    pack.add_cells(["c0", "c1", "c2"], "nmc", voltage=3.7, temp=30.0)
+    return pack
+
+
+def test_replay_fills_a_fresh_history(tmp_path):
+    pack = make_pack()
+    history = HistoryStore(capacity=100, rollup_resolutions=(1,))
+    stats = replay_log(make_log(tmp_path / "a.log", pack), pack, history)
+
+    assert stats["frames"] == 150
+    assert stats["samples"] == len(history) == 50
+    assert history.timestamps()[0] == T0
+
+
+def test_paced_replay_runs_in_the_background(tmp_path):
+    pack = make_pack()
+    history = HistoryStore(capacity=100, rollup_resolutions=(1,))
+    job = LogReplay(make_log(tmp_path / "a.log", pack), pack, history, speed=0.5)
+    job.start()
+    # At half speed the 5 s log would take 10 s; stop it early
+    assert job.running
+    job.stop()
+
+    assert not job.running
+    assert job.error is None
+    assert len(history) < 50
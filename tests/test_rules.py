@@ -0,0 +1,58 @@
+import numpy as np
+
+from bms.pack import PackState
+from bms.rules import Rule, RuleEngine
+
+# High temperature above 50 °C, cleared below 48 °C, due after 5 s
+HOT = Rule("Hot", "temp", "above", 50.0, "warning", 2.0, 5.0)
+
+# (second, temperature) of one cell, and the seconds an alert is due
+READINGS = [
+    (0, 45.0),
+    (1, 51.0),  # trips
+    (3, 51.0),
+    (6, 51.0),  # active for 5 s: due
+    (7, 49.0),  # inside the hysteresis band, still active
+    (8, 51.0),  # nothing new
+    (9, 47.5),  # cleared
+    (10, 51.0),  # trips again
+    (12, 49.0),  # still active, 2 s in
+    (15, 49.5),  # due, although back below the limit
+]
+DUE = [6, 15]
+
+
+def make_engine():
+    pack = PackState()
+    pack.add_cells(["c0"], "nmc", voltage=3.7, temp=25.0)
+    return RuleEngine([HOT], pack)
+
+
+def evaluate(engine, readings):
+    seconds = np.array([second for second, _ in readings])
+    temps = np.array([temp for _, temp in readings])
+    events = engine.evaluate(
+        seconds * 1_000_000_000,
+        np.zeros(len(readings), dtype=int),
+        {
+            "voltage": np.full(len(temps), 3.7),
+            "current": np.zeros(len(temps)),
+            "temp": temps,
+        },
+    )
+    return [event["timestamp_ns"] // 1_000_000_000 for event in events]
+
+
+def test_hysteresis_and_debounce_in_one_batch():
+    assert evaluate(make_engine(), READINGS) == DUE
+
+
+def test_results_do_not_depend_on_batching():
+    engine = make_engine()
+    due = []
+    for reading in READINGS:
+        due += evaluate(engine, [reading])
+    assert due == DUE
+
+    engine = make_engine()
+    assert evaluate(engine, READINGS[:4]) + evaluate(engine, READINGS[4:]) == DUE
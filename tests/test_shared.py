@@ -0,0 +1,81 @@
+import numpy as np
+
+from bms.anomaly import AnomalyDetector
+from bms.ekf import SocEstimator
+from bms.health import HealthEstimator
+from bms.history import HistoryStore
+from bms.pack import PackState
+from bms import shared as shared_module
+from bms.shared import SharedPack
+from bms.synthetic import generate_history
+
+
+def make_shared():
+    pack = PackState()
+    pack.add_cells(["c0", "c1", "c2"], "nmc", voltage=3.7, temp=30.0)
+    history = HistoryStore(capacity=500, rollup_resolutions=(1, 60))
+    generate_history(pack, history, n_samples=300, start_ns=0, seed=1)
+    shared = SharedPack(pack, history)
+    estimators = (SocEstimator(pack), AnomalyDetector(pack), HealthEstimator(pack))
+    shared.attach(pack, history, [], estimators)
+    return shared, estimators
+
+
+def test_snapshot_carries_the_writers_estimates():
+    shared, (estimator, _, _) = make_shared()
+    snapshot = shared.publish()
+
+    assert snapshot.estimates is not None
+    assert np.allclose(snapshot.estimates["soc"], estimator.soc)
+    assert snapshot.estimates["anomaly_z"].shape == (2, 3, 3)
+    assert set(snapshot.estimates["metrics"]) >= {"soh", "resistance"}
+
+
+def test_unchanged_history_is_not_copied_again():
+    shared, _ = make_shared()
+    first = shared.publish()
+    second = shared.publish()
+    assert second.version == first.version + 1
+    assert second.history is first.history
+    assert second.estimates is first.estimates
+
+    pack, history = shared.pack, shared.history
+    history.append_array([history.last_ns + 1], pack.sample(history.params))
+    third = shared.publish()
+    assert third.history is not first.history
+    assert len(third.history) == 301
+
+
+def test_snapshot_history_reads_like_the_original():
+    shared, _ = make_shared()
+    copy = shared.publish().history
+    history = shared.history
+
+    assert np.array_equal(copy.timestamps(), history.timestamps())
+    assert np.array_equal(copy.series("c1", "temp"), history.series("c1", "temp"))
+    assert copy.last_ns == history.last_ns
+    for target_points in (20, 1000):
+        ours = copy.select("c0", "voltage", target_points=target_points)
+        theirs = history.select("c0", "voltage", target_points=target_points)
+        assert np.array_equal(ours.timestamps, theirs.timestamps)
+        assert np.allclose(ours.values, theirs.values)
+    assert not copy.timestamps().flags.writeable
+
+
+def test_an_older_publish_never_replaces_a_newer_snapshot(monkeypatch):
+    shared, _ = make_shared()
+    build = shared_module.PackSnapshot
+    nested = []
+
+    def interleaved(version, *args):
+        # Another publish finishes while this one builds its snapshot
+        if not nested:
+            nested.append(None)
+            nested[0] = shared.publish()
+        return build(version, *args)
+
+    monkeypatch.setattr(shared_module, "PackSnapshot", interleaved)
+    shared.publish()
+
+    assert shared.snapshot is nested[0]
+    assert shared.snapshot.version == shared.version
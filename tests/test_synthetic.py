@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+import pytest
+
+from bms.history import HistoryStore, record_sample
+from bms.pack import PackState
+from bms.synthetic import generate_history
+
+
+def make_pack():
+    pack = PackState()
+    pack.add_cells(["lfp", "lto"], ["lfp", "lto"], voltage=[3.55, 2.75])
+    return pack
+
+
+def test_generated_history_ends_now_and_live_samples_follow_it():
+    pack = make_pack()
+    store = HistoryStore(capacity=64, rollup_resolutions=(1,))
+    before_ns = time.time_ns()
+
+    generate_history(pack, store, n_samples=10, rate_hz=1 / 120, seed=1)
+
+    timestamps = store.timestamps()
+    assert np.all(np.diff(timestamps) == 120_000_000_000)
+    assert before_ns <= timestamps[-1] <= time.time_ns()
+    recorded = [record_sample(pack, store) for _ in range(3)]
+    assert recorded[0] > timestamps[-1]
+    assert np.all(np.diff(recorded) > 0)
+
+
+def test_refuses_to_write_after_recorded_samples():
+    pack = make_pack()
+    store = HistoryStore(capacity=64, rollup_resolutions=(1,))
+    record_sample(pack, store)
+
+    with pytest.raises(ValueError):
+        generate_history(pack, store, n_samples=10, seed=1)
+    assert len(store) == 1
+
+
+def test_voltages_stay_within_chemistry_limits():
+    pack = make_pack()
+    store = HistoryStore(capacity=2000, rollup_resolutions=(1,))
+
+    generate_history(pack, store, n_samples=2000, noise="uniform", seed=1)
+
+    lfp = store.series("lfp", "voltage")
+    lto = store.series("lto", "voltage")
+    assert lfp.min() >= 2.8 and lfp.max() <= 3.6
+    assert lto.min() >= 1.5 and lto.max() <= 2.8
+    # Both cells sit near their upper limit, which is where they are clipped
+    assert lfp.max() == 3.6 and lto.max() == 2.8
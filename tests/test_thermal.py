@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from bms.chemistry import CELL_SPECS
+from bms.pack import PackState
+from bms.thermal import (
+    CELL_CONDUCTANCE,
+    MODULE_GAP_FACTOR,
+    RUNAWAY_ENERGY,
+    ThermalModel,
+)
+from bms.topology import PackTopology
+
+
+def make_pack(series, parallel=1, groups_per_module=None, temp=25.0):
+    pack = PackState()
+    PackTopology(series, parallel, groups_per_module).build(
+        pack, "nmc", CELL_SPECS, temp=temp
+    )
+    return pack
+
+
+def test_cell_settles_where_i2r_heat_meets_cooling():
+    pack = make_pack(1)
+    model = ThermalModel(pack)
+    for _ in range(200):
+        model.step(np.array([5.0]), 60.0)
+
+    expected = (
+        model.coolant_temp + 5.0**2 * model.resistance / model.coolant_conductance
+    )
+    assert np.allclose(pack.data["temp"], expected, rtol=1e-3)
+
+
+def test_conduction_conserves_heat_and_weakens_across_modules():
+    pack = make_pack(4, groups_per_module=2)
+    model = ThermalModel(pack)
+    model.coolant_conductance = 0.0
+    model.temp = np.array([85.0, 25.0, 25.0, 25.0])
+    energy = model.heat_capacity @ model.temp
+
+    model.step(np.zeros(4), 1.0)
+
+    assert model.heat_capacity @ model.temp == pytest.approx(energy)
+    # Heat flows down the string, one link at a time
+    assert model.temp[0] > model.temp[1] > model.temp[2] > model.temp[3]
+    for _ in range(2000):
+        model.step(np.zeros(4), 10.0)
+    assert np.allclose(model.temp, 40.0)
+
+
+def test_module_gap_conducts_less():
+    pack = make_pack(3, groups_per_module=2)
+    model = ThermalModel(pack)
+    inside, across = model.laplacian[0, 1], model.laplacian[1, 2]
+    assert -inside == pytest.approx(CELL_CONDUCTANCE)
+    assert -across == pytest.approx(CELL_CONDUCTANCE * MODULE_GAP_FACTOR)
+
+
+def test_runaway_releases_its_energy_into_the_neighbours():
+    pack = make_pack(3, parallel=3)
+    model = ThermalModel(pack)
+    model.coolant_conductance = 0.0
+    model.ignite(4)  # the middle cell
+    energy = model.heat_capacity @ model.temp
+    for _ in range(600):
+        model.step(np.zeros(len(pack)), 1.0)
+
+    assert model.runaway_at[4] == 0.0
+    assert model.heat_capacity @ model.temp == pytest.approx(energy + RUNAWAY_ENERGY)
+    # Adjacent cells get the heat before the corners do
+    assert np.all(model.temp[[1, 3, 5, 7]] > model.temp[[0, 2, 6, 8]].max())